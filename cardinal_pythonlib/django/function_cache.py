@@ -30,7 +30,10 @@ but fixed for Python 3 / Django 1.10.
 """
 
 import hashlib
-from typing import Any, Callable, Dict, Tuple
+import math
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 # noinspection PyUnresolvedReferences
 from django.core.cache import cache  # default cache
@@ -44,6 +47,14 @@ FunctionType = Callable[..., Any]
 ArgsType = Tuple[Any, ...]
 KwargsType = Dict[str, Any]
 
+# Types whose repr() is stable across processes, and distinct from each other
+# (e.g. repr(1) != repr(1.0) != repr(True) != repr("1")):
+PRIMITIVE_TYPES = (str, int, float, bool, type(None))
+PRIMITIVE_CALL_SIG_PREFIX = "py:"  # can't be the start of a JSON signature
+
+LOCK_KEY_SUFFIX = ":lock"
+DEFAULT_LOCK_TIMEOUT = 60  # seconds
+
 
 def get_call_signature(
     fn: FunctionType,
@@ -74,6 +85,28 @@ def get_call_signature(
     return call_sig
 
 
+def get_primitive_call_signature(
+    fn: FunctionType, args: ArgsType, kwargs: KwargsType
+) -> Optional[str]:
+    """
+    A cheaper alternative to :func:`get_call_signature` for the common case
+    where all arguments are of primitive types (``str``, ``int``, ``float``,
+    ``bool``, ``None``), whose ``repr()`` is stable. Returns ``None`` if any
+    argument is of another type (including subclasses of those types).
+    """
+    for arg in args:
+        if type(arg) not in PRIMITIVE_TYPES:
+            return None
+    if kwargs:
+        for value in kwargs.values():
+            if type(value) not in PRIMITIVE_TYPES:
+                return None
+        kwargs_sig = repr(sorted(kwargs.items()))
+    else:
+        kwargs_sig = "[]"
+    return f"{PRIMITIVE_CALL_SIG_PREFIX}{fn.__qualname__}{args!r}{kwargs_sig}"
+
+
 def make_cache_key(call_signature: str, debug_cache: bool = False) -> str:
     """
     Takes a function and its args/kwargs, and produces a string description
@@ -115,7 +148,11 @@ def make_cache_key(call_signature: str, debug_cache: bool = False) -> str:
 
 
 def django_cache_function(
-    timeout: int = 5 * 60, cache_key: str = "", debug_cache: bool = False
+    timeout: int = 5 * 60,
+    cache_key: str = "",
+    debug_cache: bool = False,
+    early_recompute_beta: float = 0.0,
+    lock_timeout: int = DEFAULT_LOCK_TIMEOUT,
 ):
     """
     Decorator to add caching to a function in Django.
@@ -128,58 +165,167 @@ def django_cache_function(
 
         cache_key: optional cache key to use (if falsy, we'll invent one)
         debug_cache: show hits/misses?
+        early_recompute_beta:
+            If positive, enables protection against "cache stampedes" (many
+            workers recomputing the same expensive result when it expires).
+            Each worker reading a cached value may decide to recompute it
+            early, with a probability that rises as expiry approaches and
+            that is scaled by how long the result took to compute and by this
+            parameter ("probabilistic early expiration"; Vattani et al. 2015,
+            https://doi.org/10.14778/2757807.2757813); 1.0 is a sensible
+            value. Only one worker (holding a short-lived lock in the cache)
+            recomputes early; the others carry on using the cached value.
+            Has no effect if ``timeout`` is ``None``.
+        lock_timeout: timeout in seconds for that lock
+
+    The decorated function also has a ``call_many(args_list, kwargs_list)``
+    method, which takes a sequence of ``args`` tuples (and optionally a
+    parallel sequence of ``kwargs`` dictionaries), and returns a list of
+    results. It looks up all the results with a single ``cache.get_many()``
+    call, and stores any that it had to compute with a single
+    ``cache.set_many()`` call.
     """
     cache_key = cache_key or None
 
+    # - NOTE that Django returns None from cache.get() for "not in cache", so
+    #   can't cache a None value;
+    #   https://docs.djangoproject.com/en/1.10/topics/cache/#basic-usage
+    # - We need to store a bit more than just the function result anyway, to
+    #   detect hash collisions when the user doesn't specify the cache_key, so
+    #   we may as well use that format even if the user does specify the
+    #   cache_key, and then we can store a None result properly as well.
+    # - We store (call_sig, func_result, compute_time_s, expiry_time), where
+    #   the last two (for stampede protection) are None if not applicable.
+
     def decorator(fn):
-        def wrapper(*args, **kwargs):
-            # - NOTE that Django returns None from cache.get() for "not in
-            #   cache", so can't cache a None value;
-            #   https://docs.djangoproject.com/en/1.10/topics/cache/#basic-usage  # noqa: E501
-            # - We need to store a bit more than just the function result
-            #   anyway, to detect hash collisions when the user doesn't specify
-            #   the cache_key, so we may as well use that format even if the
-            #   user does specify the cache_key, and then we can store a None
-            #   result properly as well.
+        def get_key(args: ArgsType, kwargs: KwargsType) -> Tuple[str, str]:
+            """
+            Returns ``call_sig, key``.
+            """
             if cache_key:
                 # User specified a cache key. This is easy.
-                call_sig = ""
-                _cache_key = cache_key
-                check_stored_call_sig = False
-            else:
-                # User didn't specify a cache key, so we'll do one
-                # automatically. Since we do this via a hash, there is a small
-                # but non-zero chance of a hash collision.
-                call_sig = get_call_signature(fn, args, kwargs)
-                _cache_key = make_cache_key(call_sig)
-                check_stored_call_sig = True
-            if debug_cache:
-                log.critical("Checking cache for key: " + _cache_key)
-            cache_result_tuple = cache.get(_cache_key)  # TALKS TO CACHE HERE
+                return "", cache_key
+            # User didn't specify a cache key, so we'll do one automatically.
+            # Since we do this via a hash, there is a small but non-zero
+            # chance of a hash collision.
+            call_sig = get_primitive_call_signature(
+                fn, args, kwargs
+            ) or get_call_signature(fn, args, kwargs)
+            return call_sig, make_cache_key(call_sig)
+
+        def cached_value_ok(
+            cache_result_tuple: Optional[Tuple], call_sig: str
+        ) -> bool:
+            """
+            Is a value from the cache present and for this call?
+            """
             if cache_result_tuple is None:
                 if debug_cache:
                     log.debug("Cache miss")
-            else:
-                if debug_cache:
-                    log.debug("Cache hit")
-                cached_call_sig, func_result = cache_result_tuple
-                if (not check_stored_call_sig) or cached_call_sig == call_sig:
-                    return func_result
-                log.warning(
-                    f"... Cache hit was due to hash collision; "
-                    f"cached_call_sig {cached_call_sig!r} != "
-                    f"call_sig {call_sig!r}"
-                )
-                # If we get here, either it wasn't in the cache, or something
-                # was in the cache that matched by cache_key but was actually a
-                # hash collision. Either way, we must do the real work.
+                return False
+            if debug_cache:
+                log.debug("Cache hit")
+            cached_call_sig = cache_result_tuple[0]
+            if cache_key or cached_call_sig == call_sig:
+                return True
+            log.warning(
+                f"... Cache hit was due to hash collision; "
+                f"cached_call_sig {cached_call_sig!r} != "
+                f"call_sig {call_sig!r}"
+            )
+            return False
+
+        def should_recompute_early(cache_result_tuple: Tuple) -> bool:
+            if early_recompute_beta <= 0 or len(cache_result_tuple) < 4:
+                return False
+            compute_time_s, expiry_time = cache_result_tuple[2:4]
+            if expiry_time is None:
+                return False
+            # -log(u) for u in (0, 1] is exponentially distributed, >= 0.
+            delay = (
+                -compute_time_s
+                * early_recompute_beta
+                * math.log(1.0 - random.random())
+            )
+            return time.time() + delay >= expiry_time
+
+        def compute(
+            args: ArgsType, kwargs: KwargsType, call_sig: str
+        ) -> Tuple:
+            """
+            Calls the function, and returns a tuple to store in the cache.
+            """
+            start = time.perf_counter()
             func_result = fn(*args, **kwargs)
-            cache_result_tuple = (call_sig, func_result)
+            compute_time_s = time.perf_counter() - start
+            expiry_time = None if timeout is None else time.time() + timeout
+            return call_sig, func_result, compute_time_s, expiry_time
+
+        def wrapper(*args, **kwargs):
+            call_sig, _cache_key = get_key(args, kwargs)
+            if debug_cache:
+                log.critical("Checking cache for key: " + _cache_key)
+            cache_result_tuple = cache.get(_cache_key)  # TALKS TO CACHE HERE
+            if cached_value_ok(cache_result_tuple, call_sig):
+                if not should_recompute_early(cache_result_tuple):
+                    return cache_result_tuple[1]
+                # Recompute early, unless another worker is already doing
+                # so, in which case the cached value is still fine.
+                lock_key = _cache_key + LOCK_KEY_SUFFIX
+                if not cache.add(lock_key, 1, timeout=lock_timeout):
+                    return cache_result_tuple[1]
+                if debug_cache:
+                    log.debug("Recomputing early")
+                try:
+                    cache_result_tuple = compute(args, kwargs, call_sig)
+                    cache.set(
+                        key=_cache_key,
+                        value=cache_result_tuple,
+                        timeout=timeout,
+                    )
+                finally:
+                    cache.delete(lock_key)
+                return cache_result_tuple[1]
+            # If we get here, either it wasn't in the cache, or something was
+            # in the cache that matched by cache_key but was actually a hash
+            # collision. Either way, we must do the real work.
+            cache_result_tuple = compute(args, kwargs, call_sig)
             cache.set(
                 key=_cache_key, value=cache_result_tuple, timeout=timeout
             )  # TALKS TO CACHE HERE
-            return func_result
+            return cache_result_tuple[1]
+
+        def call_many(
+            args_list: Sequence[ArgsType],
+            kwargs_list: Sequence[KwargsType] = None,
+        ) -> List[Any]:
+            if kwargs_list is None:
+                kwargs_list = [{}] * len(args_list)
+            assert len(kwargs_list) == len(
+                args_list
+            ), "args_list and kwargs_list must be the same length"
+            sigs_keys = [
+                get_key(tuple(args), kwargs)
+                for args, kwargs in zip(args_list, kwargs_list)
+            ]
+            cached = cache.get_many(
+                list({key for _, key in sigs_keys})
+            )  # TALKS TO CACHE HERE
+            results = []  # type: List[Any]
+            to_store = {}  # type: Dict[str, Tuple]
+            for (call_sig, key), args, kwargs in zip(
+                sigs_keys, args_list, kwargs_list
+            ):
+                cache_result_tuple = to_store.get(key) or cached.get(key)
+                if not cached_value_ok(cache_result_tuple, call_sig):
+                    cache_result_tuple = compute(tuple(args), kwargs, call_sig)
+                    to_store[key] = cache_result_tuple
+                results.append(cache_result_tuple[1])
+            if to_store:
+                cache.set_many(to_store, timeout=timeout)  # TALKS TO CACHE
+            return results
 
+        wrapper.call_many = call_many
         return wrapper
 
     return decorator
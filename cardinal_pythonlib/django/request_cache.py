@@ -24,32 +24,248 @@
 
 **Implement a request cache for Django.**
 
+Usage:
+
+- Add ``cardinal_pythonlib.django.request_cache.RequestCacheMiddleware`` to
+  your Django ``MIDDLEWARE`` setting.
+
+- Memoize functions (e.g. ORM lookups) for the duration of a request:
+
+  .. code-block:: python
+
+    from cardinal_pythonlib.django.request_cache import request_memoize
+
+    @request_memoize
+    def get_site_config(site_id: int) -> SiteConfig:
+        return SiteConfig.objects.get(site_id=site_id)
+
+- Or use the per-request store directly, via :func:`get_request_cache`,
+  which returns an object with the Django cache API.
+
+The store is held in a :class:`contextvars.ContextVar`, so it works for
+threaded (WSGI) and asynchronous (ASGI) servers alike, and is discarded at
+the end of each request. Its maximum size can be set via the Django setting
+``REQUEST_CACHE_MAXSIZE``.
+
 """
 
 # https://stackoverflow.com/questions/3151469/per-request-cache-in-django
 
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import wraps
 from threading import currentThread
+from typing import Any, Callable, Hashable, Optional
+
+# noinspection PyUnresolvedReferences
+from django.conf import settings
+
+# noinspection PyUnresolvedReferences
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
 
 # noinspection PyUnresolvedReferences
 from django.core.cache.backends.locmem import LocMemCache
 
-_request_cache = {}
+# noinspection PyUnresolvedReferences
+from django.utils.deprecation import MiddlewareMixin
+
+DEFAULT_REQUEST_CACHE_MAXSIZE = 1000
+
+_MISSING = object()
+
 _installed_middleware = False
 
 
-def get_request_cache():
+# =============================================================================
+# Per-request store
+# =============================================================================
+
+
+class RequestMemoStore(BaseCache):
+    """
+    A bounded least-recently-used key/value store, with hit/miss counters,
+    for the duration of a single request.
+
+    It implements the Django cache API (:class:`BaseCache`), so it can be
+    used like the :class:`RequestCache` (a ``LocMemCache``) that
+    :func:`get_request_cache` used to return: ``get_many``, ``add``,
+    ``incr``, ``has_key``, ``version`` arguments and so on all work. Keys
+    need only be hashable, not strings. Since the store lasts only for one
+    request, positive timeouts are ignored; a timeout of zero or less means
+    "do not store", as for other Django caches.
+
+    Not thread-safe, since each request has its own.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_REQUEST_CACHE_MAXSIZE) -> None:
+        super().__init__(params={})
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # type: OrderedDict[Hashable, Any]
+
+    def _key(self, key: Hashable, version: Optional[int]) -> Hashable:
+        return key, self.version if version is None else version
+
+    @staticmethod
+    def _expires_at_once(timeout: Any) -> bool:
+        return (
+            timeout is not DEFAULT_TIMEOUT
+            and timeout is not None
+            and timeout <= 0
+        )
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._key(key, None) in self._data
+
+    def has_key(self, key: Hashable, version: int = None) -> bool:
+        """
+        Is ``key`` present? (Does not count as a hit or miss.)
+        """
+        return self._key(key, version) in self._data
+
+    def get(
+        self, key: Hashable, default: Any = None, version: int = None
+    ) -> Any:
+        """
+        Returns the value for ``key``, or ``default``.
+        """
+        k = self._key(key, version)
+        value = self._data.get(k, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._data.move_to_end(k)
+        return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        timeout: Any = DEFAULT_TIMEOUT,
+        version: int = None,
+    ) -> None:
+        """
+        Stores ``value`` for ``key``, evicting the least recently used item
+        if the store is full.
+        """
+        if self._expires_at_once(timeout):
+            self.delete(key, version=version)
+            return
+        data = self._data
+        k = self._key(key, version)
+        data[k] = value
+        data.move_to_end(k)
+        if len(data) > self.maxsize:
+            data.popitem(last=False)
+
+    def add(
+        self,
+        key: Hashable,
+        value: Any,
+        timeout: Any = DEFAULT_TIMEOUT,
+        version: int = None,
+    ) -> bool:
+        """
+        Stores ``value`` for ``key`` if ``key`` is not already present.
+        Returns ``True`` if it was stored.
+        """
+        if self.has_key(key, version=version):
+            return False
+        self.set(key, value, timeout=timeout, version=version)
+        return True
+
+    def touch(
+        self,
+        key: Hashable,
+        timeout: Any = DEFAULT_TIMEOUT,
+        version: int = None,
+    ) -> bool:
+        """
+        Returns ``True`` if ``key`` is present (deleting it if ``timeout``
+        expires it at once).
+        """
+        if not self.has_key(key, version=version):
+            return False
+        if self._expires_at_once(timeout):
+            self.delete(key, version=version)
+        return True
+
+    def delete(self, key: Hashable, version: int = None) -> bool:
+        """
+        Removes ``key``, if present. Returns ``True`` if it was present.
+        """
+        return (
+            self._data.pop(self._key(key, version), _MISSING) is not _MISSING
+        )
+
+    def clear(self) -> None:
+        """
+        Empties the store.
+        """
+        self._data.clear()
+
+
+_request_cache: ContextVar[Optional[RequestMemoStore]] = ContextVar(
+    "cardinal_pythonlib_request_cache", default=None
+)
+
+
+def get_request_cache() -> RequestMemoStore:
     """
-    Returns the Django request cache for the current thread.
+    Returns the request cache for the current request.
     Requires that ``RequestCacheMiddleware`` is loaded.
     """
     assert _installed_middleware, "RequestCacheMiddleware not loaded"
-    return _request_cache[currentThread()]
+    store = _request_cache.get()
+    assert store is not None, "Not within a request"
+    return store
+
+
+def request_memoize(fn: Callable) -> Callable:
+    """
+    Decorator to memoize a function for the duration of the current request,
+    via :class:`RequestCacheMiddleware`. Arguments must be hashable; if they
+    are not, or if there is no current request, the function is simply
+    called.
+    """
+    fn_id = f"{fn.__module__}:{fn.__qualname__}"
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        store = _request_cache.get()
+        if store is None:
+            return fn(*args, **kwargs)
+        key = (fn_id, args, tuple(sorted(kwargs.items())) if kwargs else ())
+        try:
+            result = store.get(key, _MISSING)
+        except TypeError:  # unhashable arguments
+            return fn(*args, **kwargs)
+        if result is _MISSING:
+            result = fn(*args, **kwargs)
+            store.set(key, result)
+        return result
+
+    return wrapper
+
+
+# =============================================================================
+# Middleware
+# =============================================================================
 
 
 # LocMemCache is a threadsafe local memory cache
 class RequestCache(LocMemCache):
     """
     Local memory request cache for Django.
+
+    No longer used by :class:`RequestCacheMiddleware` (which uses
+    :class:`RequestMemoStore`); retained for compatibility. Note that
+    instances are never freed by Django.
     """
 
     def __init__(self):
@@ -58,18 +274,24 @@ class RequestCache(LocMemCache):
         super(RequestCache, self).__init__(name, params)
 
 
-class RequestCacheMiddleware(object):
+class RequestCacheMiddleware(MiddlewareMixin):
     """
     Django middleware to implement a request cache.
     """
 
-    def __init__(self):
+    def __init__(self, get_response: Callable = None) -> None:
+        super().__init__(get_response)
         global _installed_middleware
         _installed_middleware = True
+        self.maxsize = getattr(
+            settings, "REQUEST_CACHE_MAXSIZE", DEFAULT_REQUEST_CACHE_MAXSIZE
+        )
 
-    # noinspection PyMethodMayBeStatic,PyUnusedLocal
-    def process_request(self, request):
-        cache = _request_cache.get(currentThread()) or RequestCache()
-        _request_cache[currentThread()] = cache
+    # noinspection PyUnusedLocal
+    def process_request(self, request) -> None:
+        _request_cache.set(RequestMemoStore(self.maxsize))
 
-        cache.clear()
+    # noinspection PyUnusedLocal
+    def process_response(self, request, response):
+        _request_cache.set(None)
+        return response
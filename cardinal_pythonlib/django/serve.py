@@ -25,32 +25,60 @@
 **Helper functions to serve specific types of content via Django (e.g. raw
 files, PDFs).**
 
+Files served directly from disk via :func:`serve_file` support conditional
+GET (``ETag``/``Last-Modified``, giving HTTP 304 responses) and single byte
+ranges (HTTP 206), if the request is passed in. Whole files are served via
+Django's ``FileResponse``, which the WSGI server can send with
+``wsgi.file_wrapper`` (typically ``sendfile``, i.e. zero-copy).
+
+Generated content can be streamed via :func:`serve_stream`, rather than
+being assembled in memory first.
+
 """
 
 
 import os
-from typing import Iterable, Optional, Union
+import re
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple, Union
 
 # noinspection PyUnresolvedReferences
 from django.conf import settings
 
 # noinspection PyUnresolvedReferences
-from django.http import FileResponse, HttpResponse
+from django.http import (
+    FileResponse,
+    HttpRequest,
+    HttpResponse,
+    StreamingHttpResponse,
+)
 
 # noinspection PyUnresolvedReferences
 from django.http.response import HttpResponseBase
 
+# noinspection PyUnresolvedReferences
+from django.utils.cache import get_conditional_response
+
 # noinspection PyUnresolvedReferences
 from django.utils.encoding import smart_str
 
+# noinspection PyUnresolvedReferences
+from django.utils.http import http_date, parse_http_date_safe
+
 from cardinal_pythonlib.httpconst import MimeType
 from cardinal_pythonlib.pdf import (
     get_concatenated_pdf_from_disk,
     get_concatenated_pdf_in_memory,
     get_pdf_from_html,
     PdfPlan,
+    write_concatenated_pdf,
 )
 
+DEFAULT_STREAM_CHUNK_SIZE = 64 * 1024  # bytes
+DEFAULT_SPOOL_MAX_SIZE = 10 * 1024 * 1024  # bytes
+
+BYTE_RANGE_REGEX = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$")
+
 
 # =============================================================================
 # File serving
@@ -121,6 +149,135 @@ def add_http_headers_for_attachment(
         response["Content-Length"] = content_length
 
 
+def get_etag_for_stat(st: os.stat_result) -> str:
+    """
+    Returns a (strong) HTTP ETag for a file, from its ``os.stat()`` result,
+    based on its modification time and size.
+    """
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def parse_http_byte_range(
+    range_header: Optional[str], size: int
+) -> Optional[Tuple[int, int]]:
+    """
+    Parses an HTTP ``Range`` header, for a single byte range.
+
+    Args:
+        range_header: value of the ``Range`` header, or ``None``
+        size: size of the entity (e.g. file) in bytes
+
+    Returns:
+        ``None`` if there is no header, or one we do not support (e.g.
+        multiple ranges) -- in which case, the whole entity should be served
+        -- or a tuple ``(start, end)`` of byte positions, inclusive.
+
+    Raises:
+        ValueError: if the range is unsatisfiable (HTTP 416 is appropriate)
+    """
+    if not range_header:
+        return None
+    m = BYTE_RANGE_REGEX.match(range_header)
+    if not m:
+        return None
+    first, last = m.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the last n bytes.
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(f"Unsatisfiable range: {range_header!r}")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return None  # invalid; ignore it
+    if start >= size:
+        raise ValueError(f"Unsatisfiable range: {range_header!r}")
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(
+    request: HttpRequest, etag: str, last_modified: int
+) -> bool:
+    """
+    Is there no ``If-Range`` header, or one that matches our entity (such
+    that a ``Range`` header should be honoured)?
+    """
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return if_range == etag  # strong comparison
+    if if_range.startswith("W/"):
+        return False  # weak ETags cannot be used with If-Range
+    return parse_http_date_safe(if_range) == last_modified
+
+
+class FileChunks(object):
+    """
+    Iterable of chunks of a binary file, from ``start``, for ``length`` bytes
+    (or to the end, if ``length`` is ``None``). The file is closed when the
+    chunks are exhausted, or by :meth:`close`.
+
+    Django's ``StreamingHttpResponse`` calls :meth:`close` when the response
+    is closed, so the file is not leaked if the body is never (fully)
+    iterated, e.g. for a ``HEAD`` request or if the client disconnects.
+    """
+
+    def __init__(
+        self,
+        f: BinaryIO,
+        start: int = 0,
+        length: int = None,
+        chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+    ) -> None:
+        self.f = f
+        self.start = start
+        self.length = length
+        self.chunk_size = chunk_size
+
+    def __iter__(self) -> Iterator[bytes]:
+        f = self.f
+        length = self.length
+        chunk_size = self.chunk_size
+        try:
+            f.seek(self.start)
+            while length is None or length > 0:
+                n = chunk_size if length is None else min(chunk_size, length)
+                chunk = f.read(n)
+                if not chunk:
+                    break
+                if length is not None:
+                    length -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+    def close(self) -> None:
+        """
+        Closes the file.
+        """
+        self.f.close()
+
+
+def gen_file_chunks(
+    f: BinaryIO,
+    start: int = 0,
+    length: int = None,
+    chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+) -> FileChunks:
+    """
+    Returns an iterable of chunks of a binary file, from ``start``, for
+    ``length`` bytes (or to the end, if ``length`` is ``None``); the file is
+    closed when the chunks are exhausted or the iterable is closed. See
+    :class:`FileChunks`.
+    """
+    return FileChunks(f, start=start, length=length, chunk_size=chunk_size)
+
+
 def serve_file(
     path_to_file: str,
     offered_filename: str = None,
@@ -128,6 +285,7 @@ def serve_file(
     as_attachment: bool = False,
     as_inline: bool = False,
     default_content_type: Optional[str] = MimeType.FORCE_DOWNLOAD,
+    request: HttpRequest = None,
 ) -> HttpResponseBase:
     """
     Serve up a file from disk.
@@ -139,6 +297,12 @@ def serve_file(
     (b) serve by asking the web server to do so via the X-SendFile directive
         (if ``XSENDFILE`` is True).
 
+    When serving directly, ``ETag`` and ``Last-Modified`` headers are added.
+    If ``request`` is given, conditional requests are also handled (e.g.
+    returning HTTP 304 Not Modified), as are single byte-range requests
+    (HTTP 206 Partial Content, or 416 Range Not Satisfiable), so that
+    downloads can be resumed. (With ``XSENDFILE``, the web server does this.)
+
     Args:
 
         path_to_file:
@@ -156,6 +320,8 @@ def serve_file(
         default_content_type:
             HTTP content type to use as default, if ``content_type`` is
             ``None``
+        request:
+            the Django ``HttpRequest``, if available
     """
     # https://stackoverflow.com/questions/1156246/having-django-serve-downloadable-files  # noqa: E501
     # https://docs.djangoproject.com/en/dev/ref/request-response/#telling-the-browser-to-treat-the-response-as-a-file-attachment  # noqa: E501
@@ -167,8 +333,46 @@ def serve_file(
         response["X-Sendfile"] = smart_str(path_to_file)
         content_length = os.path.getsize(path_to_file)
     else:
-        response = FileResponse(open(path_to_file, mode="rb"))
-        content_length = None
+        f = open(path_to_file, mode="rb")
+        st = os.fstat(f.fileno())
+        etag = get_etag_for_stat(st)
+        last_modified = int(st.st_mtime)
+        content_length = None  # FileResponse works it out
+        byte_range = None
+        if request is not None:
+            # Conditional GET
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is not None:
+                f.close()
+                return response
+            # Range request
+            if _if_range_matches(request, etag, last_modified):
+                try:
+                    byte_range = parse_http_byte_range(
+                        request.META.get("HTTP_RANGE"), st.st_size
+                    )
+                except ValueError:
+                    f.close()
+                    response = HttpResponse(status=416)
+                    response["Content-Range"] = f"bytes */{st.st_size}"
+                    return response
+        if byte_range is None:
+            # Whole file. FileResponse allows the WSGI server to use
+            # wsgi.file_wrapper, e.g. sendfile().
+            response = FileResponse(f)
+        else:
+            start, end = byte_range
+            content_length = end - start + 1
+            response = StreamingHttpResponse(
+                gen_file_chunks(f, start=start, length=content_length),
+                status=206,
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{st.st_size}"
+        response["Accept-Ranges"] = "bytes"
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
     add_http_headers_for_attachment(
         response,
         offered_filename=offered_filename,
@@ -210,6 +414,34 @@ def serve_buffer(
     return response
 
 
+def serve_stream(
+    chunks: Iterable[bytes],
+    offered_filename: str = None,
+    content_type: str = None,
+    as_attachment: bool = True,
+    as_inline: bool = False,
+    content_length: int = None,
+    default_content_type: Optional[str] = MimeType.FORCE_DOWNLOAD,
+) -> StreamingHttpResponse:
+    """
+    Serve up binary data from an iterable of chunks (e.g. a generator), which
+    is consumed as the response is sent, rather than being assembled in
+    memory first. Options as for :func:`serve_file`; supply
+    ``content_length`` if you know it.
+    """
+    response = StreamingHttpResponse(chunks)
+    add_http_headers_for_attachment(
+        response,
+        offered_filename=offered_filename,
+        content_type=content_type,
+        as_attachment=as_attachment,
+        as_inline=as_inline,
+        content_length=content_length,
+        default_content_type=default_content_type,
+    )
+    return response
+
+
 # =============================================================================
 # Simpler versions
 # =============================================================================
@@ -296,3 +528,39 @@ def serve_concatenated_pdf_from_memory(
         as_attachment=False,
         as_inline=True,
     )
+
+
+def stream_concatenated_pdf(
+    pdf_plans: Iterable[PdfPlan],
+    start_recto: bool = True,
+    offered_filename: str = "crate_download.pdf",
+    max_workers: int = None,
+    spool_max_size: int = DEFAULT_SPOOL_MAX_SIZE,
+) -> StreamingHttpResponse:
+    """
+    Concatenates PDFs (rendering HTML-mode plans in parallel; see
+    :func:`cardinal_pythonlib.pdf.gen_rendered_pdf_plans`) and streams the
+    result. The output PDF is spooled to a temporary file (in memory if
+    smaller than ``spool_max_size`` bytes, otherwise on disk) rather than
+    being held as a single ``bytes`` object.
+    """
+    spool = SpooledTemporaryFile(max_size=spool_max_size)
+    try:
+        write_concatenated_pdf(
+            pdf_plans,
+            spool,
+            start_recto=start_recto,
+            max_workers=max_workers,
+        )
+        content_length = spool.tell()
+    except Exception:
+        spool.close()
+        raise
+    return serve_stream(
+        gen_file_chunks(spool),
+        offered_filename=offered_filename,
+        content_type=MimeType.PDF,
+        as_attachment=False,
+        as_inline=True,
+        content_length=content_length,
+    )
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# cardinal_pythonlib/django/tests/function_cache_tests.py
+
+"""
+===============================================================================
+
+    Original code copyright (C) 2009-2022 Rudolf Cardinal (rudolf@pobox.com).
+
+    This file is part of cardinal_pythonlib.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+===============================================================================
+
+**Unit tests.**
+
+"""
+
+import time
+from typing import List
+import unittest
+from unittest import mock
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()  # the default cache is a LocMemCache
+
+# noinspection PyUnresolvedReferences
+from django.core.cache import caches  # noqa: E402
+
+from cardinal_pythonlib.django import function_cache  # noqa: E402
+from cardinal_pythonlib.django.function_cache import (  # noqa: E402
+    django_cache_function,
+    get_primitive_call_signature,
+    LOCK_KEY_SUFFIX,
+    make_cache_key,
+)
+
+
+def add(a, b=0):
+    return a + b
+
+
+class CallSignatureTests(unittest.TestCase):
+    def test_stable_for_equal_args(self) -> None:
+        sig = get_primitive_call_signature(add, (1, "x"), dict(b=2, c=None))
+        self.assertEqual(
+            sig,
+            get_primitive_call_signature(add, (1, "x"), dict(c=None, b=2)),
+        )
+        self.assertEqual(make_cache_key(sig), make_cache_key(sig))
+        # Must match across processes, so no hash() or id():
+        self.assertEqual(
+            get_primitive_call_signature(add, (1, 2.5), {}),
+            "py:add(1, 2.5)[]",
+        )
+
+    def test_distinct_for_different_types(self) -> None:
+        sigs = {
+            get_primitive_call_signature(add, (value,), {})
+            for value in (1, 1.0, True, "1", None)
+        }
+        self.assertEqual(len(sigs), 5)
+
+    def test_non_primitive_args(self) -> None:
+        for args, kwargs in (
+            (([1],), {}),
+            ((), dict(b=(1, 2))),
+            ((mock.sentinel.x,), {}),
+        ):
+            self.assertIsNone(get_primitive_call_signature(add, args, kwargs))
+
+
+class DjangoCacheFunctionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = caches["default"]
+        self.cache.clear()
+        self.calls: List[tuple] = []
+
+    def _add(self, a, b=0):
+        self.calls.append((a, b))
+        return a + b
+
+    def test_caches(self) -> None:
+        f = django_cache_function()(self._add)
+        self.assertEqual(f(1, b=2), 3)
+        self.assertEqual(f(1, b=2), 3)
+        self.assertEqual(f(1, 2), 3)  # different signature
+        self.assertEqual(f(True, b=2), 3)  # distinct from 1
+        self.assertEqual(self.calls, [(1, 2), (1, 2), (True, 2)])
+        self.assertEqual(f([1], b=[2]), [1, 2])  # via JSON signature
+        self.assertEqual(f([1], b=[2]), [1, 2])
+        self.assertEqual(len(self.calls), 4)
+
+    def test_call_many_batches(self) -> None:
+        f = django_cache_function()(self._add)
+        f(1)  # already cached
+        spy = mock.Mock(wraps=self.cache)
+        with mock.patch.object(function_cache, "cache", spy):
+            results = f.call_many(
+                [(1,), (2,), (3,), (2,)], [{}, {}, dict(b=10), {}]
+            )
+        self.assertEqual(results, [1, 2, 13, 2])
+        self.assertEqual(self.calls, [(1, 0), (2, 0), (3, 10)])
+        self.assertEqual(spy.get_many.call_count, 1)
+        self.assertEqual(spy.set_many.call_count, 1)
+        self.assertEqual(len(spy.set_many.call_args[0][0]), 2)
+        spy.get.assert_not_called()
+        spy.set.assert_not_called()
+
+        # Now all are cached, so nothing needs computing or storing:
+        spy.reset_mock()
+        with mock.patch.object(function_cache, "cache", spy):
+            self.assertEqual(
+                f.call_many([(3,), (2,)], [dict(b=10), {}]), [13, 2]
+            )
+        self.assertEqual(len(self.calls), 3)
+        spy.set_many.assert_not_called()
+
+    def _set_nearly_expired(self, fn, args) -> str:
+        """
+        Caches a stale value for ``fn(*args)``, expiring now and expensive to
+        compute, so an early recompute is (practically) certain.
+        """
+        call_sig = get_primitive_call_signature(fn, args, {})
+        key = make_cache_key(call_sig)
+        self.cache.set(key, (call_sig, "stale", 1000.0, time.time()))
+        return key
+
+    def test_early_recompute_by_one_caller(self) -> None:
+        results: List[str] = []
+
+        def slow(x):
+            self.calls.append((x,))
+            # Another caller arrives while we are recomputing:
+            results.append(f(x))
+            return "fresh"
+
+        f = django_cache_function(early_recompute_beta=1.0)(slow)
+        key = self._set_nearly_expired(slow, (1,))
+        self.assertEqual(f(1), "fresh")
+        self.assertEqual(self.calls, [(1,)])  # recomputed exactly once
+        self.assertEqual(results, ["stale"])  # the other caller didn't wait
+        self.assertIsNone(self.cache.get(key + LOCK_KEY_SUFFIX))  # released
+        self.assertEqual(self.cache.get(key)[1], "fresh")
+
+    def test_early_recompute_skipped_if_locked(self) -> None:
+        f = django_cache_function(early_recompute_beta=1.0)(self._add)
+        key = self._set_nearly_expired(self._add, (1,))
+        self.cache.add(key + LOCK_KEY_SUFFIX, 1)  # another worker's lock
+        self.assertEqual(f(1), "stale")
+        self.assertEqual(self.calls, [])
+
+    def test_no_early_recompute_by_default(self) -> None:
+        f = django_cache_function()(self._add)
+        self._set_nearly_expired(self._add, (1,))
+        self.assertEqual(f(1), "stale")
+        self.assertEqual(self.calls, [])
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# cardinal_pythonlib/django/tests/request_cache_tests.py
+
+"""
+===============================================================================
+
+    Original code copyright (C) 2009-2022 Rudolf Cardinal (rudolf@pobox.com).
+
+    This file is part of cardinal_pythonlib.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+===============================================================================
+
+**Unit tests.**
+
+"""
+
+from threading import Barrier, Thread
+from typing import Dict, List
+import unittest
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+# noinspection PyUnresolvedReferences
+from django.core.cache.backends.base import BaseCache  # noqa: E402
+
+# noinspection PyUnresolvedReferences
+from django.http import HttpResponse  # noqa: E402
+
+# noinspection PyUnresolvedReferences
+from django.test import RequestFactory  # noqa: E402
+
+from cardinal_pythonlib.django.request_cache import (  # noqa: E402
+    get_request_cache,
+    request_memoize,
+    RequestCacheMiddleware,
+    RequestMemoStore,
+)
+
+
+class RequestMemoStoreTests(unittest.TestCase):
+    def test_cache_api(self) -> None:
+        store = RequestMemoStore()
+        self.assertIsInstance(store, BaseCache)
+        store.set("a", 1)
+        self.assertEqual(store.get("a"), 1)
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.get("b", 2), 2)
+        self.assertEqual((store.hits, store.misses), (1, 2))
+
+        self.assertTrue(store.has_key("a"))
+        self.assertIn("a", store)
+        self.assertFalse(store.add("a", 99))
+        self.assertTrue(store.add("b", 2, timeout=60))
+        self.assertEqual(store.get_many(["a", "b", "c"]), {"a": 1, "b": 2})
+        store.set_many({"c": 3, "d": 4})
+        self.assertEqual(store.incr("c"), 4)
+        self.assertEqual(store.decr("c", 2), 2)
+        with self.assertRaises(ValueError):
+            store.incr("missing")
+        self.assertEqual(store.get_or_set("e", lambda: 5), 5)
+        self.assertEqual(store.get_or_set("e", 6), 5)
+        self.assertTrue(store.touch("e"))
+        self.assertFalse(store.touch("missing"))
+
+        self.assertTrue(store.delete("e"))
+        self.assertFalse(store.delete("e"))
+        store.delete_many(["c", "d"])
+        self.assertEqual(len(store), 2)
+        store.clear()
+        self.assertEqual(len(store), 0)
+
+    def test_versions_and_timeouts(self) -> None:
+        store = RequestMemoStore()
+        store.set("k", "v1")
+        store.set("k", "v2", version=2)
+        self.assertEqual(store.get("k"), "v1")
+        self.assertEqual(store.get("k", version=1), "v1")
+        self.assertEqual(store.get("k", version=2), "v2")
+        store.set("k", "gone", timeout=0)  # expires at once
+        self.assertFalse(store.has_key("k"))
+        store.set("k", "kept", timeout=None)  # never expires
+        self.assertEqual(store.get("k"), "kept")
+
+    def test_non_string_keys(self) -> None:
+        store = RequestMemoStore()
+        store.set(("fn", (1, 2)), 3)
+        self.assertEqual(store.get(("fn", (1, 2))), 3)
+        with self.assertRaises(TypeError):
+            store.get(["unhashable"])
+
+    def test_lru(self) -> None:
+        store = RequestMemoStore(maxsize=2)
+        store.set("a", 1)
+        store.set("b", 2)
+        store.get("a")  # now most recently used
+        store.set("c", 3)
+        self.assertEqual(store.get_many(["a", "b", "c"]), {"a": 1, "c": 3})
+
+
+class RequestMemoizeTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.factory = RequestFactory()
+        self.calls: List[tuple] = []
+
+        @request_memoize
+        def square(x, offset=0):
+            self.calls.append((x, offset))
+            return x * x + offset
+
+        self.square = square
+
+    def _in_request(self, view) -> HttpResponse:
+        """
+        Runs ``view`` within a request, via the middleware.
+        """
+        middleware = RequestCacheMiddleware(view)
+        return middleware(self.factory.get("/"))
+
+    def test_outside_request(self) -> None:
+        self.assertEqual(self.square(3), 9)
+        self.assertEqual(self.square(3), 9)
+        self.assertEqual(len(self.calls), 2)  # not memoized
+
+    def test_memoized_within_request(self) -> None:
+        def view(request) -> HttpResponse:
+            self.assertEqual(self.square(3), 9)
+            self.assertEqual(self.square(3), 9)
+            self.assertEqual(self.square(3, offset=1), 10)
+            self.assertEqual(self.square(x=3, offset=1), 10)
+            self.assertEqual(get_request_cache().hits, 1)
+            return HttpResponse()
+
+        self._in_request(view)
+        self.assertEqual(self.calls, [(3, 0), (3, 1), (3, 1)])
+        # The store is discarded at the end of the request:
+        self._in_request(view)
+        self.assertEqual(len(self.calls), 6)
+        with self.assertRaises(AssertionError):
+            get_request_cache()
+
+    def test_unhashable_args(self) -> None:
+        @request_memoize
+        def total(values):
+            self.calls.append(tuple(values))
+            return sum(values)
+
+        def view(request) -> HttpResponse:
+            self.assertEqual(total([1, 2]), 3)
+            self.assertEqual(total([1, 2]), 3)
+            return HttpResponse()
+
+        self._in_request(view)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_concurrent_requests_isolated(self) -> None:
+        n = 4
+        barrier = Barrier(n)
+        seen: Dict[int, list] = {}
+
+        def make_view(i: int):
+            def view(request) -> HttpResponse:
+                store = get_request_cache()
+                store.set("who", i)
+                barrier.wait(timeout=10)  # all requests are now in progress
+                seen[i] = [store.get("who"), len(store)]
+                return HttpResponse()
+
+            return view
+
+        threads = [
+            Thread(target=self._in_request, args=(make_view(i),))
+            for i in range(n)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(seen, {i: [i, 1] for i in range(n)})
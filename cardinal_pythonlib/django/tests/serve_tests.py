@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# cardinal_pythonlib/django/tests/serve_tests.py
+
+"""
+===============================================================================
+
+    Original code copyright (C) 2009-2022 Rudolf Cardinal (rudolf@pobox.com).
+
+    This file is part of cardinal_pythonlib.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+===============================================================================
+
+**Unit tests.**
+
+"""
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+# noinspection PyUnresolvedReferences
+from django.http import StreamingHttpResponse  # noqa: E402
+
+# noinspection PyUnresolvedReferences
+from django.test import RequestFactory  # noqa: E402
+
+# noinspection PyUnresolvedReferences
+from django.utils.http import http_date  # noqa: E402
+
+from cardinal_pythonlib.django import serve  # noqa: E402
+from cardinal_pythonlib.django.serve import (  # noqa: E402
+    gen_file_chunks,
+    parse_http_byte_range,
+    serve_file,
+    serve_stream,
+)
+
+DATA = bytes(range(100))
+
+
+class ParseHttpByteRangeTests(unittest.TestCase):
+    def test_ranges(self) -> None:
+        size = 100
+        for header, expected in (
+            (None, None),
+            ("", None),
+            ("bytes=0-4", (0, 4)),
+            ("bytes = 10 - 19", (10, 19)),
+            ("bytes=95-200", (95, 99)),  # end clipped
+            ("bytes=90-", (90, 99)),  # open-ended
+            ("bytes=-3", (97, 99)),  # suffix
+            ("bytes=-500", (0, 99)),  # suffix longer than entity
+            ("bytes=0-1,3-4", None),  # multiple ranges: unsupported
+            ("bytes=5-2", None),  # invalid: ignored
+            ("bytes=-", None),
+            ("items=0-4", None),
+        ):
+            self.assertEqual(parse_http_byte_range(header, size), expected)
+
+    def test_unsatisfiable(self) -> None:
+        for header, size in (
+            ("bytes=100-", 100),
+            ("bytes=200-300", 100),
+            ("bytes=-0", 100),
+            ("bytes=-5", 0),
+        ):
+            with self.assertRaises(ValueError):
+                parse_http_byte_range(header, size)
+
+
+class ServeFileTests(unittest.TestCase):
+    def setUp(self) -> None:
+        fd, self.filename = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as f:
+            f.write(DATA)
+        self.factory = RequestFactory()
+
+    def tearDown(self) -> None:
+        os.remove(self.filename)
+
+    def _serve(self, **headers):
+        request = self.factory.get("/file", **headers)
+        return serve_file(self.filename, request=request)
+
+    @staticmethod
+    def _body(response) -> bytes:
+        try:
+            return b"".join(response.streaming_content)
+        finally:
+            response.close()
+
+    def test_whole_file(self) -> None:
+        response = serve_file(self.filename)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertIn("Last-Modified", response)
+        self.assertEqual(self._body(response), DATA)
+
+    def test_range(self) -> None:
+        response = self._serve(HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/100")
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(self._body(response), DATA[10:20])
+
+        response = self._serve(HTTP_RANGE="bytes=-5")
+        self.assertEqual(response["Content-Range"], "bytes 95-99/100")
+        self.assertEqual(self._body(response), DATA[95:])
+
+        response = self._serve(HTTP_RANGE="bytes=98-")
+        self.assertEqual(self._body(response), DATA[98:])
+
+    def test_unsatisfiable_range(self) -> None:
+        response = self._serve(HTTP_RANGE="bytes=100-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */100")
+
+    def test_not_modified(self) -> None:
+        etag = serve_file(self.filename)["ETag"]
+        response = self._serve(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        last_modified = int(os.stat(self.filename).st_mtime)
+        response = self._serve(HTTP_IF_MODIFIED_SINCE=http_date(last_modified))
+        self.assertEqual(response.status_code, 304)
+
+        response = self._serve(HTTP_IF_NONE_MATCH='"something-else"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._body(response), DATA)
+
+    def test_if_range(self) -> None:
+        etag = serve_file(self.filename)["ETag"]
+        last_modified = http_date(int(os.stat(self.filename).st_mtime))
+        for if_range, expected_status in (
+            (etag, 206),  # matching ETag
+            ('"something-else"', 200),  # changed: send the whole entity
+            (f"W/{etag}", 200),  # weak ETags never match
+            (last_modified, 206),  # matching date
+            (http_date(0), 200),  # different date
+        ):
+            response = self._serve(
+                HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=if_range
+            )
+            self.assertEqual(response.status_code, expected_status, if_range)
+            body = self._body(response)
+            self.assertEqual(
+                body, DATA[:10] if expected_status == 206 else DATA
+            )
+
+    def test_file_closed_if_body_not_read(self) -> None:
+        opened = []
+        real_open = open
+
+        def tracking_open(*args, **kwargs):
+            f = real_open(*args, **kwargs)
+            opened.append(f)
+            return f
+
+        with mock.patch.object(serve, "open", tracking_open, create=True):
+            for headers in ({}, {"HTTP_RANGE": "bytes=0-9"}):
+                response = self._serve(**headers)
+                response.close()  # as the WSGI server does, e.g. for HEAD
+        self.assertEqual(len(opened), 2)
+        self.assertTrue(all(f.closed for f in opened))
+
+
+class StreamingTests(unittest.TestCase):
+    def test_gen_file_chunks(self) -> None:
+        f = io.BytesIO(DATA)
+        chunks = list(gen_file_chunks(f, start=10, length=25, chunk_size=10))
+        self.assertEqual([len(c) for c in chunks], [10, 10, 5])
+        self.assertEqual(b"".join(chunks), DATA[10:35])
+        self.assertTrue(f.closed)
+
+        # Closed with the response, even if never iterated:
+        f = io.BytesIO(DATA)
+        StreamingHttpResponse(gen_file_chunks(f)).close()
+        self.assertTrue(f.closed)
+
+    def test_serve_stream(self) -> None:
+        response = serve_stream(
+            (bytes([i]) * 10 for i in range(3)),
+            offered_filename="x.bin",
+            content_length=30,
+        )
+        self.assertEqual(response["Content-Length"], "30")
+        self.assertEqual(
+            response["Content-Disposition"], "attachment; filename=x.bin"
+        )
+        self.assertEqual(
+            b"".join(response.streaming_content),
+            b"\x00" * 10 + b"\x01" * 10 + b"\x02" * 10,
+        )
@@ -74,6 +74,30 @@
       discussion below as to why ``"repr"`` is suitable while ``"str"`` is
       not).
 
+4.  A two-tier cache: :class:`LRUProxyBackend` keeps a bounded in-process
+    cache in front of a (typically shared, e.g. memcached) backend:
+
+    .. code-block:: python
+
+        from dogpile.cache import make_region
+        from cardinal_pythonlib.dogpile_cache import fkg, LRUProxyBackend
+
+        cache_region = make_region().configure(
+            "dogpile.cache.memcached",
+            expiration_time=3600,
+            arguments={"url": "127.0.0.1:11211"},
+            wrap=[LRUProxyBackend(maxsize=10000, local_expiration_time=60)],
+        )
+
+        @cache_region.cache_on_arguments(function_key_generator=fkg)
+        def myfunc(x: int) -> int:
+            return x * 2
+
+    Batch lookups via ``cache_multi_on_arguments`` (with
+    :func:`multikey_fkg_allowing_type_hints`) are answered from the local
+    tier where possible, with a single ``get_multi`` call to the shared
+    backend for the remainder.
+
 """  # noqa: E501
 
 
@@ -81,9 +105,19 @@
 # Imports; logging
 # =============================================================================
 
+from collections import OrderedDict
 import inspect
 import logging
-from typing import Any, Callable, Dict, List, Optional
+import pickle
+from threading import Lock
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# noinspection PyPackageRequirements
+from dogpile.cache.api import NO_VALUE
+
+# noinspection PyPackageRequirements
+from dogpile.cache.proxy import ProxyBackend
 
 log = logging.getLogger(__name__)
 
@@ -185,6 +219,7 @@ def fkg_allowing_type_hints(
         if p.kind == inspect.Parameter.POSITIONAL_OR_KEYWORD
     ]
     has_self = bool(argnames and argnames[0] in ("self", "cls"))
+    prefix = namespace + "|"
 
     if DEBUG_INTERNALS:
         log.debug(
@@ -207,8 +242,8 @@ def fkg_allowing_type_hints(
         if has_self:
             # Unlike dogpile's default, make it instance- (or class-) specific
             # by including a representation of the "self" or "cls" argument:
-            args = [hex(id(args[0]))] + list(args[1:])
-        key = namespace + "|" + " ".join(map(to_str, args))
+            args = (hex(id(args[0])),) + args[1:]
+        key = prefix + " ".join(map(to_str, args))
         if DEBUG_INTERNALS:
             log.debug(
                 f"fkg_allowing_type_hints.generate_key("
@@ -240,6 +275,7 @@ def multikey_fkg_allowing_type_hints(
         if p.kind == inspect.Parameter.POSITIONAL_OR_KEYWORD
     ]
     has_self = bool(argnames and argnames[0] in ("self", "cls"))
+    prefix = namespace + "|"
 
     def generate_keys(*args: Any, **kw: Any) -> List[str]:
         if kw:
@@ -251,8 +287,8 @@ def multikey_fkg_allowing_type_hints(
         if has_self:
             # Unlike dogpile's default, make it instance- (or class-) specific
             # by including a representation of the "self" or "cls" argument:
-            args = [hex(id(args[0]))] + list(args[1:])
-        keys = [namespace + "|" + key for key in map(to_str, args)]
+            args = (hex(id(args[0])),) + args[1:]
+        keys = [prefix + key for key in map(to_str, args)]
         if DEBUG_INTERNALS:
             log.debug(
                 f"multikey_fkg_allowing_type_hints.generate_keys() -> {keys!r}"
@@ -297,6 +333,14 @@ def kw_fkg_allowing_type_hints(
         if p.kind == inspect.Parameter.POSITIONAL_OR_KEYWORD
     ]
     has_self = bool(argnames and argnames[0] in ("self", "cls"))
+    n_argnames = len(argnames)
+    # Work out default values once, not at every call:
+    defaults = {
+        p.name: p.default
+        for p in parameters
+        if p.default is not inspect.Parameter.empty
+    }  # type: Dict[str, Any]
+    prefix = namespace + "|"
 
     if DEBUG_INTERNALS:
         param_str = ", ".join(repr_parameter(p) for p in parameters)
@@ -307,31 +351,20 @@ def kw_fkg_allowing_type_hints(
         )
 
     def generate_key(*args: Any, **kwargs: Any) -> str:
-        as_kwargs = {}  # type: Dict[str, Any]
-        loose_args = []  # type: List[Any]  # those captured by *args
-        # 1. args: get the name as well.
-        for idx, arg in enumerate(args):
-            if idx >= len(argnames):
-                # positional argument to be scooped up with *args
-                loose_args.append(arg)
-            else:
-                # normal plain positional argument
-                if has_self and idx == 0:  # "self" or "cls" initial argument
-                    argvalue = hex(id(arg))
-                else:
-                    argvalue = arg
-                as_kwargs[argnames[idx]] = argvalue
-        # 1b. args with no name
-        if loose_args:
-            as_kwargs["*args"] = loose_args
+        # 1. Default values (overridden by anything passed in).
+        as_kwargs = defaults.copy()  # type: Dict[str, Any]
+        # 2. args: get the name as well.
+        as_kwargs.update(zip(argnames, args))
+        if has_self and args:
+            # "self" or "cls" initial argument
+            as_kwargs[argnames[0]] = hex(id(args[0]))
+        # 2b. args with no name (those captured by *args)
+        if len(args) > n_argnames:
+            as_kwargs["*args"] = list(args[n_argnames:])
             # '*args' is guaranteed not to be a parameter name in its own right
-        # 2. kwargs
-        as_kwargs.update(kwargs)
-        # 3. default values
-        for param in parameters:
-            if param.default != inspect.Parameter.empty:
-                if param.name not in as_kwargs:
-                    as_kwargs[param.name] = param.default
+        # 3. kwargs
+        if kwargs:
+            as_kwargs.update(kwargs)
         # 4. sorted by name
         #    ... but also incorporating the name of the argument, because once
         #    we allow the arbitrary **kwargs format, order is no longer
@@ -339,11 +372,9 @@ def kw_fkg_allowing_type_hints(
         #       fn(p="another", q="thing")
         #    from
         #       fn(r="another", s="thing")
-        argument_values = [
-            "{k}={v}".format(k=key, v=to_str(as_kwargs[key]))
-            for key in sorted(as_kwargs.keys())
-        ]
-        key = namespace + "|" + " ".join(argument_values)
+        key = prefix + " ".join(
+            [f"{k}={to_str(as_kwargs[k])}" for k in sorted(as_kwargs)]
+        )
         if DEBUG_INTERNALS:
             log.debug(f"kw_fkg_allowing_type_hints.generate_key() -> {key!r}")
         return key
@@ -362,3 +393,244 @@ fkg = kw_fkg_allowing_type_hints
 # @mycache.cache_on_arguments(function_key_generator=fkg)
 # def myfunc():
 #     pass
+
+
+# =============================================================================
+# Two-tier caching: in-process LRU cache in front of another backend
+# =============================================================================
+
+
+class LRUProxyBackend(ProxyBackend):
+    """
+    A ``dogpile.cache`` proxy backend that keeps a bounded, in-process,
+    least-recently-used (LRU) cache in front of another backend (typically a
+    shared one, such as memcached), saving a network round trip for
+    frequently used values. Use it via the ``wrap`` argument to
+    ``CacheRegion.configure()``; see the module docstring.
+
+    Values are stored as the region supplies them (i.e. including their
+    creation time), so the region's own expiry and invalidation still apply.
+
+    **Values are copied.** By default, each value is pickled when stored
+    locally and unpickled when returned, so every caller gets its own copy
+    (as it would from a shared backend); mutating a value you were given
+    cannot corrupt the local cache. Values that can't be pickled are not
+    cached locally. If your values are immutable (or never mutated), pass
+    ``copy_values=False`` to store and return the values themselves, which
+    is faster.
+    However, changes made to the shared backend by other processes will not
+    be seen until the local copy is evicted or expires, so set
+    ``local_expiration_time`` to bound that delay.
+
+    With ``dogpile.cache`` 1.1 or later, regions whose backend serializes
+    values (e.g. memcached, Redis, or ``dogpile.cache.memory_pickle``) call
+    the ``*_serialized*`` methods instead; those are cached too, holding the
+    serialized bytes (separately from any unserialized values for the same
+    key).
+
+    Thread-safe.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        local_expiration_time: float = None,
+        copy_values: bool = True,
+    ) -> None:
+        """
+        Args:
+            maxsize:
+                Maximum number of values to hold locally.
+            local_expiration_time:
+                Time (in seconds) for which a local copy may be used without
+                consulting the proxied backend; ``None`` for no limit.
+            copy_values:
+                Store (pickled) copies of values locally, and return a fresh
+                copy each time? Set this to ``False`` only if cached values
+                are never mutated. (Serialized values are bytes, so are never
+                copied.)
+        """
+        super().__init__()
+        assert maxsize > 0, "maxsize must be positive"
+        self.maxsize = maxsize
+        self.local_expiration_time = local_expiration_time
+        self.copy_values = copy_values
+        self.hits = 0
+        self.misses = 0
+        # Maps key (or _serialized_key(key)) -> (value, local expiry time or
+        # None):
+        self._cache: "OrderedDict[Any, Tuple[Any, Optional[float]]]" = (
+            OrderedDict()
+        )
+        self._lock = Lock()
+
+    # -------------------------------------------------------------------------
+    # Local cache
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _serialized_key(key: str) -> Tuple[str, str]:
+        """
+        Local cache key for the serialized form of the value for ``key``.
+        """
+        return "serialized", key
+
+    def _local_get(self, key: Any) -> Any:
+        """
+        Returns a value from the local cache, or ``NO_VALUE``. Must be called
+        with the lock held.
+        """
+        item = self._cache.get(key)
+        if item is None:
+            self.misses += 1
+            return NO_VALUE
+        value, expires = item
+        if expires is not None and expires < time.monotonic():
+            del self._cache[key]
+            self.misses += 1
+            return NO_VALUE
+        self._cache.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _local_set(self, key: Any, value: Any) -> None:
+        """
+        Stores a value in the local cache, evicting the least recently used
+        value(s) if necessary. Storing ``NO_VALUE`` removes any local value.
+        Must be called with the lock held.
+        """
+        if value is NO_VALUE:
+            self._cache.pop(key, None)  # don't keep a stale value
+            return
+        expires = (
+            None
+            if self.local_expiration_time is None
+            else time.monotonic() + self.local_expiration_time
+        )
+        self._cache[key] = (value, expires)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def _freeze(self, value: Any) -> Any:
+        """
+        Returns the form of a (non-serialized) value to store locally: a
+        pickled copy if ``copy_values`` is set, or ``NO_VALUE`` (i.e. don't
+        store it) if it can't be pickled.
+        """
+        if not self.copy_values or value is NO_VALUE:
+            return value
+        try:
+            return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception:  # e.g. PicklingError, TypeError, AttributeError
+            log.debug("LRUProxyBackend: not caching unpicklable value")
+            return NO_VALUE
+
+    def _thaw(self, stored: Any) -> Any:
+        """
+        Reverses :meth:`_freeze`, giving the caller its own copy.
+        """
+        if not self.copy_values or stored is NO_VALUE:
+            return stored
+        return pickle.loads(stored)
+
+    def clear_local(self) -> None:
+        """
+        Empties the local cache (without affecting the proxied backend).
+        """
+        with self._lock:
+            self._cache.clear()
+
+    # -------------------------------------------------------------------------
+    # Backend API
+    # -------------------------------------------------------------------------
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            stored = self._local_get(key)
+        if stored is not NO_VALUE:
+            return self._thaw(stored)
+        value = self.proxied.get(key)
+        stored = self._freeze(value)
+        with self._lock:
+            self._local_set(key, stored)
+        return value
+
+    def get_multi(self, keys: Sequence[str]) -> List[Any]:
+        with self._lock:
+            values = [self._local_get(key) for key in keys]
+        values = [self._thaw(stored) for stored in values]
+        missing = [i for i, value in enumerate(values) if value is NO_VALUE]
+        if missing:
+            # One call to the proxied backend for everything we lack:
+            fetched = self.proxied.get_multi([keys[i] for i in missing])
+            to_store = [self._freeze(value) for value in fetched]
+            with self._lock:
+                for i, value, stored in zip(missing, fetched, to_store):
+                    values[i] = value
+                    self._local_set(keys[i], stored)
+        return values
+
+    def set(self, key: str, value: Any) -> None:
+        self.proxied.set(key, value)
+        stored = self._freeze(value)
+        with self._lock:
+            self._local_set(key, stored)
+
+    def set_multi(self, mapping: Dict[str, Any]) -> None:
+        self.proxied.set_multi(mapping)
+        to_store = [
+            (key, self._freeze(value)) for key, value in mapping.items()
+        ]
+        with self._lock:
+            for key, stored in to_store:
+                self._local_set(key, stored)
+
+    def get_serialized(self, key: str) -> Any:
+        lkey = self._serialized_key(key)
+        with self._lock:
+            value = self._local_get(lkey)
+        if value is NO_VALUE:
+            value = self.proxied.get_serialized(key)
+            with self._lock:
+                self._local_set(lkey, value)
+        return value
+
+    def get_serialized_multi(self, keys: Sequence[str]) -> List[Any]:
+        lkeys = [self._serialized_key(key) for key in keys]
+        with self._lock:
+            values = [self._local_get(lkey) for lkey in lkeys]
+        missing = [i for i, value in enumerate(values) if value is NO_VALUE]
+        if missing:
+            fetched = self.proxied.get_serialized_multi(
+                [keys[i] for i in missing]
+            )
+            with self._lock:
+                for i, value in zip(missing, fetched):
+                    values[i] = value
+                    self._local_set(lkeys[i], value)
+        return values
+
+    def set_serialized(self, key: str, value: bytes) -> None:
+        self.proxied.set_serialized(key, value)
+        with self._lock:
+            self._local_set(self._serialized_key(key), value)
+
+    def set_serialized_multi(self, mapping: Dict[str, bytes]) -> None:
+        self.proxied.set_serialized_multi(mapping)
+        with self._lock:
+            for key, value in mapping.items():
+                self._local_set(self._serialized_key(key), value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._cache.pop(key, None)
+            self._cache.pop(self._serialized_key(key), None)
+        self.proxied.delete(key)
+
+    def delete_multi(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
+                self._cache.pop(self._serialized_key(key), None)
+        self.proxied.delete_multi(keys)
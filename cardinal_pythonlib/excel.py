@@ -31,9 +31,28 @@
 # =============================================================================
 
 import datetime
+from decimal import Decimal
 import io
-from typing import Any
+from itertools import islice
+import numbers
+import re
+import tempfile
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 import uuid
+from xml.sax.saxutils import escape, quoteattr
+import zipfile
 
 from numpy import float64
 from openpyxl import Workbook
@@ -48,6 +67,13 @@ from semantic_version import Version
 # ISO 8601, e.g. 2013-07-24T20:04:07+0100)
 ISO8601_STRFTIME_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
 
+DEFAULT_STREAM_CHUNK_ROWS = 1000
+ODS_MIMETYPE = "application/vnd.oasis.opendocument.spreadsheet"
+
+# A sheet for the streaming writers: (sheet_name, rows), where rows is an
+# iterable (e.g. a generator) of sequences of values.
+SheetRowsType = Tuple[str, Iterable[Sequence[Any]]]
+
 
 # =============================================================================
 # Conversion functions
@@ -157,3 +183,319 @@ def convert_for_pyexcel_ods3(x: Any) -> Any:
         return str(x)
     else:
         return x
+
+
+# =============================================================================
+# Streaming (write-only) export
+# =============================================================================
+# Building a complete Workbook and then saving it holds every cell in memory
+# (several hundred bytes per cell in openpyxl). The functions below consume
+# rows from iterables (e.g. database cursors or generators) instead, so memory
+# use does not depend on the number of rows.
+
+_OPENPYXL_PASSTHROUGH = object()
+_openpyxl_converters: Dict[type, Any] = {}
+
+
+def _openpyxl_converter_for_type(t: type) -> Any:
+    """
+    Returns the conversion function for values of type ``t``, or
+    ``_OPENPYXL_PASSTHROUGH`` if they need no conversion. Cached by type, so
+    the chain of ``isinstance`` checks in :func:`convert_for_openpyxl` is
+    done once per type, not once per cell.
+    """
+    try:
+        return _openpyxl_converters[t]
+    except KeyError:
+        pass
+    if issubclass(t, (DateTime, datetime.datetime, Version, uuid.UUID)):
+        converter = convert_for_openpyxl
+    else:
+        converter = _OPENPYXL_PASSTHROUGH
+    _openpyxl_converters[t] = converter
+    return converter
+
+
+def convert_rows_for_openpyxl(
+    rows: Iterable[Sequence[Any]],
+) -> Generator[List[Any], None, None]:
+    """
+    Applies :func:`convert_for_openpyxl` to every value in a sequence of rows,
+    generating converted rows (lists).
+    """
+    converters = _openpyxl_converters
+    passthrough = _OPENPYXL_PASSTHROUGH
+    for row in rows:
+        converted = list(row)
+        for i, v in enumerate(converted):
+            t = type(v)
+            converter = converters.get(t) or _openpyxl_converter_for_type(t)
+            if converter is not passthrough:
+                converted[i] = converter(v)
+        yield converted
+
+
+def write_xlsx_streaming(
+    output: Union[str, BinaryIO], sheets: Iterable[SheetRowsType]
+) -> None:
+    """
+    Writes an XLSX file using ``openpyxl``'s write-only mode, consuming rows
+    as it goes. (``openpyxl`` spools each sheet to a temporary file and
+    assembles the ZIP file at the end.)
+
+    Args:
+        output: filename or binary file-like object
+        sheets: iterable of ``(sheet_name, rows)`` tuples
+    """
+    wb = Workbook(write_only=True)
+    for sheet_name, rows in sheets:
+        ws = wb.create_sheet(title=sheet_name)
+        for row in convert_rows_for_openpyxl(rows):
+            ws.append(row)
+    wb.save(output)
+
+
+def make_xlsx_tempfile(sheets: Iterable[SheetRowsType]) -> BinaryIO:
+    """
+    As for :func:`write_xlsx_streaming`, but writes to an anonymous temporary
+    file, which is returned open and positioned at the start (e.g. to be
+    streamed to a client; it is deleted when closed).
+    """
+    f = tempfile.TemporaryFile()
+    try:
+        write_xlsx_streaming(f, sheets)
+        f.seek(0)
+    except Exception:
+        f.close()
+        raise
+    return f
+
+
+# -----------------------------------------------------------------------------
+# ODS
+# -----------------------------------------------------------------------------
+# openpyxl does not write ODS, so we write the OpenDocument XML directly into
+# a ZIP file, one row at a time. Value conversion follows
+# convert_for_pyexcel_ods3(). Because zipfile can write to an unseekable
+# stream, the file can be generated in chunks, e.g. for an HTTP response.
+
+_XML_ILLEGAL_CHARS_REGEX = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_ODS_MANIFEST = f"""<?xml version="1.0" encoding="UTF-8"?>
+<manifest:manifest
+ xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0"
+ manifest:version="1.2">
+ <manifest:file-entry manifest:full-path="/" manifest:version="1.2"
+  manifest:media-type="{ODS_MIMETYPE}"/>
+ <manifest:file-entry manifest:full-path="content.xml"
+  manifest:media-type="text/xml"/>
+</manifest:manifest>
+"""
+
+_ODS_CONTENT_START = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content
+ xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+ xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+ xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+ office:version="1.2">
+<office:body><office:spreadsheet>
+"""
+
+_ODS_CONTENT_END = """</office:spreadsheet></office:body>
+</office:document-content>
+"""
+
+_ODS_EMPTY_CELL = "<table:table-cell/>"
+# A table needs at least one row (as LibreOffice writes for an empty sheet):
+_ODS_EMPTY_ROW = f"<table:table-row>{_ODS_EMPTY_CELL}</table:table-row>\n"
+
+
+def _ods_string_cell(x: Any) -> str:
+    text = escape(_XML_ILLEGAL_CHARS_REGEX.sub("", str(x)))
+    if not text:
+        return _ODS_EMPTY_CELL
+    return (
+        f'<table:table-cell office:value-type="string">'
+        f"<text:p>{text}</text:p></table:table-cell>"
+    )
+
+
+def _ods_number_cell(x: Any) -> str:
+    v = float(x)
+    if v != v or v in (float("inf"), float("-inf")):
+        return _ods_string_cell(x)  # NaN/infinity: not valid ODS numbers
+    # Integers and Decimals keep their exact text; floats round-trip via
+    # repr().
+    text = str(x) if isinstance(x, (numbers.Integral, Decimal)) else repr(v)
+    return (
+        f'<table:table-cell office:value-type="float" office:value="{text}">'
+        f"<text:p>{text}</text:p></table:table-cell>"
+    )
+
+
+def _ods_bool_cell(x: Any) -> str:
+    text = "true" if x else "false"
+    return (
+        f'<table:table-cell office:value-type="boolean" '
+        f'office:boolean-value="{text}">'
+        f"<text:p>{text.upper()}</text:p></table:table-cell>"
+    )
+
+
+def _ods_date_cell(x: datetime.date) -> str:
+    text = x.isoformat()
+    return (
+        f'<table:table-cell office:value-type="date" '
+        f'office:date-value="{text}"><text:p>{text}</text:p>'
+        f"</table:table-cell>"
+    )
+
+
+def _ods_datetime_cell(x: datetime.datetime) -> str:
+    # As for convert_for_pyexcel_ods3(), keeping any timezone information.
+    return _ods_string_cell(x.strftime(ISO8601_STRFTIME_FORMAT))
+
+
+_ods_cell_writers: Dict[type, Callable[[Any], str]] = {
+    type(None): lambda x: _ODS_EMPTY_CELL,
+}
+
+
+def _ods_cell_writer_for_type(t: type) -> Callable[[Any], str]:
+    """
+    Returns a function to produce the XML for a cell containing a value of
+    type ``t`` (cached by type).
+    """
+    try:
+        return _ods_cell_writers[t]
+    except KeyError:
+        pass
+    if issubclass(t, (DateTime, datetime.datetime)):
+        writer = _ods_datetime_cell
+    elif issubclass(t, datetime.date):
+        writer = _ods_date_cell
+    elif issubclass(t, bool):
+        writer = _ods_bool_cell
+    elif issubclass(t, (numbers.Real, Decimal)):
+        # Including NumPy numbers. (Decimal is not a numbers.Real.)
+        writer = _ods_number_cell
+    else:  # strings, Version, UUID, etc.
+        writer = _ods_string_cell
+    _ods_cell_writers[t] = writer
+    return writer
+
+
+def _gen_ods_row_xml(
+    rows: Iterable[Sequence[Any]],
+) -> Generator[Tuple[int, str], None, None]:
+    """
+    Generates ``n_cells, xml`` for each row of an ODS sheet.
+    """
+    writers = _ods_cell_writers
+    for row in rows:
+        cells = [
+            (writers.get(type(v)) or _ods_cell_writer_for_type(type(v)))(v)
+            for v in row
+        ]
+        yield len(cells), (
+            f"<table:table-row>{''.join(cells)}</table:table-row>\n"
+        )
+
+
+class _ChunkSink(object):
+    """
+    Minimal unseekable binary "file" that accumulates written data until it
+    is collected.
+    """
+
+    def __init__(self) -> None:
+        self._chunks = []  # type: List[bytes]
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def gen_ods_chunks(
+    sheets: Iterable[SheetRowsType],
+    chunk_rows: int = DEFAULT_STREAM_CHUNK_ROWS,
+) -> Generator[bytes, None, None]:
+    """
+    Generates an ODS (OpenDocument spreadsheet) file as a series of binary
+    chunks, consuming rows as it goes. Suitable for a streaming HTTP response
+    (e.g. :class:`cardinal_pythonlib.pyramid.responses.OdsStreamResponse`).
+
+    Args:
+        sheets: iterable of ``(sheet_name, rows)`` tuples
+        chunk_rows: number of rows to write between yielding data
+
+    The column declaration must precede a sheet's rows, so the number of
+    columns is taken from the first ``chunk_rows`` rows of each sheet.
+    """
+    if chunk_rows < 1:
+        raise ValueError(f"chunk_rows must be positive, not {chunk_rows!r}")
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        # The "mimetype" file must come first, uncompressed.
+        zf.writestr("mimetype", ODS_MIMETYPE, compress_type=zipfile.ZIP_STORED)
+        zf.writestr("META-INF/manifest.xml", _ODS_MANIFEST)
+        # The content size is not known in advance, so allow ZIP64.
+        with zf.open("content.xml", "w", force_zip64=True) as content:
+            content.write(_ODS_CONTENT_START.encode("utf-8"))
+            for sheet_name, rows in sheets:
+                row_xmls = _gen_ods_row_xml(rows)
+                batch = list(islice(row_xmls, chunk_rows))
+                n_columns = max([n_cells for n_cells, _ in batch] + [1])
+                content.write(
+                    (
+                        f"<table:table table:name={quoteattr(sheet_name)}>\n"
+                        f"<table:table-column "
+                        f'table:number-columns-repeated="{n_columns}"/>\n'
+                    ).encode("utf-8")
+                )
+                if not batch:
+                    content.write(_ODS_EMPTY_ROW.encode("utf-8"))
+                while batch:
+                    content.write(
+                        "".join(xml for _, xml in batch).encode("utf-8")
+                    )
+                    if len(batch) < chunk_rows:
+                        break  # that was the last
+                    yield sink.pop()
+                    batch = list(islice(row_xmls, chunk_rows))
+                content.write(b"</table:table>\n")
+            content.write(_ODS_CONTENT_END.encode("utf-8"))
+    yield sink.pop()
+
+
+def write_ods_streaming(
+    output: Union[str, BinaryIO],
+    sheets: Iterable[SheetRowsType],
+    chunk_rows: int = DEFAULT_STREAM_CHUNK_ROWS,
+) -> None:
+    """
+    Writes an ODS file via :func:`gen_ods_chunks`.
+
+    Args:
+        output: filename or binary file-like object
+        sheets: iterable of ``(sheet_name, rows)`` tuples
+        chunk_rows: number of rows to write between file writes
+    """
+    f: Optional[BinaryIO] = None
+    if isinstance(output, str):
+        f = output = open(output, "wb")
+    try:
+        for chunk in gen_ods_chunks(sheets, chunk_rows=chunk_rows):
+            if chunk:
+                output.write(chunk)
+    finally:
+        if f is not None:
+            f.close()
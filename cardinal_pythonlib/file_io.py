@@ -26,12 +26,15 @@
 
 """
 
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 import csv
 import fnmatch
+from functools import partial
 import gzip
 from html import escape
 import io
+from itertools import chain, count, islice
+import mmap
 from operator import attrgetter
 import os
 import shutil
@@ -41,21 +44,34 @@ import tempfile
 from typing import (
     Any,
     BinaryIO,
+    Callable,
+    Dict,
     Generator,
     Iterable,
+    Iterator,
     IO,
     List,
+    Optional,
+    Sequence,
     TextIO,
     Tuple,
+    TYPE_CHECKING,
     Union,
 )
 import zipfile
 
 from cardinal_pythonlib.logs import get_brace_style_log_with_null_handler
+from cardinal_pythonlib.parallel import gen_parallel_results_in_order
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
 
 log = get_brace_style_log_with_null_handler(__name__)
 
 UTF8 = "utf8"
+DEFAULT_CSV_BATCH_SIZE = 1000
+DEFAULT_CSV_SNIFF_SIZE = 1024
+DEFAULT_MMAP_BLOCK_SIZE = 1024 * 1024  # 1 MiB
 
 
 # =============================================================================
@@ -287,10 +303,94 @@ def gen_lines_from_binary_files(
             yield line
 
 
+def gen_lines_from_binary_files_mmap(
+    files: Iterable[BinaryIO],
+    encoding: str = UTF8,
+    block_size: int = DEFAULT_MMAP_BLOCK_SIZE,
+) -> Generator[str, None, None]:
+    """
+    As for :func:`gen_lines_from_binary_files`, but memory-maps each file and
+    decodes it in large blocks (of whole lines), rather than line by line.
+    This is much faster for large files.
+
+    The files must be real disk files (with a ``fileno()``), such as those
+    from :func:`gen_files_from_zipfiles` with ``on_disk=True``.
+
+    Args:
+        files: iterable of :class:`BinaryIO` file-like objects
+        encoding: encoding to use
+        block_size: approximate number of bytes to decode at once; blocks
+            are extended to the end of the line if necessary
+
+    Yields:
+        each line of all the files
+
+    """
+    for file in files:
+        fileno = file.fileno()
+        size = os.fstat(fileno).st_size
+        if size == 0:
+            continue  # can't memory-map an empty file
+        with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mm:
+            pos = 0
+            while pos < size:
+                end = mm.rfind(b"\n", pos, pos + block_size)
+                if end == -1:
+                    # Line longer than the block, or last line.
+                    end = mm.find(b"\n", pos + block_size)
+                    if end == -1:
+                        end = size - 1
+                block = mm[pos : end + 1]
+                pos = end + 1
+                lines = block.decode(encoding).split("\n")
+                if block.endswith(b"\n"):
+                    lines.pop()  # empty string after the final newline
+                yield from map(str.strip, lines)
+
+
+def _extract_zip_member_to_disk(
+    zf: zipfile.ZipFile, zipinfo: zipfile.ZipInfo, diskfilename: str
+) -> str:
+    """
+    Extracts a single member of a ZIP file to a specified disk file, and
+    returns the filename. (Unlike :meth:`zipfile.ZipFile.extract`, this
+    doesn't create directories, so it is safe to call from several threads at
+    once.)
+    """
+    log.debug("Reading subfile {}", zipinfo.filename)
+    with zf.open(zipinfo) as src, open(diskfilename, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    return diskfilename
+
+
+def _read_zip_member(zf: zipfile.ZipFile, zipinfo: zipfile.ZipInfo) -> bytes:
+    """
+    Reads (decompresses) a single member of a ZIP file into memory.
+    """
+    log.debug("Reading subfile {}", zipinfo.filename)
+    return zf.read(zipinfo)
+
+
+def _gen_disk_files(
+    diskfilenames: Iterable[str],
+) -> Generator[BinaryIO, None, None]:
+    """
+    Opens and yields each disk file in turn, deleting it once the caller has
+    finished with it.
+    """
+    for diskfilename in diskfilenames:
+        try:
+            with open(diskfilename, "rb") as subfile:
+                yield subfile
+        finally:
+            os.remove(diskfilename)
+
+
 def gen_files_from_zipfiles(
     zipfilenames_or_files: Iterable[Union[str, BinaryIO]],
     filespec: str,
     on_disk: bool = False,
+    max_workers: int = 1,
 ) -> Generator[BinaryIO, None, None]:
     """
 
@@ -303,31 +403,76 @@ def gen_files_from_zipfiles(
             ``False``, extracts them in memory and yields file-like objects to
             those memory files (which will not be seekable; e.g.
             https://stackoverflow.com/questions/12821961/)
+        max_workers: if greater than 1, this number of inner files are
+            decompressed concurrently in a thread pool (whilst preserving the
+            order of the output). In this case, in-memory inner files are
+            decompressed in full before being yielded (and are seekable).
 
     Yields:
         file-like object for each inner file matching ``filespec``; may be
         in memory or on disk, as per ``on_disk``
 
+    A single temporary directory is used for all on-disk files. Each file is
+    deleted once the caller has moved on to the next.
+
     """
-    for zipfilename_or_file in zipfilenames_or_files:
-        with zipfile.ZipFile(zipfilename_or_file) as zf:
-            infolist = zf.infolist()  # type: List[zipfile.ZipInfo]
-            infolist.sort(key=attrgetter("filename"))
-            for zipinfo in infolist:
-                if not fnmatch.fnmatch(zipinfo.filename, filespec):
-                    continue
-                log.debug("Reading subfile {}", zipinfo.filename)
-                if on_disk:
-                    with tempfile.TemporaryDirectory() as tmpdir:
-                        zf.extract(zipinfo.filename, tmpdir)
-                        diskfilename = os.path.join(tmpdir, zipinfo.filename)
-                        with open(diskfilename, "rb") as subfile:
-                            yield subfile
+    with tempfile.TemporaryDirectory() if on_disk else nullcontext() as tmpdir:
+        disk_counter = count()
+
+        def make_diskfilename(zipinfo: zipfile.ZipInfo) -> str:
+            # Unique within our directory, but keeping the extension.
+            return os.path.join(
+                tmpdir,
+                f"{next(disk_counter)}_{os.path.basename(zipinfo.filename)}",
+            )
+
+        for zipfilename_or_file in zipfilenames_or_files:
+            with zipfile.ZipFile(zipfilename_or_file) as zf:
+                infolist = zf.infolist()  # type: List[zipfile.ZipInfo]
+                infolist.sort(key=attrgetter("filename"))
+                infolist = [
+                    zipinfo
+                    for zipinfo in infolist
+                    if fnmatch.fnmatch(zipinfo.filename, filespec)
+                ]
+                if max_workers > 1:
+                    if on_disk:
+                        results = gen_parallel_results_in_order(
+                            partial(_extract_zip_member_to_disk, zf),
+                            infolist,
+                            [make_diskfilename(zi) for zi in infolist],
+                            max_workers=max_workers,
+                            threaded=True,
+                        )
+                        subfiles = _gen_disk_files(results)
+                    else:
+                        results = gen_parallel_results_in_order(
+                            partial(_read_zip_member, zf),
+                            infolist,
+                            max_workers=max_workers,
+                            threaded=True,
+                        )
+                        subfiles = map(io.BytesIO, results)
+                    try:
+                        yield from subfiles
+                    finally:
+                        # Wait for (or cancel) any outstanding jobs before
+                        # the ZIP file (and any temporary directory) closes.
+                        results.close()
+                elif on_disk:
+                    yield from _gen_disk_files(
+                        _extract_zip_member_to_disk(
+                            zf, zipinfo, make_diskfilename(zipinfo)
+                        )
+                        for zipinfo in infolist
+                    )
                 else:
-                    # Will not be seekable; e.g.
-                    # https://stackoverflow.com/questions/12821961/
-                    with zf.open(zipinfo.filename) as subfile:
-                        yield subfile
+                    for zipinfo in infolist:
+                        log.debug("Reading subfile {}", zipinfo.filename)
+                        # Will not be seekable; e.g.
+                        # https://stackoverflow.com/questions/12821961/
+                        with zf.open(zipinfo) as subfile:
+                            yield subfile
 
 
 def gen_part_from_line(
@@ -374,7 +519,7 @@ def gen_rows_from_csv_binfiles(
     csv_files: Iterable[BinaryIO],
     encoding: str = UTF8,
     skip_header: bool = False,
-    **csv_reader_kwargs
+    **csv_reader_kwargs,
 ) -> Generator[Iterable[str], None, None]:
     """
     Iterate through binary file-like objects that are CSV files in a specified
@@ -410,6 +555,258 @@ def gen_rows_from_csv_binfiles(
             yield row
 
 
+def _gen_csv_readers(
+    csv_files: Iterable[BinaryIO],
+    encoding: str = UTF8,
+    has_header: bool = True,
+    dialect: Any = None,
+    dialect_cache: Dict[str, Any] = None,
+    sniff_size: int = DEFAULT_CSV_SNIFF_SIZE,
+    **csv_reader_kwargs,
+) -> Generator[Tuple[Optional[List[str]], Iterator[List[str]]], None, None]:
+    """
+    Yields a CSV reader for each binary file-like object, sniffing the dialect
+    if one is not specified.
+
+    The dialect is sniffed without seeking, so this works with non-seekable
+    streams (such as those from :func:`gen_files_from_zipfiles` with
+    ``on_disk=False``). Sniffed dialects are stored in ``dialect_cache``,
+    keyed by the first line of the file, so files with identical headers are
+    sniffed only once.
+
+    Each reader must be consumed before the next is requested.
+
+    Args:
+        csv_files: iterable of :class:`BinaryIO` objects
+        encoding: encoding to use
+        has_header: is the first row of each file a header row? If so, it is
+            read and returned separately, rather than via the reader.
+        dialect: CSV dialect to use (if ``None``, it is sniffed)
+        dialect_cache: optional dictionary used to cache sniffed dialects;
+            pass the same dictionary to several calls to share it
+        sniff_size: number of characters to read for dialect sniffing
+        csv_reader_kwargs: arguments to pass to :func:`csv.reader`
+
+    Yields:
+        tuple: ``header_row, reader``, where ``header_row`` is ``None`` if
+        ``has_header`` is false
+
+    """
+    if dialect_cache is None:
+        dialect_cache = {}
+    for csv_file_bin in csv_files:
+        # noinspection PyTypeChecker
+        csv_file = io.TextIOWrapper(csv_file_bin, encoding=encoding)
+        first_line = csv_file.readline()
+        if not first_line:
+            continue  # empty file
+        thisfile_dialect = dialect or dialect_cache.get(first_line)
+        if thisfile_dialect is None:
+            sample = first_line + csv_file.read(
+                max(0, sniff_size - len(first_line))
+            )
+            thisfile_dialect = csv.Sniffer().sniff(sample)
+            dialect_cache[first_line] = thisfile_dialect
+            # Complete any partial line at the end of the sample, then carry
+            # on with the rest of the file.
+            lines = chain(
+                io.StringIO(sample + csv_file.readline()), csv_file
+            )  # type: Iterable[str]
+        else:
+            lines = chain((first_line,), csv_file)
+        reader = csv.reader(
+            lines, dialect=thisfile_dialect, **csv_reader_kwargs
+        )
+        header = next(reader) if has_header else None
+        yield header, reader
+
+
+def _make_csv_row_converter(
+    converters: Optional[Sequence[Optional[Callable[[str], Any]]]]
+) -> Callable[[List[str]], Tuple[Any, ...]]:
+    """
+    Returns a function that converts a CSV row (a list of strings) to a tuple,
+    applying per-column converter functions (``None`` meaning "leave as a
+    string").
+    """
+    column_converters = [
+        (i, fn) for i, fn in enumerate(converters or []) if fn is not None
+    ]
+    if not column_converters:
+        return tuple
+
+    n_columns = column_converters[-1][0] + 1
+
+    def convert(row: List[str]) -> Tuple[Any, ...]:
+        try:
+            for i, fn in column_converters:
+                row[i] = fn(row[i])
+        except IndexError:
+            raise ValueError(
+                f"Row has {len(row)} fields, but converters require at "
+                f"least {n_columns}"
+            ) from None
+        return tuple(row)
+
+    return convert
+
+
+def _gen_row_batches(
+    readers: Iterable[Iterator[List[str]]],
+    batch_size: int,
+    convert_row: Callable[[List[str]], Tuple[Any, ...]],
+) -> Generator[List[Tuple[Any, ...]], None, None]:
+    """
+    Yields converted rows from several readers in batches of ``batch_size``
+    (the last batch may be shorter). Batches may span reader boundaries.
+    Empty rows (from blank lines) are skipped. A :exc:`ValueError` from
+    ``convert_row`` is re-raised with the line number, if the reader (e.g. a
+    :func:`csv.reader`) provides one.
+    """
+    assert batch_size > 0, "batch_size must be positive"
+    batch = []  # type: List[Tuple[Any, ...]]
+    for reader in readers:
+        rows = filter(None, reader)
+        while True:
+            n_before = len(batch)
+            try:
+                batch.extend(
+                    map(convert_row, islice(rows, batch_size - n_before))
+                )
+            except ValueError as e:
+                line_num = getattr(reader, "line_num", None)
+                if line_num is None:
+                    raise
+                raise ValueError(f"CSV line {line_num}: {e}") from e
+            if len(batch) < batch_size:
+                break  # this reader is exhausted
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def gen_row_batches_from_csv_binfiles(
+    csv_files: Iterable[BinaryIO],
+    batch_size: int = DEFAULT_CSV_BATCH_SIZE,
+    encoding: str = UTF8,
+    has_header: bool = True,
+    converters: Sequence[Optional[Callable[[str], Any]]] = None,
+    sniff_size: int = DEFAULT_CSV_SNIFF_SIZE,
+    dialect_cache: Dict[str, Any] = None,
+    **csv_reader_kwargs,
+) -> Generator[List[Tuple[Any, ...]], None, None]:
+    """
+    As for :func:`gen_rows_from_csv_binfiles`, but yields rows in batches (as
+    lists of tuples), with optional per-column type conversion. This avoids
+    much of the per-row overhead of a generator when processing large files.
+
+    Header rows are never included in the output. The dialect is sniffed from
+    each file unless specified (as ``dialect=...``), but sniffed dialects are
+    re-used for subsequent files with an identical header line. Files may be
+    non-seekable, e.g. the in-memory files from
+    :func:`gen_files_from_zipfiles`.
+
+    Args:
+        csv_files: iterable of :class:`BinaryIO` objects
+        batch_size: number of rows per batch; the last batch may be shorter.
+            Batches may contain rows from more than one file.
+        encoding: encoding to use
+        has_header: does each file start with a header row (to be skipped)?
+        converters: optional sequence of functions, one per column, each
+            converting a string to the desired type (e.g. ``int``); use
+            ``None`` for columns to be left as strings. Columns beyond the
+            end of this sequence are left as strings.
+        sniff_size: number of characters to read for dialect sniffing
+        dialect_cache: optional dictionary used to cache sniffed dialects;
+            pass the same dictionary to several calls to share it
+        csv_reader_kwargs: arguments to pass to :func:`csv.reader`
+
+    Yields:
+        lists of up to ``batch_size`` rows, each a tuple
+
+    Blank lines are skipped. Rows too short for ``converters``, or values
+    that a converter rejects, raise :exc:`ValueError`, giving the line
+    number.
+
+    """
+    dialect = csv_reader_kwargs.pop("dialect", None)
+    readers = (
+        reader
+        for _, reader in _gen_csv_readers(
+            csv_files,
+            encoding=encoding,
+            has_header=has_header,
+            dialect=dialect,
+            dialect_cache=dialect_cache,
+            sniff_size=sniff_size,
+            **csv_reader_kwargs,
+        )
+    )
+    yield from _gen_row_batches(
+        readers, batch_size, _make_csv_row_converter(converters)
+    )
+
+
+def gen_dataframes_from_csv_binfiles(
+    csv_files: Iterable[BinaryIO],
+    batch_size: int = DEFAULT_CSV_BATCH_SIZE,
+    encoding: str = UTF8,
+    columns: Sequence[str] = None,
+    converters: Sequence[Optional[Callable[[str], Any]]] = None,
+    sniff_size: int = DEFAULT_CSV_SNIFF_SIZE,
+    dialect_cache: Dict[str, Any] = None,
+    **csv_reader_kwargs,
+) -> Generator["DataFrame", None, None]:
+    """
+    As for :func:`gen_row_batches_from_csv_binfiles`, but yields each batch as
+    a :class:`pandas.DataFrame`. Every file must start with a header row.
+
+    Args:
+        csv_files: iterable of :class:`BinaryIO` objects
+        batch_size: number of rows per batch (see
+            :func:`gen_row_batches_from_csv_binfiles`)
+        encoding: encoding to use
+        columns: column names; if ``None``, the header row of the first file
+            is used
+        converters: per-column converter functions (see
+            :func:`gen_row_batches_from_csv_binfiles`)
+        sniff_size: number of characters to read for dialect sniffing
+        dialect_cache: optional dictionary used to cache sniffed dialects
+        csv_reader_kwargs: arguments to pass to :func:`csv.reader`
+
+    Yields:
+        :class:`pandas.DataFrame` objects of up to ``batch_size`` rows
+
+    """
+    # Imported here, as pandas is slow to import and most users of this
+    # module don't need it.
+    from pandas import DataFrame
+
+    dialect = csv_reader_kwargs.pop("dialect", None)
+    header_reader_pairs = _gen_csv_readers(
+        csv_files,
+        encoding=encoding,
+        has_header=True,
+        dialect=dialect,
+        dialect_cache=dialect_cache,
+        sniff_size=sniff_size,
+        **csv_reader_kwargs,
+    )
+    first = next(header_reader_pairs, None)
+    if first is None:
+        return
+    first_header, first_reader = first
+    columns = list(columns or first_header)
+    readers = chain(
+        (first_reader,), (reader for _, reader in header_reader_pairs)
+    )
+    for batch in _gen_row_batches(
+        readers, batch_size, _make_csv_row_converter(converters)
+    ):
+        yield DataFrame.from_records(batch, columns=columns)
+
+
 # =============================================================================
 # File transformations
 # =============================================================================
@@ -60,9 +60,22 @@ also with the simpler dictionary:
 import datetime
 from enum import Enum
 import json
+import keyword
 import pprint
+import re
 import sys
-from typing import Any, Callable, Dict, List, TextIO, Tuple, Type
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    Type,
+)
+from uuid import UUID
 
 import pendulum
 from pendulum import Date, DateTime
@@ -71,6 +84,12 @@ from pendulum import Date, DateTime
 # from pendulum.tz.timezone_info import TimezoneInfo
 # from pendulum.tz.transition import Transition
 
+try:
+    # noinspection PyPackageRequirements
+    import orjson
+except ImportError:
+    orjson = None
+
 from cardinal_pythonlib.logs import get_brace_style_log_with_null_handler
 from cardinal_pythonlib.reprfunc import auto_repr
 
@@ -112,6 +131,9 @@ ARGS_LABEL = "args"
 KWARGS_LABEL = "kwargs"
 TYPE_LABEL = "__type__"
 
+DEFAULT_JSON_STREAM_CHUNK_SIZE = 1024 * 1024  # characters
+JSON_WHITESPACE_REGEX = re.compile(r"[ \t\n\r]*")
+
 INIT_ARGS_KWARGS_FN_NAME = "init_args_kwargs"
 INIT_KWARGS_FN_NAME = "init_kwargs"
 
@@ -327,8 +349,23 @@ def make_instance_to_initdict(attributes: List[str]) -> InstanceToDictFnType:
     """
     Returns a function that takes an object (instance) and produces an
     ``InitDict`` enabling its re-creation.
+
+    Since the attribute list is fixed, the function is generated (compiled)
+    here to read the attributes directly, which is considerably faster than
+    looking them up one by one at each call.
     """
+    if all(a.isidentifier() and not keyword.iskeyword(a) for a in attributes):
+        kwargs_src = ", ".join(f"{a!r}: x.{a}" for a in attributes)
+        src = (
+            "def custom_instance_to_initdict(x):\n"
+            f"    return {{{ARGS_LABEL!r}: [], "
+            f"{KWARGS_LABEL!r}: {{{kwargs_src}}}}}\n"
+        )
+        namespace = {}  # type: Dict[str, Any]
+        exec(src, namespace)  # nosec: attribute names checked above
+        return namespace["custom_instance_to_initdict"]
 
+    # Attribute names that can't be written as Python code; do it slowly.
     def custom_instance_to_initdict(x: Instance) -> InitDict:
         kwargs = {}
         for a in attributes:
@@ -362,9 +399,26 @@ class JsonDescriptor(object):
         self._cls = cls
         self._default_factory = default_factory
 
+    @property
+    def typename(self) -> str:
+        return self._typename
+
     def to_dict(self, obj: Instance) -> Dict:
         return self._obj_to_dict_fn(obj)
 
+    def to_json_dict(self, obj: Instance) -> Dict:
+        """
+        As for :meth:`to_dict`, but adds our type label, ready for JSON
+        encoding.
+        """
+        d = self._obj_to_dict_fn(obj)
+        if TYPE_LABEL in d:
+            raise ValueError("Class already has attribute: " + TYPE_LABEL)
+        d[TYPE_LABEL] = self._typename
+        if DEBUG:
+            log.debug("Serializing {!r} -> {!r}", obj, d)
+        return d
+
     def to_obj(self, d: Dict) -> Instance:
         # noinspection PyBroadException
         try:
@@ -399,6 +453,12 @@ class JsonDescriptor(object):
 # =============================================================================
 
 TYPE_MAP = {}  # type: Dict[str, JsonDescriptor]
+CLASS_MAP = {}  # type: Dict[ClassType, JsonDescriptor]
+
+# Types that orjson always serializes natively (so they can't be passed
+# through to our own encoding); if any are registered, we don't use orjson.
+ORJSON_NATIVE_TYPES = (Enum, UUID)
+_orjson_usable = orjson is not None
 
 
 def register_class_for_json(
@@ -407,6 +467,7 @@ def register_class_for_json(
     obj_to_dict_fn: InstanceToDictFnType = None,
     dict_to_obj_fn: DictToInstanceFnType = initdict_to_instance,
     default_factory: DefaultFactoryFnType = None,
+    attributes: List[str] = None,
 ) -> None:
     """
     Registers the class cls for JSON serialization.
@@ -415,6 +476,11 @@ def register_class_for_json(
       framework uses these to convert instances of the class to/from Python
       dictionaries, which are in turn serialized to JSON.
 
+    - Otherwise, if ``attributes`` is specified, instances are serialized via
+      those attributes (which should match the ``__init__`` parameters), with
+      a function compiled by :func:`make_instance_to_initdict`. This is the
+      fastest method.
+
     - Otherwise:
 
       .. code-block:: python
@@ -428,6 +494,8 @@ def register_class_for_json(
     typename = cls.__qualname__  # preferable to __name__
     # ... __name__ looks like "Thing" and is ambiguous
     # ... __qualname__ looks like "my.module.Thing" and is not
+    if attributes is not None and not obj_to_dict_fn:
+        obj_to_dict_fn = make_instance_to_initdict(attributes)
     if obj_to_dict_fn and dict_to_obj_fn:
         descriptor = JsonDescriptor(
             typename=typename,
@@ -455,7 +523,11 @@ def register_class_for_json(
     else:
         raise ValueError("Unknown method, and functions not fully specified")
     global TYPE_MAP
+    global _orjson_usable
     TYPE_MAP[typename] = descriptor
+    CLASS_MAP[cls] = descriptor
+    if issubclass(cls, ORJSON_NATIVE_TYPES):
+        _orjson_usable = False
 
 
 def register_for_json(*args, **kwargs) -> Any:
@@ -547,6 +619,7 @@ def register_for_json(*args, **kwargs) -> Any:
     default_factory = kwargs.pop(
         "default_factory", None
     )  # type: DefaultFactoryFnType
+    attributes = kwargs.pop("attributes", None)  # type: List[str]
     check_result = kwargs.pop("check_results", True)  # type: bool
 
     def register_json_class(cls_: ClassType) -> ClassType:
@@ -584,6 +657,7 @@ def register_for_json(*args, **kwargs) -> Any:
             obj_to_dict_fn=odf,
             dict_to_obj_fn=dof,
             default_factory=default_factory,
+            attributes=attributes,
         )
         return cls_
 
@@ -604,6 +678,23 @@ def dump_map(file: TextIO = sys.stdout) -> None:
 # =============================================================================
 
 
+def get_descriptor_for_instance(obj: Instance) -> Optional[JsonDescriptor]:
+    """
+    Returns the :class:`JsonDescriptor` registered for the class of ``obj``,
+    or ``None``.
+
+    Lookup is by class first (fast), then by class name (as originally),
+    which also copes with classes that have been re-created under the same
+    name (e.g. by module reloading).
+    """
+    cls = type(obj)
+    descriptor = CLASS_MAP.get(cls)
+    if descriptor is None:
+        # preferable to __name__, as above
+        descriptor = TYPE_MAP.get(cls.__qualname__)
+    return descriptor
+
+
 class JsonClassEncoder(json.JSONEncoder):
     """
     Provides a JSON encoder whose ``default`` method encodes a Python object
@@ -611,16 +702,9 @@ class JsonClassEncoder(json.JSONEncoder):
     """
 
     def default(self, obj: Instance) -> Any:
-        typename = type(obj).__qualname__  # preferable to __name__, as above
-        if typename in TYPE_MAP:
-            descriptor = TYPE_MAP[typename]
-            d = descriptor.to_dict(obj)
-            if TYPE_LABEL in d:
-                raise ValueError("Class already has attribute: " + TYPE_LABEL)
-            d[TYPE_LABEL] = typename
-            if DEBUG:
-                log.debug("Serializing {!r} -> {!r}", obj, d)
-            return d
+        descriptor = get_descriptor_for_instance(obj)
+        if descriptor is not None:
+            return descriptor.to_json_dict(obj)
         # Otherwise, nothing that we know about:
         return super().default(obj)
 
@@ -631,12 +715,11 @@ def json_class_decoder_hook(d: Dict) -> Any:
     suitable methods are found in our ``TYPE_MAP``.
     """
     if TYPE_LABEL in d:
-        typename = d.get(TYPE_LABEL)
-        if typename in TYPE_MAP:
+        descriptor = TYPE_MAP.get(d[TYPE_LABEL])
+        if descriptor is not None:
             if DEBUG:
                 log.debug("Deserializing: {!r}", d)
             d.pop(TYPE_LABEL)
-            descriptor = TYPE_MAP[typename]
             obj = descriptor.to_obj(d)
             if DEBUG:
                 log.debug("... to: {!r}", obj)
@@ -644,18 +727,146 @@ def json_class_decoder_hook(d: Dict) -> Any:
     return d
 
 
+class JsonLazyInstance(object):
+    """
+    Placeholder for an instance of a registered class that has been decoded
+    from JSON, but not yet created. Call :meth:`resolve` to create it.
+
+    This allows callers to inspect the type (and the raw ``KwargsDict`` or
+    ``InitDict``) of decoded objects, and to skip the cost of creating those
+    they don't need.
+    """
+
+    __slots__ = ("_descriptor", "_d", "_instance", "_resolved")
+
+    def __init__(self, descriptor: JsonDescriptor, d: Dict) -> None:
+        self._descriptor = descriptor
+        self._d = d
+        self._instance = None  # type: Instance
+        self._resolved = False
+
+    @property
+    def typename(self) -> str:
+        """
+        The registered type name of the object.
+        """
+        return self._descriptor.typename
+
+    @property
+    def dict(self) -> Dict:
+        """
+        The dictionary from which the object will be created. It may contain
+        other (unresolved) :class:`JsonLazyInstance` objects.
+        """
+        return self._d
+
+    def resolve(self) -> Instance:
+        """
+        Creates (once) and returns the object, creating any objects nested
+        within it first.
+        """
+        if not self._resolved:
+            self._instance = self._descriptor.to_obj(
+                resolve_lazy_json(self._d)
+            )
+            self._resolved = True
+        return self._instance
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__qualname__}("
+            f"typename={self.typename!r}, d={self._d!r}) at {hex(id(self))}>"
+        )
+
+
+def resolve_lazy_json(x: Any) -> Any:
+    """
+    Returns a copy of ``x`` (which may be a list or dictionary) in which all
+    :class:`JsonLazyInstance` objects have been resolved to real objects.
+    """
+    if isinstance(x, JsonLazyInstance):
+        return x.resolve()
+    if isinstance(x, dict):
+        return {k: resolve_lazy_json(v) for k, v in x.items()}
+    if isinstance(x, list):
+        return [resolve_lazy_json(v) for v in x]
+    return x
+
+
+def json_class_lazy_decoder_hook(d: Dict) -> Any:
+    """
+    As for :func:`json_class_decoder_hook`, but produces
+    :class:`JsonLazyInstance` objects rather than creating objects.
+    """
+    if TYPE_LABEL in d:
+        descriptor = TYPE_MAP.get(d[TYPE_LABEL])
+        if descriptor is not None:
+            d.pop(TYPE_LABEL)
+            return JsonLazyInstance(descriptor, d)
+    return d
+
+
+def _orjson_default(obj: Instance) -> Any:
+    """
+    The ``default`` function for ``orjson``, equivalent to
+    :meth:`JsonClassEncoder.default`.
+    """
+    descriptor = get_descriptor_for_instance(obj)
+    if descriptor is not None:
+        return descriptor.to_json_dict(obj)
+    raise TypeError(
+        f"Object of type {obj.__class__.__name__} is not JSON serializable"
+    )
+
+
+# Encoders/decoders are stateless between calls, so we can re-use them.
+_JSON_CLASS_ENCODER = JsonClassEncoder()
+_JSON_CLASS_DECODER = json.JSONDecoder(object_hook=json_class_decoder_hook)
+_JSON_CLASS_LAZY_DECODER = json.JSONDecoder(
+    object_hook=json_class_lazy_decoder_hook
+)
+
+if orjson is not None:
+    _ORJSON_OPTIONS = (
+        # Send these to our own encoding, rather than orjson's:
+        orjson.OPT_PASSTHROUGH_DATACLASS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+    )
+
+
 # =============================================================================
 # Functions for end users
 # =============================================================================
 
 
-def json_encode(obj: Instance, **kwargs) -> str:
+def json_encode(obj: Instance, fast: bool = False, **kwargs) -> str:
     """
     Encodes an object to JSON using our custom encoder.
 
     The ``**kwargs`` can be used to pass things like ``'indent'``, for
     formatting.
+
+    If ``fast`` is true, no ``kwargs`` are specified, and the optional
+    ``orjson`` package is installed, ``orjson`` is used, which is much
+    faster. The output decodes identically (via :func:`json_decode`), but
+    is formatted more compactly. Caveats:
+
+    - ``NaN`` and infinite floats become ``null`` (rather than the
+      non-standard ``NaN``/``Infinity``);
+    - the fast path is not used if a subclass of ``Enum`` or ``UUID`` has been
+      registered (as ``orjson`` will always serialize those itself);
+    - objects that ``orjson`` cannot encode (e.g. integers beyond 64 bits, or
+      dictionaries with non-string keys) are re-encoded the standard way.
     """
+    if fast and not kwargs and _orjson_usable:
+        try:
+            return orjson.dumps(
+                obj, default=_orjson_default, option=_ORJSON_OPTIONS
+            ).decode("utf8")
+        except orjson.JSONEncodeError:
+            pass  # fall back to the standard encoder
+    if not kwargs:
+        return _JSON_CLASS_ENCODER.encode(obj)
     return json.dumps(obj, cls=JsonClassEncoder, **kwargs)
 
 
@@ -664,12 +875,134 @@ def json_decode(s: str) -> Any:
     Decodes an object from JSON using our custom decoder.
     """
     try:
-        return json.JSONDecoder(object_hook=json_class_decoder_hook).decode(s)
+        return _JSON_CLASS_DECODER.decode(s)
     except json.JSONDecodeError:
         log.warning("Failed to decode JSON (returning None): {!r}", s)
         return None
 
 
+def gen_json_decode_array(
+    file: TextIO,
+    lazy: bool = False,
+    chunk_size: int = DEFAULT_JSON_STREAM_CHUNK_SIZE,
+) -> Generator[Any, None, None]:
+    """
+    Incrementally decodes a JSON file whose top-level value is an array,
+    yielding each element of the array as it is read (with our custom
+    decoding applied, as for :func:`json_decode`). Only one element (plus a
+    read buffer) is held in memory at once, so this is suitable for very
+    large JSON files, such as those written by
+
+    .. code-block:: python
+
+        with open(filename, "w") as f:
+            f.write("[")
+            for i, record in enumerate(records):
+                if i > 0:
+                    f.write(",")
+                f.write(json_encode(record))
+            f.write("]")
+
+    Args:
+        file:
+            Text file-like object to read from. (For a binary file, wrap it
+            with :class:`io.TextIOWrapper`.)
+        lazy:
+            If true, registered objects are not created; instead, they are
+            represented by :class:`JsonLazyInstance` objects, which the
+            caller can resolve as needed (e.g. via :func:`resolve_lazy_json`).
+        chunk_size:
+            Number of characters to read at a time.
+
+    Yields:
+        each element of the array
+
+    Raises:
+        :exc:`ValueError` (including :exc:`json.JSONDecodeError`) for
+        invalid JSON, if the top-level value is not an array, or if anything
+        other than whitespace follows it.
+    """
+    decoder = _JSON_CLASS_LAZY_DECODER if lazy else _JSON_CLASS_DECODER
+    buffer = ""
+    pos = 0  # our position in the buffer
+    eof = False
+
+    def read_more(n_chars: int = chunk_size) -> None:
+        # Discards what we have consumed, and appends more from the file.
+        nonlocal buffer, pos, eof
+        data = file.read(n_chars)
+        if not data:
+            eof = True
+        buffer = buffer[pos:] + data
+        pos = 0
+
+    def skip_whitespace() -> str:
+        # Moves past whitespace, reading as necessary; returns the next
+        # character, or "" at the end of the file.
+        nonlocal pos
+        while True:
+            pos = JSON_WHITESPACE_REGEX.match(buffer, pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof:
+                return ""
+            read_more()
+
+    def check_end() -> None:
+        # Having read the closing "]", checks that nothing else follows.
+        nonlocal pos
+        pos += 1
+        if skip_whitespace():
+            raise json.JSONDecodeError("Extra data", buffer, pos)
+
+    if skip_whitespace() != "[":
+        raise ValueError("JSON does not start with an array")
+    pos += 1
+    if skip_whitespace() == "]":
+        check_end()
+        return
+    while True:
+        # Decode one element. It may not all be in the buffer yet, in which
+        # case we read more (increasingly large amounts, to avoid repeatedly
+        # re-parsing a long element) and try again.
+        n_extra = chunk_size
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                read_more(n_extra)
+                n_extra *= 2
+                continue
+            # A value at the end of the buffer may be incomplete (e.g. a
+            # number split across reads), so we also need to see what
+            # follows it.
+            if (
+                JSON_WHITESPACE_REGEX.match(buffer, end).end() < len(buffer)
+                or eof
+            ):
+                break
+            read_more(n_extra)
+            n_extra *= 2
+        pos = end
+        delimiter = skip_whitespace()
+        if delimiter == ",":
+            pos += 1
+            skip_whitespace()
+        elif not delimiter:
+            raise ValueError("Unexpected end of JSON array")
+        elif delimiter != "]":
+            raise ValueError(
+                f"Expecting ',' or ']' in JSON array; found {delimiter!r}"
+            )
+        else:
+            check_end()
+        yield obj
+        if delimiter == "]":
+            return
+
+
 # =============================================================================
 # Implement JSON translation for common types
 # =============================================================================
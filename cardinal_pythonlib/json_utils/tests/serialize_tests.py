@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# cardinal_pythonlib/json_utils/tests/serialize_tests.py
+
+"""
+===============================================================================
+
+    Original code copyright (C) 2009-2022 Rudolf Cardinal (rudolf@pobox.com).
+
+    This file is part of cardinal_pythonlib.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+===============================================================================
+
+**Unit tests.**
+
+"""
+
+import datetime
+import io
+import json
+import unittest
+
+import pendulum
+
+from cardinal_pythonlib.json_utils.serialize import (
+    gen_json_decode_array,
+    json_decode,
+    json_encode,
+    JsonLazyInstance,
+    make_instance_to_initdict,
+    orjson,
+    register_for_json,
+    resolve_lazy_json,
+    simple_eq,
+)
+
+
+# =============================================================================
+# Test classes
+# =============================================================================
+
+
+@register_for_json(attributes=["a", "b"])
+class AttributeThing(object):
+    def __init__(self, a, b) -> None:
+        self.a = a
+        self.b = b
+        self.derived = a * 2  # not serialized
+
+    def __eq__(self, other: "AttributeThing") -> bool:
+        return simple_eq(self, other, ["a", "b", "derived"])
+
+
+@register_for_json
+class SimpleThing(object):
+    def __init__(self, x, y=None) -> None:
+        self.x = x
+        self.y = y
+
+    def __eq__(self, other: "SimpleThing") -> bool:
+        return simple_eq(self, other, ["x", "y"])
+
+
+class WeirdAttributes(object):
+    pass
+
+
+# =============================================================================
+# Tests
+# =============================================================================
+
+
+class SerializeTests(unittest.TestCase):
+    def _check_round_trip(self, start, fast: bool) -> None:
+        encoded = json_encode(start, fast=fast)
+        self.assertEqual(json_decode(encoded), start)
+
+    def test_compiled_attributes(self) -> None:
+        thing = AttributeThing(3, "hello")
+        self.assertNotIn("derived", json_encode(thing))
+        self._check_round_trip(thing, fast=False)
+
+    def test_make_instance_to_initdict(self) -> None:
+        fn = make_instance_to_initdict(["a", "b"])
+        self.assertEqual(
+            fn(AttributeThing(1, 2)),
+            {"args": [], "kwargs": {"a": 1, "b": 2}},
+        )
+        # Attribute names that aren't valid identifiers:
+        obj = WeirdAttributes()
+        setattr(obj, "not valid", 1)
+        setattr(obj, "class", 2)
+        fn = make_instance_to_initdict(["not valid", "class"])
+        self.assertEqual(
+            fn(obj), {"args": [], "kwargs": {"not valid": 1, "class": 2}}
+        )
+
+    def test_nested_and_builtin_types(self) -> None:
+        start = [
+            SimpleThing(
+                AttributeThing(1, [1, 2]),
+                {"when": datetime.datetime(2020, 1, 2, 3, 4, 5, 6)},
+            ),
+            datetime.date(2021, 5, 6),
+            datetime.timedelta(days=2, seconds=3),
+            pendulum.datetime(2022, 3, 4, 5, 6, 7, tz="Europe/London"),
+            pendulum.date(2023, 1, 1),
+            "plain",
+            1.5,
+            None,
+        ]
+        self._check_round_trip(start, fast=False)
+        self._check_round_trip(start, fast=True)
+
+    def test_kwargs_still_honoured(self) -> None:
+        encoded = json_encode(SimpleThing(1), fast=True, indent=4)
+        self.assertIn("\n    ", encoded)
+
+    def test_unregistered_class_fails(self) -> None:
+        for fast in (False, True):
+            with self.assertRaises(TypeError):
+                json_encode(WeirdAttributes(), fast=fast)
+
+    @unittest.skipIf(orjson is None, "orjson not installed")
+    def test_fast_falls_back_for_big_integers(self) -> None:
+        self._check_round_trip([2**70, SimpleThing(1)], fast=True)
+
+
+class StreamingDecodeTests(unittest.TestCase):
+    ITEMS = [
+        SimpleThing(AttributeThing(1, 2), [datetime.date(2020, 1, 1)]),
+        12345,
+        -1.5e10,
+        'a string with a ] and a , and a " in it',
+        {"nested": [1, 2, {"three": None}]},
+        True,
+        [],
+        AttributeThing("x", 99),
+    ]
+
+    def _decode(self, text: str, **kwargs) -> list:
+        return list(gen_json_decode_array(io.StringIO(text), **kwargs))
+
+    def test_matches_json_decode(self) -> None:
+        for indent in (None, 2):
+            text = json_encode(self.ITEMS, indent=indent)
+            for chunk_size in (1, 2, 7, 100, 10000):
+                self.assertEqual(
+                    self._decode(text, chunk_size=chunk_size),
+                    json_decode(text),
+                )
+
+    def test_empty_array(self) -> None:
+        self.assertEqual(self._decode("  [ ]  "), [])
+
+    def test_numbers_split_across_reads(self) -> None:
+        self.assertEqual(
+            self._decode("[123456789, 1.25e3]", chunk_size=3),
+            [123456789, 1250.0],
+        )
+
+    def test_invalid(self) -> None:
+        with self.assertRaises(ValueError):
+            self._decode('{"a": 1}')
+        with self.assertRaises(ValueError):
+            self._decode("[1, 2", chunk_size=2)
+        with self.assertRaises(json.JSONDecodeError):
+            self._decode('[1, "unterminated', chunk_size=2)
+        with self.assertRaises(ValueError):
+            self._decode("[1 2]")
+
+    def test_trailing_data(self) -> None:
+        self.assertEqual(self._decode("[1, 2] \n\t", chunk_size=1), [1, 2])
+        for text in ("[1,2]]x", "[1] [2]", "[]x", "[1]\n,"):
+            for chunk_size in (1, 100):
+                with self.assertRaises(json.JSONDecodeError):
+                    self._decode(text, chunk_size=chunk_size)
+
+    def test_lazy(self) -> None:
+        text = json_encode(self.ITEMS)
+        lazy_items = self._decode(text, lazy=True, chunk_size=5)
+        first = lazy_items[0]
+        self.assertIsInstance(first, JsonLazyInstance)
+        self.assertEqual(first.typename, "SimpleThing")
+        self.assertIsInstance(first.dict["kwargs"]["x"], JsonLazyInstance)
+        resolved = first.resolve()
+        self.assertIs(first.resolve(), resolved)
+        self.assertEqual(resolved, self.ITEMS[0])
+        self.assertEqual(resolve_lazy_json(lazy_items), self.ITEMS)
@@ -28,10 +28,15 @@
 
 import re
 import random
-from typing import List, Optional, Union
+import sys
+from typing import Any, Iterable, List, Optional, TYPE_CHECKING, Union
 
 from cardinal_pythonlib.logs import get_brace_style_log_with_null_handler
 
+if TYPE_CHECKING:
+    import numpy as np
+    from pandas import Series
+
 log = get_brace_style_log_with_null_handler(__name__)
 
 
@@ -40,6 +45,8 @@ log = get_brace_style_log_with_null_handler(__name__)
 # =============================================================================
 
 NHS_DIGIT_WEIGHTINGS = [10, 9, 8, 7, 6, 5, 4, 3, 2]
+MIN_NHS_NUMBER = 1000000000  # 10 digits, no leading zero
+MAX_NHS_NUMBER = 9999999999
 
 
 def nhs_check_digit(ninedigits: Union[str, List[Union[str, int]]]) -> int:
@@ -206,6 +213,11 @@ def generate_nhs_number_from_first_9_digits(
 
 WHITESPACE_REGEX = re.compile(r"\s")
 NON_NUMERIC_REGEX = re.compile("[^0-9]")  # or "\D"
+# Ten digits, or 3-3-4 groups separated by a space or hyphen, and not part
+# of a longer run of digits:
+NHS_NUMBER_IN_TEXT_REGEX = re.compile(
+    r"(?<![\d-])([1-9]\d\d)[ -]?(\d{3})[ -]?(\d{4})(?![\d-])"
+)
 
 
 def nhs_number_from_text_or_none(s: str) -> Optional[int]:
@@ -246,3 +258,213 @@ def nhs_number_from_text_or_none(s: str) -> Optional[int]:
 
     # Happy!
     return n
+
+
+def find_nhs_numbers_in_text(text: str, validate: bool = True) -> List[int]:
+    """
+    Finds NHS numbers in free text, in a single regex pass. Numbers may be
+    written as ten contiguous digits or in 3-3-4 groups separated by single
+    spaces or hyphens (e.g. ``943 476 5919``, ``943-476-5919``); longer runs
+    of digits are not split.
+
+    Args:
+        text: text to search
+        validate: keep only numbers with a valid check digit?
+
+    Returns:
+        list of NHS numbers (as integers), in order of appearance
+    """
+    if not text:
+        return []
+    results = []  # type: List[int]
+    for match in NHS_NUMBER_IN_TEXT_REGEX.finditer(text):
+        digits = "".join(match.groups())
+        if validate and not _nhs_digits_valid(digits):
+            continue
+        results.append(int(digits))
+    return results
+
+
+def _nhs_digits_valid(digits: str) -> bool:
+    """
+    Checks the check digit of a string of ten digits (with no leading zero);
+    a quiet equivalent of :func:`is_valid_nhs_number` for bulk use.
+    """
+    total = sum(int(d) * f for d, f in zip(digits, NHS_DIGIT_WEIGHTINGS))
+    check_digit = (11 - total % 11) % 11
+    return check_digit != 10 and check_digit == int(digits[9])
+
+
+# =============================================================================
+# Vectorised NHS number functions (NumPy; optionally pandas)
+# =============================================================================
+# NumPy is imported within these functions, as it is slow to import and most
+# users of this module don't need it.
+
+
+def _coerce_nhs_number(x: Any) -> int:
+    """
+    Converts a value to an integer candidate NHS number, or -1 if that is
+    impossible. Used for non-numeric arrays.
+    """
+    if isinstance(x, bool):
+        return -1
+    if isinstance(x, int):
+        return x
+    if isinstance(x, str):
+        x = WHITESPACE_REGEX.sub("", x)
+        return int(x) if x.isdigit() and x.isascii() else -1
+    if isinstance(x, float):
+        return int(x) if x.is_integer() else -1
+    try:
+        # e.g. numpy integer scalars
+        return int(x) if int(x) == x else -1
+    except (TypeError, ValueError, OverflowError):
+        return -1
+
+
+def _nhs_numbers_as_int64(values: Any) -> "np.ndarray":
+    """
+    Converts an array-like of candidate NHS numbers to a NumPy ``int64``
+    array, with -1 for values that cannot be NHS numbers (missing values,
+    non-integers, non-numeric strings).
+    """
+    import numpy as np
+
+    pd = sys.modules.get("pandas")  # only if the caller uses pandas
+    if pd is not None and isinstance(values, (pd.Series, pd.Index)):
+        if values.dtype.kind in "iu":
+            # Including nullable types, e.g. "Int64", with missing values.
+            return values.to_numpy(dtype=np.int64, na_value=-1)
+        if values.dtype.kind != "b" and pd.api.types.is_numeric_dtype(
+            values.dtype
+        ):
+            # e.g. floats, with NaN for missing values
+            values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            values = values.to_numpy(dtype=object)
+    arr = np.asarray(values)
+    kind = arr.dtype.kind
+    if kind == "i" or kind == "u":
+        return arr.astype(np.int64, copy=False)
+    if kind == "f":
+        # Any integer that is a possible NHS number is exactly representable
+        # as a float64.
+        ok = np.isfinite(arr) & (arr == np.floor(arr))
+        ok &= (arr >= MIN_NHS_NUMBER) & (arr <= MAX_NHS_NUMBER)
+        return np.where(ok, arr, -1).astype(np.int64)
+    # Strings, objects, booleans, etc.
+    flat = arr.ravel()
+    return np.fromiter(
+        (_coerce_nhs_number(x) for x in flat.tolist()),
+        dtype=np.int64,
+        count=flat.size,
+    ).reshape(arr.shape)
+
+
+def nhs_check_digits(first9: Any) -> "np.ndarray":
+    """
+    Vectorised equivalent of :func:`nhs_check_digit`.
+
+    Args:
+        first9: array-like of integers representing the first nine digits
+
+    Returns:
+        NumPy ``int64`` array of check digits (10 meaning "invalid")
+    """
+    import numpy as np
+
+    n = np.asarray(first9, dtype=np.int64)
+    total = np.zeros(n.shape, dtype=np.int64)
+    # Extract digits by integer division, rightmost (weight 2) first, and
+    # accumulate the weighted sum one digit at a time. That uses much less
+    # memory than building a digit matrix for tens of millions of rows.
+    remaining = n.copy()
+    for weight in reversed(NHS_DIGIT_WEIGHTINGS):
+        total += (remaining % 10) * weight
+        remaining //= 10
+    return (11 - total % 11) % 11
+
+
+def validate_nhs_numbers(
+    values: Union[Iterable, "np.ndarray", "Series"]
+) -> Union["np.ndarray", "Series"]:
+    """
+    Vectorised NHS number validation, for whole columns of identifiers.
+
+    Args:
+        values:
+            array-like of candidate NHS numbers: a NumPy array, list, or
+            :class:`pandas.Series`. Integer arrays are fastest. Floats are
+            acceptable if integral (e.g. a pandas column of integers with
+            missing values). Strings are converted, ignoring whitespace (as
+            for :func:`nhs_number_from_text_or_none`). Missing values are
+            invalid.
+
+    Returns:
+        boolean array of the same shape: is each value a valid NHS number?
+        For a :class:`pandas.Series`, a boolean :class:`pandas.Series` with
+        the same index.
+
+    Unlike :func:`is_valid_nhs_number`, this does not log the reason for
+    each rejection.
+    """
+    import numpy as np
+
+    n = _nhs_numbers_as_int64(values)
+    in_range = (n >= MIN_NHS_NUMBER) & (n <= MAX_NHS_NUMBER)
+    n = np.where(in_range, n, 0)
+    expected_check_digit = nhs_check_digits(n // 10)
+    valid = in_range & (expected_check_digit == n % 10)
+    # ... an expected check digit of 10 never matches a real digit
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(values, pd.Series):
+        return pd.Series(valid, index=values.index, name=values.name)
+    return valid
+
+
+def generate_random_nhs_numbers(
+    n: int,
+    official_test_range: bool = True,
+    rng: "np.random.Generator" = None,
+) -> "np.ndarray":
+    """
+    Returns ``n`` random valid NHS numbers, as a NumPy ``int64`` array; a
+    fast batch version of :func:`generate_random_nhs_number`, e.g. for
+    synthetic test data sets.
+
+    Args:
+        n:
+            number of NHS numbers to generate
+        official_test_range:
+            Make them start with "999", the official NHS test range (see
+            :func:`generate_random_nhs_number`).
+        rng:
+            optional NumPy random number generator, e.g. for reproducible
+            output via ``numpy.random.default_rng(seed)``
+
+    Numbers are not guaranteed to be unique.
+    """
+    import numpy as np
+
+    if rng is None:
+        rng = np.random.default_rng()
+    if official_test_range:
+        low, high = 999000000, 1000000000  # first 9 digits: 999xxxxxx
+    else:
+        low, high = 100000000, 1000000000  # don't start with a zero
+    result = np.empty(n, dtype=np.int64)
+    filled = 0
+    while filled < n:
+        # About 1 in 11 draws has a check digit of 10 and is discarded; draw
+        # a little more than needed.
+        wanted = n - filled
+        first9 = rng.integers(
+            low, high, size=wanted + wanted // 8 + 16, dtype=np.int64
+        )
+        check_digits = nhs_check_digits(first9)
+        ok = check_digits != 10
+        batch = (first9[ok] * 10 + check_digits[ok])[:wanted]
+        result[filled : filled + batch.size] = batch
+        filled += batch.size
+    return result
@@ -34,9 +34,11 @@ from concurrent.futures import (
     ThreadPoolExecutor,
     wait,
 )
+from collections import deque
 import logging
 from itertools import islice
-from typing import Callable, Iterable, Tuple
+import os
+from typing import Callable, Deque, Iterable, Tuple
 
 log = logging.getLogger(__name__)
 
@@ -136,3 +138,58 @@ def gen_parallel_results_efficiently(
             # futures in the pool at a time, to keep memory consumption down.
             for args in islice(arggroups, len(done)):
                 futures.add(submit(executor, args))
+
+
+def gen_parallel_results_in_order(
+    fn: Callable,
+    *iterables: Iterable,
+    max_workers: int = None,
+    threaded: bool = False,
+) -> Iterable:
+    """
+    As for :func:`gen_parallel_results_efficiently`, but yields results in the
+    same order as the arguments (like ``Executor.map()``). Only a bounded
+    number of jobs (``max_workers``) are submitted ahead of the result being
+    yielded, so this also copes with large or infinite inputs.
+
+    A slow job will hold up the yielding of subsequent results (though not
+    their computation, up to the limit of ``max_workers`` jobs).
+
+    If the generator is closed early, jobs that have not yet started are
+    cancelled.
+
+    Args:
+        fn:
+            The function of interest to be run. A callable that will take as
+            many arguments as there are passed iterables.
+        iterables:
+            Arguments to be sent ``fn``; see
+            :func:`gen_parallel_results_efficiently`.
+        max_workers:
+            Maximum number of processes/threads at one time. If ``None``, the
+            number of CPUs is used.
+        threaded:
+            Use threads? Otherwise, use processes.
+
+    Yields:
+        results from ``fn``, in the order of the arguments
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    arggroups = zip(*iterables)  # an iterator of argument tuples
+    executor_class = ThreadPoolExecutor if threaded else ProcessPoolExecutor
+
+    with executor_class(max_workers=max_workers) as executor:
+        futures: Deque[Future] = deque(
+            executor.submit(fn, *args)
+            for args in islice(arggroups, max_workers)
+        )
+        try:
+            while futures:
+                future = futures.popleft()
+                # Keep the pool busy whilst we wait for the oldest job.
+                for args in islice(arggroups, 1):
+                    futures.append(executor.submit(fn, *args))
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
@@ -34,12 +34,13 @@ from pprint import pformat
 import shutil
 import sys
 import tempfile
-from typing import Any, Dict, Iterable, Union
+from typing import Any, BinaryIO, Dict, Iterable, Optional, Tuple, Union
 
 from pypdf import PdfReader, PdfWriter
 from semantic_version import Version
 
 from cardinal_pythonlib.logs import get_brace_style_log_with_null_handler
+from cardinal_pythonlib.parallel import gen_parallel_results_in_order
 
 
 # =============================================================================
@@ -170,8 +171,29 @@ class PdfPlan(object):
         # is_filename options
         self.filename = filename
 
+    def render(self) -> Optional[bytes]:
+        """
+        For HTML mode, renders the PDF and returns it. For file mode, returns
+        ``None`` (the file is read directly by :meth:`add_to_writer`).
+
+        This is the slow part of processing an HTML-mode plan, and is safe to
+        call from several threads at once (see :func:`gen_rendered_pdf_plans`).
+        """
+        if not self.is_html:
+            return None
+        return get_pdf_from_html(
+            html=self.html,
+            header_html=self.header_html,
+            footer_html=self.footer_html,
+            wkhtmltopdf_filename=self.wkhtmltopdf_filename,
+            wkhtmltopdf_options=self.wkhtmltopdf_options,
+        )
+
     def add_to_writer(
-        self, writer: PdfWriter, start_recto: bool = True
+        self,
+        writer: PdfWriter,
+        start_recto: bool = True,
+        rendered_pdf: bytes = None,
     ) -> None:
         """
         Add the PDF described by this class to a PDF writer.
@@ -179,16 +201,13 @@ class PdfPlan(object):
         Args:
             writer: a :class:`pypdf.PdfWriter`
             start_recto: start a new right-hand page?
+            rendered_pdf: for HTML mode, the result of a prior call to
+                :meth:`render`, if available (otherwise, the PDF is rendered
+                now)
 
         """
         if self.is_html:
-            pdf = get_pdf_from_html(
-                html=self.html,
-                header_html=self.header_html,
-                footer_html=self.footer_html,
-                wkhtmltopdf_filename=self.wkhtmltopdf_filename,
-                wkhtmltopdf_options=self.wkhtmltopdf_options,
-            )
+            pdf = rendered_pdf if rendered_pdf is not None else self.render()
             append_memory_pdf_to_writer(pdf, writer, start_recto=start_recto)
         elif self.is_filename:
             if start_recto and len(writer.pages) % 2 != 0:
@@ -657,8 +676,62 @@ def get_concatenated_pdf_from_disk(
     return pdf_from_writer(writer)
 
 
+def _render_pdf_plan(pdfplan: PdfPlan) -> Tuple[PdfPlan, Optional[bytes]]:
+    """
+    Renders a :class:`PdfPlan`, for :func:`gen_rendered_pdf_plans`.
+    """
+    return pdfplan, pdfplan.render()
+
+
+def gen_rendered_pdf_plans(
+    pdf_plans: Iterable[PdfPlan], max_workers: int = None
+) -> Iterable[Tuple[PdfPlan, Optional[bytes]]]:
+    """
+    Renders HTML-mode PDF plans in parallel (each ``wkhtmltopdf`` run being a
+    separate subprocess, managed by its own thread), yielding results in the
+    order of the plans. At most ``max_workers`` plans are rendered ahead of
+    the one being yielded, so memory use is bounded.
+
+    Args:
+        pdf_plans: iterable of :class:`PdfPlan` objects
+        max_workers: maximum number of simultaneous renderers; if ``None``,
+            the number of CPUs
+
+    Yields:
+        tuples ``(pdfplan, rendered_pdf)``, where ``rendered_pdf`` is the
+        result of :meth:`PdfPlan.render` (``None`` for file-mode plans)
+    """
+    yield from gen_parallel_results_in_order(
+        _render_pdf_plan, pdf_plans, max_workers=max_workers, threaded=True
+    )
+
+
+def _make_concatenated_pdf_writer(
+    pdf_plans: Iterable[PdfPlan], start_recto: bool, max_workers: int
+) -> PdfWriter:
+    """
+    Renders and concatenates PDF plans into a new writer. Each rendered PDF
+    is appended to the writer (and released) as soon as it is available,
+    rather than all being held as ``bytes``.
+    """
+    writer = PdfWriter()
+    if max_workers == 1:
+        for pdfplan in pdf_plans:
+            pdfplan.add_to_writer(writer, start_recto=start_recto)
+    else:
+        for pdfplan, pdf in gen_rendered_pdf_plans(
+            pdf_plans, max_workers=max_workers
+        ):
+            pdfplan.add_to_writer(
+                writer, start_recto=start_recto, rendered_pdf=pdf
+            )
+    return writer
+
+
 def get_concatenated_pdf_in_memory(
-    pdf_plans: Iterable[PdfPlan], start_recto: bool = True
+    pdf_plans: Iterable[PdfPlan],
+    start_recto: bool = True,
+    max_workers: int = 1,
 ) -> bytes:
     """
     Concatenates PDFs and returns them as an in-memory binary PDF.
@@ -666,17 +739,43 @@ def get_concatenated_pdf_in_memory(
     Args:
         pdf_plans: iterable of :class:`PdfPlan` objects
         start_recto: start a new right-hand page for each new PDF?
+        max_workers: number of HTML-mode plans to render in parallel; if
+            ``None``, the number of CPUs (see :func:`gen_rendered_pdf_plans`)
 
     Returns:
         concatenated PDF, as ``bytes``
 
     """
-    writer = PdfWriter()
-    for pdfplan in pdf_plans:
-        pdfplan.add_to_writer(writer, start_recto=start_recto)
+    writer = _make_concatenated_pdf_writer(
+        pdf_plans, start_recto=start_recto, max_workers=max_workers
+    )
     return pdf_from_writer(writer)
 
 
+def write_concatenated_pdf(
+    pdf_plans: Iterable[PdfPlan],
+    output: Union[str, BinaryIO],
+    start_recto: bool = True,
+    max_workers: int = None,
+) -> None:
+    """
+    Concatenates PDFs and writes the result to a file or binary stream,
+    without creating an in-memory copy of the whole output PDF.
+
+    Args:
+        pdf_plans: iterable of :class:`PdfPlan` objects
+        output: filename, or binary stream (e.g. an open file or a
+            ``BytesIO``)
+        start_recto: start a new right-hand page for each new PDF?
+        max_workers: number of HTML-mode plans to render in parallel; if
+            ``None``, the number of CPUs (see :func:`gen_rendered_pdf_plans`)
+    """
+    writer = _make_concatenated_pdf_writer(
+        pdf_plans, start_recto=start_recto, max_workers=max_workers
+    )
+    writer.write(output)
+
+
 # =============================================================================
 # Main -- to enable logging for imports, for debugging
 # =============================================================================
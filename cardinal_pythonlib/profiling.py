@@ -24,10 +24,49 @@
 
 **Profiling assistance functions.**
 
+- :func:`do_cprofile` profiles a single function call, printing the results.
+
+- :class:`AggregatingProfiler` accumulates ``cProfile`` statistics across
+  many calls (e.g. of a web view, or an ETL step), optionally writing them to
+  a ``.prof`` file periodically.
+
+- :class:`SamplingProfiler` is a low-overhead statistical profiler, sampling
+  the call stack on a timer signal (Unix only), producing "collapsed stacks"
+  for flame graph tools.
+
+- The command-line tool (``cardinalpythonlib_profiles``) merges and compares
+  ``.prof`` files.
+
 """
 
+import argparse
+from collections import Counter
 import cProfile
-from typing import Any, Callable
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cardinal_pythonlib.logs import (
+    get_brace_style_log_with_null_handler,
+    main_only_quicksetup_rootlogger,
+)
+
+log = get_brace_style_log_with_null_handler(__name__)
+
+DEFAULT_PROFILE_FILENAME = "profile_{pid}.prof"
+DEFAULT_SAMPLING_INTERVAL_S = 0.005
+DEFAULT_SAMPLING_MAX_DEPTH = 100
+DEFAULT_DIFF_LIMIT = 30
+
+
+# =============================================================================
+# Single-call profiling
+# =============================================================================
 
 
 def do_cprofile(func: Callable, sort: str = "tottime") -> Callable:
@@ -53,3 +92,490 @@ def do_cprofile(func: Callable, sort: str = "tottime") -> Callable:
             profile.print_stats(sort=sort)
 
     return profiled_func
+
+
+# =============================================================================
+# Aggregating cProfile profiler
+# =============================================================================
+
+
+class AggregatingProfiler(object):
+    """
+    Accumulates ``cProfile`` statistics across calls. Use it as a decorator
+    or as a context manager:
+
+    .. code-block:: python
+
+        from cardinal_pythonlib.profiling import AggregatingProfiler
+
+        profiler = AggregatingProfiler(
+            filename="/tmp/etl_{pid}.prof", dump_every_n_calls=1000
+        )
+
+        @profiler
+        def process_row(row):
+            ...
+
+        with profiler:
+            ...
+
+        profiler.dump()  # or print_stats()
+
+    Notes:
+
+    - ``cProfile`` profiles one thread at a time. Calls made from other
+      threads whilst a call is being profiled simply run unprofiled.
+    - Nested (e.g. recursive) calls are handled.
+    - The ``.prof`` file is cumulative, and is overwritten at each dump
+      (unless ``filename`` includes ``{n}``, the dump number). It can be
+      read with :class:`pstats.Stats`, ``snakeviz``, etc.
+    """
+
+    def __init__(
+        self,
+        filename: str = DEFAULT_PROFILE_FILENAME,
+        dump_every_n_calls: int = None,
+        dump_interval_s: float = None,
+        builtins: bool = True,
+    ) -> None:
+        """
+        Args:
+            filename:
+                filename for :meth:`dump`; may include ``{pid}`` (process
+                ID) and ``{n}`` (dump number)
+            dump_every_n_calls:
+                dump automatically after this many profiled calls
+            dump_interval_s:
+                dump automatically at the end of a profiled call, if this
+                many seconds have passed since the last dump
+            builtins:
+                profile built-in functions too?
+        """
+        self.filename = filename
+        self.dump_every_n_calls = dump_every_n_calls
+        self.dump_interval_s = dump_interval_s
+        self.n_calls = 0
+        self.n_dumps = 0
+        self._builtins = builtins
+        self._profile = cProfile.Profile(builtins=builtins)
+        # Held by the thread being profiled. Re-entrant, so that the
+        # profiled code itself may call e.g. get_stats() or dump().
+        self._lock = threading.RLock()
+        self._owner = None  # type: Optional[int]
+        self._depth = 0
+        self._last_dump = time.monotonic()
+
+    # -------------------------------------------------------------------------
+    # Profiling
+    # -------------------------------------------------------------------------
+
+    def _enter(self) -> bool:
+        """
+        Starts profiling, if possible. Returns: are we profiling this call?
+        """
+        me = threading.get_ident()
+        if self._owner == me:
+            self._depth += 1  # nested call
+            return True
+        if not self._lock.acquire(blocking=False):
+            return False  # another thread is being profiled
+        self._owner = me
+        self._depth = 1
+        self._profile.enable()
+        return True
+
+    def _exit(self) -> None:
+        """
+        Stops profiling, at the end of the outermost profiled call.
+        """
+        self._depth -= 1
+        if self._depth > 0:
+            return
+        self._profile.disable()
+        self.n_calls += 1
+        self._owner = None
+        try:
+            if (
+                self.dump_every_n_calls
+                and self.n_calls % self.dump_every_n_calls == 0
+            ) or (
+                self.dump_interval_s is not None
+                and time.monotonic() - self._last_dump >= self.dump_interval_s
+            ):
+                self._dump()
+        finally:
+            self._lock.release()
+
+    def __call__(self, func: Callable) -> Callable:
+        """
+        Decorator.
+        """
+
+        def profiled_func(*args, **kwargs) -> Any:
+            if not self._enter():
+                return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._exit()
+
+        profiled_func.__name__ = getattr(func, "__name__", "profiled_func")
+        profiled_func.__doc__ = func.__doc__
+        return profiled_func
+
+    def __enter__(self) -> "AggregatingProfiler":
+        self._enter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if self._owner == threading.get_ident():
+            self._exit()
+
+    # -------------------------------------------------------------------------
+    # Results
+    # -------------------------------------------------------------------------
+
+    def _profiling_this_thread(self) -> bool:
+        """
+        Are we being called from within a profiled call? (Call with the lock
+        held.)
+        """
+        return self._owner == threading.get_ident()
+
+    def _dump(self, filename: str = None) -> str:
+        """
+        Writes statistics to a file (without locking).
+        """
+        self.n_dumps += 1
+        filename = (filename or self.filename).format(
+            pid=os.getpid(), n=self.n_dumps
+        )
+        self._profile.dump_stats(filename)  # stops the profiler
+        if self._profiling_this_thread():
+            self._profile.enable()
+        self._last_dump = time.monotonic()
+        log.debug("Profile written to {}", filename)
+        return filename
+
+    def dump(self, filename: str = None) -> str:
+        """
+        Writes the cumulative statistics to a ``.prof`` file.
+
+        Args:
+            filename: filename to use, instead of the default
+
+        Returns:
+            the filename written
+        """
+        with self._lock:
+            return self._dump(filename)
+
+    def get_stats(self) -> pstats.Stats:
+        """
+        Returns the cumulative statistics.
+        """
+        with self._lock:
+            stats = pstats.Stats(self._profile)  # stops the profiler
+            if self._profiling_this_thread():
+                self._profile.enable()
+            return stats
+
+    def print_stats(self, sort: str = "tottime", limit: int = None) -> None:
+        """
+        Prints the cumulative statistics.
+        """
+        stats = self.get_stats().sort_stats(sort)
+        if limit is None:
+            stats.print_stats()
+        else:
+            stats.print_stats(limit)
+
+    def reset(self) -> None:
+        """
+        Discards the statistics so far.
+        """
+        with self._lock:
+            active = self._profiling_this_thread()
+            if active:
+                self._profile.disable()
+            self._profile = cProfile.Profile(builtins=self._builtins)
+            if active:
+                self._profile.enable()
+            self.n_calls = 0
+
+
+# =============================================================================
+# Sampling profiler
+# =============================================================================
+
+
+def _frame_label(frame: FrameType) -> str:
+    """
+    Describes a stack frame's function, e.g. ``parse (mymodule.py:23)``.
+    """
+    code = frame.f_code
+    return (
+        f"{code.co_name} "
+        f"({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class SamplingProfiler(object):
+    """
+    Statistical profiler. Every ``interval_s`` seconds of CPU time (via
+    ``SIGPROF``; or of wall-clock time, with ``wall_clock=True``, via
+    ``SIGALRM``), it records the current call stack. The overhead is small
+    and independent of how many function calls are made, so this is
+    suitable for production use; the result is approximate.
+
+    Unix only. Must be started and stopped from the main thread (where Python
+    runs signal handlers). By default, only the main thread is sampled; with
+    ``all_threads=True``, all threads are.
+
+    .. code-block:: python
+
+        from cardinal_pythonlib.profiling import SamplingProfiler
+
+        with SamplingProfiler() as profiler:
+            do_work()
+        profiler.write_collapsed("work.collapsed")  # for flamegraph.pl etc.
+    """
+
+    def __init__(
+        self,
+        interval_s: float = DEFAULT_SAMPLING_INTERVAL_S,
+        wall_clock: bool = False,
+        all_threads: bool = False,
+        max_depth: int = DEFAULT_SAMPLING_MAX_DEPTH,
+    ) -> None:
+        """
+        Args:
+            interval_s: sampling interval, in seconds
+            wall_clock: sample on wall-clock time, not CPU time? (Use this
+                to see time spent waiting, e.g. for I/O or a database.)
+            all_threads: sample all threads, not just the main thread?
+            max_depth: maximum stack depth to record
+        """
+        if not hasattr(signal, "setitimer"):
+            raise NotImplementedError(
+                "SamplingProfiler requires signal.setitimer (Unix)"
+            )
+        self.interval_s = interval_s
+        self.all_threads = all_threads
+        self.max_depth = max_depth
+        if wall_clock:
+            self._signal = signal.SIGALRM
+            self._timer = signal.ITIMER_REAL
+        else:
+            self._signal = signal.SIGPROF
+            self._timer = signal.ITIMER_PROF
+        self.samples = Counter()  # type: Counter[Tuple[str, ...]]
+        self.n_samples = 0
+        self._previous_handler = None  # type: Any
+        self._running = False
+
+    def _stack(self, frame: Optional[FrameType]) -> Tuple[str, ...]:
+        """
+        Returns the stack for a frame, outermost first.
+        """
+        labels = []  # type: List[str]
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        labels.reverse()
+        return tuple(labels)
+
+    # noinspection PyUnusedLocal
+    def _handler(self, signum: int, frame: Optional[FrameType]) -> None:
+        """
+        Signal handler: takes a sample.
+        """
+        self.n_samples += 1
+        if self.all_threads:
+            main_ident = threading.main_thread().ident
+            # noinspection PyProtectedMember
+            for ident, thread_frame in sys._current_frames().items():
+                if ident == main_ident:
+                    # The main thread's current frame is this handler; the
+                    # interrupted frame is the one we were given.
+                    thread_frame = frame
+                self.samples[self._stack(thread_frame)] += 1
+        else:
+            self.samples[self._stack(frame)] += 1
+
+    def start(self) -> None:
+        """
+        Starts sampling.
+        """
+        if self._running:
+            return
+        self._previous_handler = signal.signal(self._signal, self._handler)
+        signal.setitimer(self._timer, self.interval_s, self.interval_s)
+        self._running = True
+
+    def stop(self) -> None:
+        """
+        Stops sampling.
+        """
+        if not self._running:
+            return
+        signal.setitimer(self._timer, 0, 0)
+        signal.signal(self._signal, self._previous_handler)
+        self._running = False
+
+    def __enter__(self) -> "SamplingProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def collapsed_stacks(self) -> str:
+        """
+        Returns the samples in "collapsed stack" format (one line per
+        distinct stack: ``outer;inner count``), as used by flame graph tools
+        (e.g. ``flamegraph.pl``, speedscope).
+        """
+        lines = [
+            f"{';'.join(stack)} {count}"
+            for stack, count in sorted(self.samples.items())
+            if stack
+        ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def write_collapsed(self, filename: str) -> None:
+        """
+        Writes :meth:`collapsed_stacks` to a file.
+        """
+        with open(filename, "w") as f:
+            f.write(self.collapsed_stacks())
+
+    def top_functions(self, n: int = 20) -> List[Tuple[str, int]]:
+        """
+        Returns the ``n`` functions most often at the top of the stack (i.e.
+        with the most "self" samples), as ``(label, count)`` tuples.
+        """
+        counts = Counter()  # type: Counter[str]
+        for stack, count in self.samples.items():
+            if stack:
+                counts[stack[-1]] += count
+        return counts.most_common(n)
+
+    def reset(self) -> None:
+        """
+        Discards all samples.
+        """
+        self.samples.clear()
+        self.n_samples = 0
+
+
+# =============================================================================
+# Merging and comparing profiles
+# =============================================================================
+
+
+def merge_profiles(filenames: List[str], output_filename: str) -> None:
+    """
+    Merges several ``.prof`` files (e.g. from different processes or runs)
+    into one.
+    """
+    stats = pstats.Stats(*filenames)
+    stats.dump_stats(output_filename)
+
+
+def diff_profiles(
+    before_filenames: List[str],
+    after_filenames: List[str],
+    sort: str = "tottime",
+) -> List[Tuple[str, float, float, float]]:
+    """
+    Compares profiles, per function.
+
+    Args:
+        before_filenames: ``.prof`` file(s) for the baseline
+        after_filenames: ``.prof`` file(s) to compare
+        sort: ``"tottime"`` (time within the function itself) or
+            ``"cumtime"`` (including functions it calls)
+
+    Returns:
+        list of tuples ``(function, before_s, after_s, change_s)``, in
+        descending order of the absolute change
+    """
+    assert sort in ("tottime", "cumtime"), "Bad sort"
+    index = 2 if sort == "tottime" else 3
+
+    def times(filenames: List[str]) -> Dict[str, float]:
+        # noinspection PyUnresolvedReferences
+        raw = pstats.Stats(*filenames).stats
+        return {
+            pstats.func_std_string(func): values[index]
+            for func, values in raw.items()
+        }
+
+    before = times(before_filenames)
+    after = times(after_filenames)
+    rows = []
+    for func in set(before) | set(after):
+        b = before.get(func, 0.0)
+        a = after.get(func, 0.0)
+        rows.append((func, b, a, a - b))
+    rows.sort(key=lambda row: abs(row[3]), reverse=True)
+    return rows
+
+
+def main() -> None:
+    """
+    Command-line processor. See ``--help`` for details.
+    """
+    main_only_quicksetup_rootlogger()
+    parser = argparse.ArgumentParser(
+        description="Merge or compare Python profile (.prof) files, e.g. "
+        "from cProfile or AggregatingProfiler."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    merge_parser = subparsers.add_parser(
+        "merge", help="Merge several profiles into one"
+    )
+    merge_parser.add_argument("filenames", nargs="+", help="Input .prof files")
+    merge_parser.add_argument(
+        "--output", required=True, help="Output .prof file"
+    )
+
+    diff_parser = subparsers.add_parser(
+        "diff", help="Show per-function differences between profiles"
+    )
+    diff_parser.add_argument(
+        "--before", nargs="+", required=True, help="Baseline .prof file(s)"
+    )
+    diff_parser.add_argument(
+        "--after", nargs="+", required=True, help="Comparison .prof file(s)"
+    )
+    diff_parser.add_argument(
+        "--sort",
+        choices=["tottime", "cumtime"],
+        default="tottime",
+        help="Time to compare. Default: %(default)s.",
+    )
+    diff_parser.add_argument(
+        "--limit",
+        type=int,
+        default=DEFAULT_DIFF_LIMIT,
+        help="Number of functions to show. Default: %(default)s.",
+    )
+
+    args = parser.parse_args()
+    if args.command == "merge":
+        merge_profiles(args.filenames, args.output)
+        log.info("Merged profile written to {}", args.output)
+    else:
+        rows = diff_profiles(args.before, args.after, sort=args.sort)
+        print(f"{'before_s':>12} {'after_s':>12} {'change_s':>12}  function")
+        for func, before_s, after_s, change_s in rows[: args.limit]:
+            print(
+                f"{before_s:12.6f} {after_s:12.6f} {change_s:+12.6f}  {func}"
+            )
+
+
+if __name__ == "__main__":
+    main()
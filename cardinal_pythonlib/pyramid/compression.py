@@ -24,9 +24,40 @@
 
 Compression functions.
 
+The :class:`CompressionTweenFactory` tween is configured via these optional
+Pyramid settings (e.g. in your ``.ini`` file):
+
+- ``compression.min_size``: don't compress buffered bodies smaller than this
+  (bytes); default 1024.
+- ``compression.content_types``: whitespace-separated list of compressible
+  MIME types (beyond ``text/*`` and ``+json``/``+xml`` types); the default
+  includes JSON, XML, JavaScript and SQLite. Already-compressed formats (e.g.
+  PDF, ZIP, XLSX, ODS, images) are therefore left alone.
+- ``compression.encodings``: whitespace-separated list of encodings that we
+  offer, in order of our preference (for equally acceptable encodings);
+  default ``br zstd gzip``. Brotli requires the ``brotli`` package, and zstd
+  requires ``zstandard``; encodings whose packages are absent are ignored.
+- ``compression.gzip_level``, ``compression.brotli_quality``,
+  ``compression.zstd_level``: compression levels (defaults 6, 4, 3; these
+  are sensible speed/size trade-offs for dynamic content).
+- ``compression.cache_size``: number of compressed bodies to cache, for
+  responses with a strong ``ETag``; default 128; 0 to disable.
+
+Compressed responses have their ``ETag`` (if any) suffixed with the encoding
+(e.g. ``"abc"`` becomes ``"abc-gzip"``), since the compressed representation
+is not byte-identical to the uncompressed one (RFC 7232, section 2.3.3).
+
+Responses whose body is an iterable other than a list (e.g. a generator or
+file iterator) are compressed as they are streamed, without being buffered.
+
 """
 
+from collections import OrderedDict
+import hashlib
 import logging
+from threading import Lock
+from typing import Callable, Dict, Iterable, Optional, Tuple
+import zlib
 
 # noinspection PyUnresolvedReferences
 from pyramid.request import Request
@@ -37,17 +68,198 @@ from pyramid.response import Response
 # noinspection PyUnresolvedReferences
 from pyramid.registry import Registry
 
+# noinspection PyUnresolvedReferences
+from pyramid.settings import aslist
+
+from cardinal_pythonlib.httpconst import MimeType
 from cardinal_pythonlib.pyramid.constants import PyramidHandlerType
 from cardinal_pythonlib.pyramid.requests import (
+    BR_ENCODING,
     decompress_request,
-    request_accepts_gzip,
+    gen_accept_encoding_qvalues,
+    GZIP_ENCODING,
+    HTTP_ACCEPT_ENCODING,
+    IDENTITY_ENCODING,
+    ZSTD_ENCODING,
 )
 
+try:
+    # noinspection PyPackageRequirements
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    # noinspection PyPackageRequirements
+    import zstandard
+except ImportError:
+    zstandard = None
+
 log = logging.getLogger(__name__)
 
 
 # =============================================================================
-# Pyramid gzip compression tween
+# Constants
+# =============================================================================
+
+SETTING_MIN_SIZE = "compression.min_size"
+SETTING_CONTENT_TYPES = "compression.content_types"
+SETTING_ENCODINGS = "compression.encodings"
+SETTING_GZIP_LEVEL = "compression.gzip_level"
+SETTING_BROTLI_QUALITY = "compression.brotli_quality"
+SETTING_ZSTD_LEVEL = "compression.zstd_level"
+SETTING_CACHE_SIZE = "compression.cache_size"
+
+DEFAULT_MIN_SIZE = 1024  # bytes
+DEFAULT_COMPRESSIBLE_CONTENT_TYPES = (
+    MimeType.JSON,
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    MimeType.SQLITE3,
+)
+DEFAULT_ENCODINGS = (BR_ENCODING, ZSTD_ENCODING, GZIP_ENCODING)
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 4
+DEFAULT_ZSTD_LEVEL = 3
+DEFAULT_CACHE_SIZE = 128
+
+HTTP_VARY_ACCEPT_ENCODING = "Accept-Encoding"
+
+
+# =============================================================================
+# Compressors
+# =============================================================================
+
+
+class StreamCompressor(object):
+    """
+    Uniform interface to an incremental compressor: call :meth:`compress`
+    with successive chunks, then :meth:`finish` once.
+    """
+
+    def __init__(
+        self, compress: Callable[[bytes], bytes], finish: Callable[[], bytes]
+    ) -> None:
+        self.compress = compress
+        self.finish = finish
+
+
+def make_stream_compressor(encoding: str, level: int) -> StreamCompressor:
+    """
+    Returns a new :class:`StreamCompressor` for the specified HTTP content
+    encoding.
+
+    Args:
+        encoding: ``gzip``, ``br``, or ``zstd``
+        level: compression level (quality, for Brotli)
+    """
+    if encoding == GZIP_ENCODING:
+        # wbits = 16 + MAX_WBITS gives a gzip (not raw zlib) stream.
+        c = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return StreamCompressor(c.compress, c.flush)
+    if encoding == BR_ENCODING and brotli:
+        c = brotli.Compressor(quality=level)
+        # Google's "brotli" uses process(); "brotlipy" uses compress().
+        process = getattr(c, "process", None) or c.compress
+        return StreamCompressor(process, c.finish)
+    if encoding == ZSTD_ENCODING and zstandard:
+        c = zstandard.ZstdCompressor(level=level).compressobj()
+        return StreamCompressor(c.compress, c.flush)
+    raise ValueError(f"Unsupported encoding: {encoding!r}")
+
+
+def compress_bytes(data: bytes, encoding: str, level: int) -> bytes:
+    """
+    Compresses a whole body with the specified HTTP content encoding.
+    """
+    c = make_stream_compressor(encoding, level)
+    return c.compress(data) + c.finish()
+
+
+def gen_compressed_chunks(
+    chunks: Iterable[bytes], compressor: StreamCompressor
+) -> Iterable[bytes]:
+    """
+    Compresses an iterable of chunks (e.g. a WSGI ``app_iter``) as it is
+    consumed, yielding non-empty compressed chunks. Closes the source
+    iterable (if it has a ``close()`` method) when finished, as WSGI
+    requires.
+    """
+    try:
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def available_encodings(encodings: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Filters a list of encodings to those we can actually produce.
+    """
+    result = []
+    for encoding in encodings:
+        if encoding == GZIP_ENCODING:
+            result.append(encoding)
+        elif encoding == BR_ENCODING and brotli:
+            result.append(encoding)
+        elif encoding == ZSTD_ENCODING and zstandard:
+            result.append(encoding)
+        else:
+            log.debug(f"Compression encoding unavailable: {encoding!r}")
+    return tuple(result)
+
+
+def choose_encoding(
+    accept_encoding: Optional[str], offered: Iterable[str]
+) -> Optional[str]:
+    """
+    Chooses the best content encoding that the client will accept.
+
+    Args:
+        accept_encoding: value of the request's ``Accept-Encoding`` header
+        offered: encodings we can produce, in our order of preference (used
+            to break ties)
+
+    Returns:
+        an encoding, or ``None`` for no compression
+    """
+    if not accept_encoding:
+        return None
+    qvalues: Dict[str, float] = {}
+    for encoding, qvalue in gen_accept_encoding_qvalues(accept_encoding):
+        qvalues[encoding.lower()] = qvalue
+    wildcard_q = qvalues.get("*", 0.0)
+    best: Optional[str] = None
+    best_q = 0.0
+    for encoding in offered:
+        q = qvalues.get(encoding, wildcard_q)
+        if q > best_q:
+            best, best_q = encoding, q
+    if best is not None and qvalues.get(IDENTITY_ENCODING, 0.0) > best_q:
+        return None  # client explicitly prefers uncompressed
+    return best
+
+
+def encoding_etag(etag: str, encoding: str) -> str:
+    """
+    Returns the ``ETag`` for a content-encoded representation of a resource,
+    by suffixing the opaque tag with the encoding (preserving any weak
+    prefix); for example, ``"abc"`` becomes ``"abc-gzip"`` and ``W/"abc"``
+    becomes ``W/"abc-gzip"``.
+    """
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return f"{etag}-{encoding}"  # malformed (unquoted), but do our best
+
+
+# =============================================================================
+# Pyramid compression tween
 # =============================================================================
 
 
@@ -55,7 +267,8 @@ class CompressionTweenFactory(object):
     """
     Makes a Pyramid tween that (a) detects incoming compression and
     uncompresses requests; (b) applies compression to responses if the
-    requestor will accept this.
+    requestor will accept this, and if the response is worth compressing.
+    See the module docstring for settings.
 
     See:
 
@@ -69,6 +282,34 @@ class CompressionTweenFactory(object):
     ) -> None:
         self.handler = handler
         self.registry = registry
+        settings = registry.settings or {}
+        self.min_size = int(settings.get(SETTING_MIN_SIZE, DEFAULT_MIN_SIZE))
+        self.content_types = frozenset(
+            aslist(settings[SETTING_CONTENT_TYPES])
+            if SETTING_CONTENT_TYPES in settings
+            else DEFAULT_COMPRESSIBLE_CONTENT_TYPES
+        )
+        self.encodings = available_encodings(
+            aslist(settings[SETTING_ENCODINGS])
+            if SETTING_ENCODINGS in settings
+            else DEFAULT_ENCODINGS
+        )
+        self.levels = {
+            GZIP_ENCODING: int(
+                settings.get(SETTING_GZIP_LEVEL, DEFAULT_GZIP_LEVEL)
+            ),
+            BR_ENCODING: int(
+                settings.get(SETTING_BROTLI_QUALITY, DEFAULT_BROTLI_QUALITY)
+            ),
+            ZSTD_ENCODING: int(
+                settings.get(SETTING_ZSTD_LEVEL, DEFAULT_ZSTD_LEVEL)
+            ),
+        }
+        self.cache_size = int(
+            settings.get(SETTING_CACHE_SIZE, DEFAULT_CACHE_SIZE)
+        )
+        self._cache: OrderedDict[Tuple[str, str, bytes], bytes] = OrderedDict()
+        self._cache_lock = Lock()
 
     def __call__(self, request: Request) -> Response:
         # 1. Pre-processing, if required.
@@ -76,8 +317,96 @@ class CompressionTweenFactory(object):
         # 2. Call the rest of the application:
         response = self.handler(request)  # type: Response
         # 3. Post-processing:
-        if request_accepts_gzip(request):
-            response.encode_content("gzip")
-            # Only gzip is supported directly by webob, but it's a good choice.
+        self.compress_response(request, response)
         # 4. Done
         return response
+
+    def is_compressible_type(self, content_type: Optional[str]) -> bool:
+        """
+        Is this MIME type worth compressing?
+        """
+        if not content_type:
+            return False
+        return (
+            content_type.startswith("text/")
+            or content_type.endswith(("+json", "+xml"))
+            or content_type in self.content_types
+        )
+
+    def compress_response(self, request: Request, response: Response) -> None:
+        """
+        Compresses the response in place, if appropriate.
+        """
+        if (
+            response.content_encoding
+            or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or not self.is_compressible_type(response.content_type)
+            or (response.cache_control and response.cache_control.no_transform)
+        ):
+            return
+        vary = tuple(response.vary or ())
+        if HTTP_VARY_ACCEPT_ENCODING not in vary:
+            response.vary = vary + (HTTP_VARY_ACCEPT_ENCODING,)
+        encoding = choose_encoding(
+            request.headers.get(HTTP_ACCEPT_ENCODING), self.encodings
+        )
+        if encoding is None:
+            return
+        level = self.levels[encoding]
+        app_iter = response.app_iter
+        if not isinstance(app_iter, list):
+            # Stream it.
+            response.app_iter = gen_compressed_chunks(
+                app_iter, make_stream_compressor(encoding, level)
+            )
+            response.content_length = None
+            self._set_content_encoding(response, encoding)
+            return
+        body = response.body
+        if len(body) < self.min_size:
+            return
+        etag = response.headers.get("ETag")
+        if self.cache_size <= 0 or not etag or etag.startswith("W/"):
+            # Only strong ETags guarantee byte-identical bodies.
+            compressed = compress_bytes(body, encoding, level)
+        else:
+            # ETags are only unique per resource, so different resources may
+            # share one; the body digest prevents any confusion between them.
+            digest = hashlib.blake2b(body, digest_size=16).digest()
+            compressed = self._get_cached_compressed(
+                (etag, encoding, digest), body, level
+            )
+        response.body = compressed
+        self._set_content_encoding(response, encoding)
+
+    @staticmethod
+    def _set_content_encoding(response: Response, encoding: str) -> None:
+        """
+        Marks the response as encoded, and makes its ``ETag`` (if any)
+        specific to that encoding.
+        """
+        response.content_encoding = encoding
+        etag = response.headers.get("ETag")
+        if etag:
+            response.headers["ETag"] = encoding_etag(etag, encoding)
+
+    def _get_cached_compressed(
+        self, key: Tuple[str, str, bytes], body: bytes, level: int
+    ) -> bytes:
+        """
+        Returns the compressed body for a cache key ``(etag, encoding,
+        body_digest)``, compressing and caching it if necessary.
+        """
+        cache = self._cache
+        with self._cache_lock:
+            compressed = cache.get(key)
+            if compressed is not None:
+                cache.move_to_end(key)
+                return compressed
+        compressed = compress_bytes(body, key[1], level)
+        with self._cache_lock:
+            cache[key] = compressed
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return compressed
@@ -28,7 +28,7 @@ Functions to operate on Pyramid requests.
 
 import gzip
 import logging
-from typing import Generator
+from typing import Generator, Tuple
 import zlib
 
 # noinspection PyUnresolvedReferences
@@ -60,6 +60,7 @@ DEFLATE_ENCODING = "deflate"
 GZIP_ENCODING = "gzip"
 X_GZIP_ENCODING = "x-gzip"
 IDENTITY_ENCODING = "identity"
+ZSTD_ENCODING = "zstd"
 
 
 def gen_accept_encoding_definitions(
@@ -107,6 +108,43 @@ def gen_accept_encodings(accept_encoding: str) -> Generator[str, None, None]:
         yield definition.split(";")[0].strip()
 
 
+def gen_accept_encoding_qvalues(
+    accept_encoding: str,
+) -> Generator[Tuple[str, float], None, None]:
+    """
+    For a given HTTP ``Accept-Encoding`` field value, generate tuples
+    ``(encoding, qvalue)``. An example might be:
+
+    .. code-block:: python
+
+        from cardinal_pythonlib.pyramid.requests import *
+        accept_encoding = "br;q=1.0, gzip;q=0.8, identity;q=0, *"
+        print(list(gen_accept_encoding_qvalues(accept_encoding)))
+
+    which gives
+
+    .. code-block:: none
+
+        [('br', 1.0), ('gzip', 0.8), ('identity', 0.0), ('*', 1.0)]
+
+    Malformed ``q`` parameters are treated as 0 (not acceptable).
+    """
+    for definition in gen_accept_encoding_definitions(accept_encoding):
+        encoding, *params = definition.split(";")
+        encoding = encoding.strip()
+        if not encoding:
+            continue
+        qvalue = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    qvalue = 0.0
+        yield encoding, qvalue
+
+
 def request_accepts_gzip(request: Request) -> bool:
     """
     Does the request specify an ``Accept-Encoding`` header that includes
@@ -27,8 +27,11 @@ suggested download methods, etc.).**
 
 """
 
+import os
+from typing import BinaryIO, Iterable, Union
+
 # noinspection PyUnresolvedReferences
-from pyramid.response import Response
+from pyramid.response import FileIter, Response
 
 from cardinal_pythonlib.httpconst import MimeType
 
@@ -78,6 +81,53 @@ class BinaryResponse(Response):
         )
 
 
+class BinaryStreamResponse(Response):
+    """
+    Base class for binary HTTP responses whose content is streamed, rather
+    than held in memory: from a file (e.g. a temporary file, which is closed
+    when the response is finished) or from an iterable of ``bytes`` chunks
+    (e.g. a generator).
+    """
+
+    def __init__(
+        self,
+        body: Union[BinaryIO, Iterable[bytes]],
+        filename: str,
+        content_type: str,
+        as_inline: bool = False,
+        content_length: int = None,
+        **kwargs,
+    ) -> None:
+        """
+        Args:
+            body: binary file-like object, or iterable of ``bytes``
+            filename: filename to associate with the download
+            content_type: MIME content type
+            as_inline: inline, rather than as an attachment? (See
+                :class:`BinaryResponse`.)
+            content_length: length in bytes, if known; for a seekable file,
+                it is worked out from the current position to the end
+        """
+        if hasattr(body, "read"):
+            if content_length is None and body.seekable():
+                position = body.tell()
+                content_length = body.seek(0, os.SEEK_END) - position
+                body.seek(position)
+            app_iter = FileIter(body)
+        else:
+            app_iter = body
+        disp = "inline" if as_inline else "attachment"
+        super().__init__(
+            content_type=content_type,
+            content_disposition=f"{disp}; filename={filename}",
+            content_encoding="binary",
+            app_iter=app_iter,
+            **kwargs,
+        )
+        if content_length is not None:
+            self.content_length = content_length
+
+
 class JsonAttachmentResponse(Response):
     """
     Response class for returning a JSON file to the user as an attachment.
@@ -119,6 +169,23 @@ class OdsResponse(BinaryResponse):
         )
 
 
+class OdsStreamResponse(BinaryStreamResponse):
+    """
+    Response class for streaming an ODS file to the user, e.g. from
+    :func:`cardinal_pythonlib.excel.gen_ods_chunks`.
+    """
+
+    def __init__(
+        self,
+        body: Union[BinaryIO, Iterable[bytes]],
+        filename: str,
+        **kwargs,
+    ) -> None:
+        super().__init__(
+            content_type=MimeType.ODS, body=body, filename=filename, **kwargs
+        )
+
+
 class PdfResponse(BinaryResponse):
     """
     Response class for returning a PDF to the user.
@@ -199,6 +266,23 @@ class XlsxResponse(BinaryResponse):
         )
 
 
+class XlsxStreamResponse(BinaryStreamResponse):
+    """
+    Response class for streaming an XLSX (Excel) file to the user, e.g. from
+    :func:`cardinal_pythonlib.excel.make_xlsx_tempfile`.
+    """
+
+    def __init__(
+        self,
+        body: Union[BinaryIO, Iterable[bytes]],
+        filename: str,
+        **kwargs,
+    ) -> None:
+        super().__init__(
+            content_type=MimeType.XLSX, body=body, filename=filename, **kwargs
+        )
+
+
 class XmlResponse(Response):
     """
     Response class for returning XML to the user.
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# cardinal_pythonlib/pyramid/tests/compression_tests.py
+
+"""
+===============================================================================
+
+    Original code copyright (C) 2009-2022 Rudolf Cardinal (rudolf@pobox.com).
+
+    This file is part of cardinal_pythonlib.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+===============================================================================
+
+**Unit tests.**
+
+"""
+
+import gzip
+from typing import Any, Dict, List
+import unittest
+
+# noinspection PyUnresolvedReferences
+from pyramid.registry import Registry
+
+# noinspection PyUnresolvedReferences
+from pyramid.response import Response
+
+# noinspection PyUnresolvedReferences
+from pyramid.testing import DummyRequest
+
+from cardinal_pythonlib.pyramid.compression import (
+    choose_encoding,
+    CompressionTweenFactory,
+    encoding_etag,
+    SETTING_CACHE_SIZE,
+    SETTING_ENCODINGS,
+    SETTING_MIN_SIZE,
+)
+from cardinal_pythonlib.pyramid.requests import gen_accept_encoding_qvalues
+
+BODY = b"Hello, world. " * 200  # compressible, and over the default min_size
+
+
+def make_tween(**settings: Any) -> CompressionTweenFactory:
+    registry = Registry()
+    registry.settings = {SETTING_ENCODINGS: "gzip", **settings}
+    return CompressionTweenFactory(handler=None, registry=registry)
+
+
+def make_request(accept_encoding: str = "gzip") -> DummyRequest:
+    return DummyRequest(headers={"Accept-Encoding": accept_encoding})
+
+
+def make_response(
+    body: bytes = BODY,
+    content_type: str = "text/plain",
+    headers: Dict[str, str] = None,
+    **kwargs: Any,
+) -> Response:
+    response = Response(body=body, content_type=content_type, **kwargs)
+    # Passing "headers" to the constructor would discard the content type.
+    response.headers.update(headers or {})
+    return response
+
+
+# =============================================================================
+# Content negotiation
+# =============================================================================
+
+
+class NegotiationTests(unittest.TestCase):
+    def test_qvalues(self) -> None:
+        self.assertEqual(
+            list(
+                gen_accept_encoding_qvalues(
+                    "br;q=1.0, gzip;q=0.8, identity;q=0, *, x;q=junk, ;q=1"
+                )
+            ),
+            [
+                ("br", 1.0),
+                ("gzip", 0.8),
+                ("identity", 0.0),
+                ("*", 1.0),
+                ("x", 0.0),
+            ],
+        )
+
+    def test_choose_encoding(self) -> None:
+        offered = ("br", "gzip")
+        for accept_encoding, expected in (
+            (None, None),
+            ("", None),
+            ("gzip", "gzip"),
+            ("gzip, br", "br"),  # tie: our preference
+            ("br;q=0.5, gzip", "gzip"),  # client preference
+            ("GZIP", "gzip"),  # case-insensitive
+            ("br;q=0, gzip;q=0", None),  # q=0: not acceptable
+            ("deflate", None),  # nothing we offer
+            ("*", "br"),
+            ("*;q=0.5, br;q=0", "gzip"),  # explicit q=0 beats wildcard
+            ("*;q=0", None),
+            ("gzip;q=0.5, identity", None),  # prefers uncompressed
+            ("gzip, identity;q=0.5", "gzip"),
+        ):
+            self.assertEqual(
+                choose_encoding(accept_encoding, offered),
+                expected,
+                accept_encoding,
+            )
+
+    def test_encoding_etag(self) -> None:
+        self.assertEqual(encoding_etag('"abc"', "gzip"), '"abc-gzip"')
+        self.assertEqual(encoding_etag('W/"abc"', "br"), 'W/"abc-br"')
+
+
+# =============================================================================
+# Response compression
+# =============================================================================
+
+
+class CompressResponseTests(unittest.TestCase):
+    def test_compresses(self) -> None:
+        tween = make_tween()
+        response = make_response(headers={"ETag": '"v1"'})
+        tween.compress_response(make_request(), response)
+        self.assertEqual(response.content_encoding, "gzip")
+        self.assertIn("Accept-Encoding", response.vary)
+        self.assertEqual(response.headers["ETag"], '"v1-gzip"')
+        self.assertEqual(response.content_length, len(response.body))
+        self.assertEqual(gzip.decompress(response.body), BODY)
+
+    def test_not_acceptable(self) -> None:
+        tween = make_tween()
+        for accept_encoding in ("identity", "gzip;q=0", "br"):
+            response = make_response()
+            tween.compress_response(make_request(accept_encoding), response)
+            self.assertIsNone(response.content_encoding, accept_encoding)
+            self.assertEqual(response.body, BODY)
+            # ... but caches must still know that the response may vary:
+            self.assertIn("Accept-Encoding", response.vary)
+
+    def test_min_size(self) -> None:
+        tween = make_tween(**{SETTING_MIN_SIZE: "100"})
+        small = make_response(body=b"x" * 99)
+        tween.compress_response(make_request(), small)
+        self.assertIsNone(small.content_encoding)
+        self.assertEqual(small.body, b"x" * 99)
+
+        large = make_response(body=b"x" * 100)
+        tween.compress_response(make_request(), large)
+        self.assertEqual(large.content_encoding, "gzip")
+
+    def test_skipped_responses(self) -> None:
+        tween = make_tween()
+        for kwargs in (
+            dict(content_type="application/pdf"),
+            dict(content_type="image/png"),
+            dict(content_type="application/zip"),
+            dict(status=206),
+            dict(headers={"Content-Encoding": "br"}),
+            dict(headers={"Cache-Control": "no-transform"}),
+        ):
+            response = make_response(**kwargs)
+            tween.compress_response(make_request(), response)
+            self.assertNotEqual(
+                response.content_encoding, "gzip", msg=str(kwargs)
+            )
+            self.assertEqual(response.body, BODY, msg=str(kwargs))
+
+    def test_compressible_types(self) -> None:
+        tween = make_tween()
+        for content_type in (
+            "text/html",
+            "application/json",
+            "application/vnd.api+json",
+            "image/svg+xml",
+        ):
+            response = make_response(content_type=content_type)
+            tween.compress_response(make_request(), response)
+            self.assertEqual(response.content_encoding, "gzip", content_type)
+
+    def test_streaming_body(self) -> None:
+        closed: List[bool] = []
+
+        class Chunks(object):
+            def __iter__(self):
+                for _ in range(200):
+                    yield b"Hello, world. "
+
+            def close(self) -> None:
+                closed.append(True)
+
+        # Streamed bodies are compressed whatever their size; their length
+        # isn't known in advance.
+        tween = make_tween(**{SETTING_MIN_SIZE: str(10 * len(BODY))})
+        response = make_response(body=b"")
+        response.app_iter = Chunks()
+        response.content_length = None
+        tween.compress_response(make_request(), response)
+        self.assertEqual(response.content_encoding, "gzip")
+        self.assertIsNone(response.content_length)
+        self.assertFalse(closed)  # not consumed yet
+        compressed = b"".join(response.app_iter)
+        self.assertEqual(gzip.decompress(compressed), BODY)
+        self.assertEqual(closed, [True])
+
+    def test_cache_key_includes_body(self) -> None:
+        # Two different resources that (wrongly, or per-resource) share an
+        # ETag must not be given each other's compressed bodies.
+        tween = make_tween()
+        other_body = b"Goodbye, world. " * 200
+        results: Dict[bytes, bytes] = {}
+        for body in (BODY, other_body, BODY):
+            response = make_response(body=body, headers={"ETag": '"same"'})
+            tween.compress_response(make_request(), response)
+            self.assertEqual(gzip.decompress(response.body), body)
+            results.setdefault(body, response.body)
+            self.assertEqual(response.body, results[body])
+        self.assertEqual(len(tween._cache), 2)
+
+    def test_cache_use(self) -> None:
+        tween = make_tween(**{SETTING_CACHE_SIZE: "1"})
+        for etag in ('"a"', '"b"', '"b"'):
+            response = make_response(headers={"ETag": etag})
+            tween.compress_response(make_request(), response)
+            self.assertEqual(gzip.decompress(response.body), BODY)
+        self.assertEqual(len(tween._cache), 1)  # bounded
+
+        # Weak ETags, and no ETag, are not cached.
+        tween = make_tween()
+        for headers in ({"ETag": 'W/"a"'}, {}):
+            response = make_response(headers=headers)
+            tween.compress_response(make_request(), response)
+            self.assertEqual(response.content_encoding, "gzip")
+        self.assertEqual(len(tween._cache), 0)
+
+        # Nor is anything, if the cache is disabled.
+        tween = make_tween(**{SETTING_CACHE_SIZE: "0"})
+        response = make_response(headers={"ETag": '"a"'})
+        tween.compress_response(make_request(), response)
+        self.assertEqual(response.content_encoding, "gzip")
+        self.assertEqual(len(tween._cache), 0)
@@ -32,11 +32,24 @@ Note:
 
 """
 
+from collections import namedtuple
 import datetime
 import decimal
 from decimal import Decimal
 import logging
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
 
 import xlrd
 from xlrd import Book
@@ -49,6 +62,10 @@ from cardinal_pythonlib.datetimefunc import (
 from cardinal_pythonlib.progress import ActivityCounter
 from cardinal_pythonlib.reprfunc import simple_repr
 
+if TYPE_CHECKING:
+    import numpy as np
+    from pandas import DataFrame
+
 log = logging.getLogger(__name__)
 
 
@@ -260,6 +277,115 @@ def colnum_zb_from_alphacol(alphacol: str) -> int:
     return total
 
 
+# =============================================================================
+# Column schema, for bulk reading
+# =============================================================================
+
+
+class SheetColumnType(object):
+    """
+    Column types for bulk reading via :class:`SheetColumn`. Each corresponds
+    to a :class:`SheetHolder` single-cell reader (e.g. ``INT`` to
+    :meth:`SheetHolder.read_int`), with the same conversion rules.
+    """
+
+    VALUE = "value"
+    STR = "str"
+    STR_INT = "str_int"
+    STR_NONFLOAT = "str_nonfloat"
+    INT = "int"
+    FLOAT = "float"
+    DECIMAL = "decimal"
+    BOOL = "bool"
+    DATE = "date"
+    DATETIME = "datetime"
+
+
+_NUMERIC_OR_NONE_TYPES = frozenset([float, int, type(None)])
+_SHEET_COLUMN_TYPES = {
+    v
+    for k, v in vars(SheetColumnType).items()
+    if not k.startswith("_") and isinstance(v, str)
+}
+
+
+class SheetColumn(object):
+    """
+    Declares one column to be read in bulk by
+    :meth:`SheetHolder.read_typed_columns` and friends. For example:
+
+    .. code-block:: python
+
+        from cardinal_pythonlib.spreadsheets import (
+            SheetColumn,
+            SheetColumnType as T,
+            SheetHolder,
+        )
+
+        REFERRAL_SCHEMA = [
+            SheetColumn("Patient ID", T.STR_INT, name="patient_id"),
+            SheetColumn("Age", T.INT, name="age"),
+            SheetColumn(["Sex", "Gender"], T.STR, name="gender"),
+            SheetColumn("Referral date", T.DATE, name="referral_date"),
+        ]
+
+        sheet = SheetHolder(book, sheet_name="Patient Referrals 2018-19")
+        df = sheet.read_dataframe(REFERRAL_SCHEMA)
+    """
+
+    def __init__(
+        self,
+        header: Union[str, Sequence[str]] = None,
+        coltype: str = SheetColumnType.VALUE,
+        name: str = None,
+        col: int = None,
+        default: Any = None,
+        dp: int = None,
+        rounding: str = decimal.ROUND_HALF_UP,
+    ) -> None:
+        """
+        Args:
+            header:
+                Column heading, or a sequence of acceptable headings. If
+                ``col`` is not given, the column is found by its heading.
+            coltype:
+                One of the :class:`SheetColumnType` values.
+            name:
+                Output name (e.g. tuple field or DataFrame column). Defaults
+                to the (first) heading. For typed tuples, this must be a
+                valid Python identifier.
+            col:
+                Zero-based column index. If ``header`` is also given, it is
+                checked.
+            default:
+                Value for blank cells.
+            dp:
+                For ``DECIMAL`` columns: number of decimal places to force
+                (see :meth:`SheetHolder.read_decimal`).
+            rounding:
+                For ``DECIMAL`` columns: rounding method.
+        """
+        if coltype not in _SHEET_COLUMN_TYPES:
+            raise ValueError(f"Bad column type: {coltype!r}")
+        if header is None and col is None:
+            raise ValueError("Specify header and/or col")
+        if name is None:
+            if header is None:
+                name = column_lettering(col)
+            else:
+                name = header if isinstance(header, str) else header[0]
+        self.header = header
+        self.coltype = coltype
+        self.name = name
+        self.col = col
+        self.default = default
+        self.dp = dp
+        self.rounding = rounding
+
+    def __repr__(self) -> str:
+        return simple_repr(self, ["header", "coltype", "name", "col"])
+
+
 # =============================================================================
 # SheetHolder
 # =============================================================================
@@ -838,6 +964,338 @@ class SheetHolder(object):
                 counter.tick()
             yield self.sheet.row(index)
 
+    # -------------------------------------------------------------------------
+    # Bulk (columnar) reading
+    # -------------------------------------------------------------------------
+    # Reading cell by cell (e.g. via RowHolder) costs several Python method
+    # calls per cell. For large sheets, these functions read whole columns at
+    # once (via xlrd's col_values) and convert them together; numeric and
+    # date columns are converted with NumPy. Any cell that is not of the
+    # expected type is passed to the corresponding single-cell reader, so the
+    # results (and errors) are the same as for those readers.
+
+    def find_column(self, header: Union[str, Sequence[str]]) -> int:
+        """
+        Returns the zero-based index of the first column with the specified
+        heading (or one of the specified headings), or raises
+        :exc:`ValueError`.
+        """
+        acceptable = [header] if isinstance(header, str) else list(header)
+        for col, h in enumerate(self.headers):
+            if h in acceptable:
+                self._checked_headers[col] = h
+                return col
+        raise ValueError(
+            f"No column with header {header!r} in sheet {self.sheet_name!r}; "
+            f"headers are {self.headers!r}"
+        )
+
+    def read_column_values(
+        self,
+        col: int,
+        check_header: Union[str, Sequence[str]] = None,
+    ) -> List[Any]:
+        """
+        Reads all data values from a column (honouring
+        ``debug_max_rows_per_sheet``), as for :meth:`read_value`: that is,
+        with null values converted to ``None``.
+        """
+        if check_header is not None:
+            self.ensure_header(col, check_header)
+        end, _ = self._setup_for_gen(with_counter=False)
+        values = self.sheet.col_values(
+            col, self.first_data_row_zero_based, end
+        )
+        nulls: Collection[Any]
+        try:
+            nulls = frozenset(self.null_values)
+        except TypeError:  # unhashable null values
+            nulls = self.null_values
+        return [None if v in nulls else v for v in values]
+
+    def _column_index(self, column: SheetColumn) -> int:
+        """
+        Finds the column index for a :class:`SheetColumn`, checking its
+        header if required.
+        """
+        if column.col is None:
+            return self.find_column(column.header)
+        if column.header is not None:
+            self.ensure_header(column.col, column.header)
+        return column.col
+
+    def _convert_by_cell(
+        self,
+        result: List[Any],
+        indexes: Iterable[int],
+        col: int,
+        reader: Callable[[int, int], Any],
+    ) -> None:
+        """
+        Converts the value at data index ``i``, for each ``i`` in ``indexes``,
+        using a single-cell reader, ``reader(row, col)``, storing the results
+        in ``result``.
+        """
+        first_row = self.first_data_row_zero_based
+        for i in indexes:
+            result[i] = reader(first_row + i, col)
+
+    def _numeric_column(
+        self, values: List[Any]
+    ) -> Tuple["np.ndarray", "np.ndarray", List[int]]:
+        """
+        Converts a column to NumPy form.
+
+        Returns:
+            tuple: ``floats, is_null, others``, where ``floats`` is a float64
+            array (NaN for null or non-numeric cells), ``is_null`` is a
+            boolean array marking blank cells, and ``others`` is a list of the
+            indexes of non-numeric, non-blank cells
+        """
+        import numpy as np
+
+        if set(map(type, values)) <= _NUMERIC_OR_NONE_TYPES:
+            # Fast path: entirely numeric, apart from nulls.
+            floats = np.array(values, dtype=np.float64)  # None becomes NaN
+            return floats, np.isnan(floats), []
+        n = len(values)
+        floats = np.full(n, np.nan)
+        is_null = np.zeros(n, dtype=bool)
+        others = []  # type: List[int]
+        numeric_idx = []  # type: List[int]
+        numeric_vals = []  # type: List[float]
+        for i, v in enumerate(values):
+            t = type(v)
+            if t is float or t is int:
+                numeric_idx.append(i)
+                numeric_vals.append(v)
+            elif none_or_blank_string(v):
+                is_null[i] = True
+            else:
+                others.append(i)
+        if numeric_idx:
+            floats[numeric_idx] = numeric_vals
+        return floats, is_null, others
+
+    def _raise_bad(self, what: str, v: Any, i: int, col: int) -> None:
+        """
+        Raises :exc:`ValueError` for a bad value at data index ``i``.
+        """
+        raise ValueError(
+            f"Bad {what}: {v!r}"
+            + self._locinfo(self.first_data_row_zero_based + i, col)
+        )
+
+    def _read_int_column(
+        self, values: List[Any], col: int, default: Any
+    ) -> List[Any]:
+        """
+        Bulk equivalent of :meth:`read_int`.
+        """
+        import numpy as np
+
+        floats, is_null, others = self._numeric_column(values)
+        numeric = ~np.isnan(floats)
+        huge = numeric & (np.abs(floats) >= 2.0**53)
+        if huge.any():  # beyond float precision; let Python handle it
+            others = sorted(others + np.flatnonzero(huge).tolist())
+            numeric &= ~huge
+        bad = numeric & (floats != np.floor(floats))
+        if bad.any():
+            i = int(np.argmax(bad))
+            self._raise_bad("int", values[i], i, col)
+        result = np.where(numeric, floats, 0).astype(np.int64).tolist()
+        for i in np.flatnonzero(is_null).tolist():
+            result[i] = default
+        self._convert_by_cell(
+            result,
+            others,
+            col,
+            lambda r, c: self.read_int(r, c, default),
+        )
+        return result
+
+    def _read_float_column(
+        self, values: List[Any], col: int, default: Any
+    ) -> List[Any]:
+        """
+        Bulk equivalent of :meth:`read_float`.
+        """
+        import numpy as np
+
+        floats, is_null, others = self._numeric_column(values)
+        result = floats.tolist()
+        for i in np.flatnonzero(is_null).tolist():
+            result[i] = default
+        self._convert_by_cell(
+            result,
+            others,
+            col,
+            lambda r, c: self.read_float(r, c, default),
+        )
+        return result
+
+    def _read_datetime_column(
+        self, values: List[Any], col: int, default: Any
+    ) -> List[Any]:
+        """
+        Bulk equivalent of :meth:`read_datetime`.
+        """
+        import numpy as np
+
+        floats, is_null, others = self._numeric_column(values)
+        numeric = ~np.isnan(floats)
+        if self.book.datemode == 0:
+            epoch = np.datetime64("1899-12-30T00:00:00", "s")
+            first_day = 61  # earlier dates are ambiguous, per xlrd
+            too_large = 2958466  # year 10000
+        else:
+            epoch = np.datetime64("1904-01-01T00:00:00", "s")
+            first_day = 1
+            too_large = 2958466 - 1462
+        # As for xlrd.xldate_as_tuple(): whole days, plus the fraction of a
+        # day rounded to the nearest second.
+        in_range = numeric & (floats >= 0) & (floats < too_large)
+        safe = np.where(in_range, floats, 0.0)
+        days = np.floor(safe)
+        seconds = np.round((safe - days) * 86400.0)
+        days_rolled = days + (seconds == 86400.0)
+        ok = in_range & (days_rolled >= first_day) & (days_rolled < too_large)
+        stamps = (
+            epoch
+            + days.astype(np.int64).astype("timedelta64[D]")
+            + seconds.astype(np.int64).astype("timedelta64[s]")
+        )
+        result = np.where(ok, stamps, epoch).tolist()
+        # Nulls get the default; out-of-range numbers and strings go via
+        # read_datetime(), which raises or parses as appropriate.
+        for i in np.flatnonzero(is_null).tolist():
+            result[i] = default
+        odd = sorted(others + np.flatnonzero(numeric & ~ok).tolist())
+        self._convert_by_cell(
+            result,
+            odd,
+            col,
+            lambda r, c: self.read_datetime(r, c, default),
+        )
+        return result
+
+    def _read_bool_column(
+        self, values: List[Any], col: int, default: Any
+    ) -> List[Any]:
+        """
+        Bulk equivalent of :meth:`read_bool`. Each distinct value is
+        interpreted only once.
+        """
+        first_row = self.first_data_row_zero_based
+        memo = {}  # type: Dict[Any, Any]
+        result = []  # type: List[Any]
+        for i, v in enumerate(values):
+            try:
+                b = memo[v]
+            except KeyError:
+                b = memo[v] = self.read_bool(first_row + i, col, default)
+            result.append(b)
+        return result
+
+    def _read_typed_column(
+        self, values: List[Any], column: SheetColumn, col: int
+    ) -> List[Any]:
+        """
+        Converts a column of values according to its declared type.
+        """
+        coltype = column.coltype
+        default = column.default
+        T = SheetColumnType
+        if coltype == T.VALUE:
+            return values
+        if coltype == T.STR:
+            return [
+                default if none_or_blank_string(v) else str(v).strip()
+                for v in values
+            ]
+        if coltype == T.INT:
+            return self._read_int_column(values, col, default)
+        if coltype == T.STR_INT:
+            ints = self._read_int_column(values, col, None)
+            return [default if x is None else str(x) for x in ints]
+        if coltype == T.FLOAT:
+            return self._read_float_column(values, col, default)
+        if coltype == T.DATETIME:
+            return self._read_datetime_column(values, col, default)
+        if coltype == T.DATE:
+            datetimes = self._read_datetime_column(values, col, None)
+            return [dt.date() if dt else default for dt in datetimes]
+        if coltype == T.BOOL:
+            return self._read_bool_column(values, col, default)
+        # Otherwise, cell by cell, but without re-reading or header checks:
+        result = [default] * len(values)
+        if coltype == T.DECIMAL:
+
+            def reader(r: int, c: int) -> Any:
+                return self.read_decimal(
+                    r, c, default, dp=column.dp, rounding=column.rounding
+                )
+
+        else:  # STR_NONFLOAT
+            assert coltype == T.STR_NONFLOAT
+
+            def reader(r: int, c: int) -> Any:
+                return self.read_str_nonfloat(r, c, default)
+
+        self._convert_by_cell(
+            result,
+            (i for i, v in enumerate(values) if not none_or_blank_string(v)),
+            col,
+            reader,
+        )
+        return result
+
+    def read_typed_columns(
+        self, schema: Sequence[SheetColumn]
+    ) -> Dict[str, List[Any]]:
+        """
+        Reads several columns in bulk, converting them according to their
+        declared types.
+
+        Args:
+            schema: sequence of :class:`SheetColumn` objects
+
+        Returns:
+            dict mapping each column's name to its list of values (one per
+            data row)
+        """
+        result = {}  # type: Dict[str, List[Any]]
+        for column in schema:
+            if column.name in result:
+                raise ValueError(f"Duplicate column name: {column.name!r}")
+            col = self._column_index(column)
+            values = self.read_column_values(col)
+            result[column.name] = self._read_typed_column(values, column, col)
+        return result
+
+    def read_typed_tuples(
+        self, schema: Sequence[SheetColumn], typename: str = "SheetRow"
+    ) -> List[Tuple]:
+        """
+        As for :meth:`read_typed_columns`, but returns a list of named tuples
+        (one per data row), whose fields are the column names.
+        """
+        columns = self.read_typed_columns(schema)
+        row_class = namedtuple(typename, list(columns.keys()))
+        # noinspection PyProtectedMember
+        return list(map(row_class._make, zip(*columns.values())))
+
+    def read_dataframe(self, schema: Sequence[SheetColumn]) -> "DataFrame":
+        """
+        As for :meth:`read_typed_columns`, but returns a
+        :class:`pandas.DataFrame`.
+        """
+        # Imported here, as pandas is slow to import.
+        from pandas import DataFrame
+
+        return DataFrame(self.read_typed_columns(schema))
+
 
 # =============================================================================
 # RowHolder
@@ -24,11 +24,21 @@
 
 **Factory to return an SQL grammer parser, given the name of an SQL dialect.**
 
+Grammars are built on first use, by :func:`make_grammar`, rather than when
+this module is imported. :func:`parse_sql` memoises parse results.
+
+Parsing is several times faster with pyparsing's "packrat" memoisation, but
+that is a process-wide setting, so this module doesn't turn it on for you;
+applications should call :func:`enable_packrat` at startup.
+
 """
 
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+from pyparsing import ParseBaseException, ParserElement, ParseResults
+
 from cardinal_pythonlib.sql.sql_grammar import SqlGrammar
-from cardinal_pythonlib.sql.sql_grammar_mssql import SqlGrammarMSSQLServer
-from cardinal_pythonlib.sql.sql_grammar_mysql import SqlGrammarMySQL
 from cardinal_pythonlib.sqlalchemy.dialect import SqlaDialectName
 
 
@@ -38,23 +48,236 @@ VALID_DIALECTS = [
     # PostgreSQL not properly supported yet.
 ]
 
+DEFAULT_PACKRAT_CACHE_SIZE = 128
+PARSE_CACHE_SIZE = 1024
+
+# Parser elements available via parse_sql(), each via SqlGrammar.get_*():
+GRAMMAR_ELEMENTS = (
+    "column_spec",
+    "expr",
+    "grammar",
+    "join_constraint",
+    "join_op",
+    "result_column",
+    "select_statement",
+    "table_spec",
+    "where_clause",
+    "where_expr",
+)
+
 
 # =============================================================================
 # Factory
 # =============================================================================
 
-mysql_grammar = SqlGrammarMySQL()
-mssql_grammar = SqlGrammarMSSQLServer()
 
+def enable_packrat(cache_size_limit: int = DEFAULT_PACKRAT_CACHE_SIZE) -> None:
+    """
+    Enables pyparsing's "packrat" memoisation, which makes our grammars
+    several times faster (their expression parsers otherwise re-parse the
+    same text repeatedly while backtracking).
+
+    This is a process-wide pyparsing setting, affecting all pyparsing
+    grammars, so it is for the application to call (e.g. at startup); it
+    has no effect if packrat parsing is already enabled.
 
-def make_grammar(dialect: str) -> SqlGrammar:
+    (pyparsing's alternative, left-recursion memoisation, is mutually
+    exclusive with packrat parsing, and our grammars are not left-recursive,
+    so we don't use it.)
     """
-    Factory to make an :class:`.SqlGrammar` from the name of an SQL dialect,
-    where the name is one of the members of :class:`.SqlaDialectName`.
+    ParserElement.enablePackrat(cache_size_limit)
+
+
+@lru_cache(maxsize=None)
+def _build_grammar(dialect: str) -> SqlGrammar:
+    """
+    Imports (thereby building) and instantiates the grammar for a dialect.
     """
     if dialect == SqlaDialectName.MYSQL:
-        return mysql_grammar
+        from cardinal_pythonlib.sql.sql_grammar_mysql import SqlGrammarMySQL
+
+        return SqlGrammarMySQL()
     elif dialect == SqlaDialectName.MSSQL:
-        return mssql_grammar
+        from cardinal_pythonlib.sql.sql_grammar_mssql import (
+            SqlGrammarMSSQLServer,
+        )
+
+        return SqlGrammarMSSQLServer()
     else:
         raise AssertionError(f"Invalid SQL dialect: {dialect!r}")
+
+
+def make_grammar(dialect: str) -> SqlGrammar:
+    """
+    Factory to make an :class:`.SqlGrammar` from the name of an SQL dialect,
+    where the name is one of the members of :class:`.SqlaDialectName`.
+
+    The grammar is built on first request, and the same object is returned
+    subsequently. For speed, see also :func:`enable_packrat`.
+
+    Args:
+        dialect: dialect name
+    """
+    return _build_grammar(dialect)
+
+
+def __getattr__(name: str) -> SqlGrammar:
+    # These module attributes used to be created at import time; build them
+    # on demand instead.
+    if name == "mysql_grammar":
+        return make_grammar(SqlaDialectName.MYSQL)
+    if name == "mssql_grammar":
+        return make_grammar(SqlaDialectName.MSSQL)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# =============================================================================
+# Cached parsing
+# =============================================================================
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cached(
+    dialect: str, element: str, text: str, parse_all: bool
+) -> Tuple[Optional[ParseResults], Optional[ParseBaseException]]:
+    """
+    Parses, returning ``(result, None)`` or ``(None, exception)``, so that
+    failures are cached too.
+    """
+    parser = getattr(make_grammar(dialect), f"get_{element}")()
+    try:
+        return parser.parseString(text, parseAll=parse_all), None
+    except ParseBaseException as e:
+        return None, e
+
+
+def parse_sql(
+    dialect: str,
+    text: str,
+    element: str = "grammar",
+    parse_all: bool = True,
+) -> ParseResults:
+    """
+    Parses SQL using the grammar for the specified dialect, memoising the
+    results (in an LRU cache keyed by dialect, element and text). Repeated
+    validation of the same fragment, e.g. a ``WHERE`` clause, is then
+    almost free.
+
+    Args:
+        dialect:
+            dialect name (see :func:`make_grammar`)
+        text:
+            SQL to parse
+        element:
+            which part of the grammar to parse with; one of
+            :data:`GRAMMAR_ELEMENTS`, e.g. ``"grammar"`` for a whole
+            statement, or ``"where_expr"``
+        parse_all:
+            require the whole text to be parsed?
+
+    Returns:
+        the parse results. The same object is returned for repeated calls,
+        so don't modify it.
+
+    Raises:
+        :exc:`pyparsing.ParseException` if the text doesn't parse (failures
+        are cached too).
+    """
+    if element not in GRAMMAR_ELEMENTS:
+        raise ValueError(
+            f"Invalid grammar element: {element!r}; "
+            f"use one of {GRAMMAR_ELEMENTS}"
+        )
+    result, exc = _parse_cached(dialect, element, text, parse_all)
+    if exc is not None:
+        raise exc.with_traceback(None)
+    return result
+
+
+def clear_parse_cache() -> None:
+    """
+    Empties the :func:`parse_sql` cache.
+    """
+    _parse_cached.cache_clear()
+
+
+# =============================================================================
+# Benchmarking
+# =============================================================================
+
+BENCHMARK_WHERE_EXPRS = [
+    "a = 1 AND b = 2",
+    "p.nhs_number IS NOT NULL "
+    "AND (p.dob < '1950-01-01' OR p.sex IN ('F', 'X'))",
+    "d.diagnosis LIKE 'F2%' AND NOT d.deleted",
+]
+
+BENCHMARK_SELECTS = [
+    "SELECT a, b FROM t WHERE a = 1",
+    "SELECT t.a, COUNT(*) AS n FROM t INNER JOIN u ON t.id = u.tid "
+    "WHERE t.x > 5 AND (u.y LIKE 'abc%' OR u.z IN (1, 2, 3)) "
+    "GROUP BY t.a HAVING n > 2 ORDER BY n DESC",
+    "SELECT DISTINCT p.patient_id, p.forename, p.surname "
+    "FROM patient p LEFT JOIN note n ON n.patient_id = p.patient_id "
+    "WHERE n.note_date BETWEEN '2020-01-01' AND '2021-01-01' "
+    "AND NOT EXISTS (SELECT 1 FROM exclusion e "
+    "WHERE e.patient_id = p.patient_id)",
+    "SELECT CASE WHEN a > 1 THEN 'x' WHEN a < 0 THEN 'y' ELSE 'z' END AS c, "
+    "MAX(b) FROM t WHERE c IS NOT NULL AND d + 3 * e - f / 2 >= 10",
+]
+
+
+def benchmark_sql_grammar(
+    dialects: Iterable[str] = None, repeats: int = 3, packrat: bool = True
+) -> Dict[str, float]:
+    """
+    Times grammar construction and parsing over a small corpus of realistic
+    queries (:data:`BENCHMARK_SELECTS`, :data:`BENCHMARK_WHERE_EXPRS`).
+
+    Args:
+        dialects: dialects to test; default :data:`VALID_DIALECTS`
+        repeats: number of passes through the corpus to average over
+        packrat: call :func:`enable_packrat` first? (This lasts for the rest
+            of the process.)
+
+    Returns:
+        dict: mapping description to milliseconds (per corpus pass, for
+        parsing)
+    """
+    import timeit  # no need to import at load time
+
+    if packrat:
+        enable_packrat()
+    results = {}  # type: Dict[str, float]
+    corpus = [("grammar", sql) for sql in BENCHMARK_SELECTS] + [
+        ("where_expr", sql) for sql in BENCHMARK_WHERE_EXPRS
+    ]
+    for dialect in dialects or VALID_DIALECTS:
+        results[f"{dialect}: make_grammar() (first call builds)"] = (
+            timeit.timeit(lambda: make_grammar(dialect), number=1) * 1000
+        )
+        grammar = make_grammar(dialect)
+
+        def parse_uncached() -> None:
+            for element, sql in corpus:
+                getattr(grammar, f"get_{element}")().parseString(
+                    sql, parseAll=True
+                )
+
+        def parse_cached() -> None:
+            for element, sql in corpus:
+                parse_sql(dialect, sql, element=element)
+
+        results[f"{dialect}: parse, uncached"] = (
+            timeit.timeit(parse_uncached, number=repeats) / repeats * 1000
+        )
+        parse_cached()  # warm the cache
+        results[f"{dialect}: parse_sql(), cached"] = (
+            timeit.timeit(parse_cached, number=repeats) / repeats * 1000
+        )
+    return results
+
+
+if __name__ == "__main__":
+    for _name, _ms in benchmark_sql_grammar().items():
+        print(f"{_name}: {_ms:.3f} ms")
@@ -28,9 +28,11 @@
 
 import logging
 import re
+import subprocess
+import sys
 import unittest
 
-from pyparsing import Regex
+from pyparsing import ParseException, Regex
 
 from cardinal_pythonlib.sql.sql_grammar import (
     binary_literal,
@@ -51,8 +53,14 @@ from cardinal_pythonlib.sql.sql_grammar import (
     _test_succeed,
     _test_fail,
 )
+from cardinal_pythonlib.sql.sql_grammar_factory import (
+    clear_parse_cache,
+    make_grammar,
+    parse_sql,
+)
 from cardinal_pythonlib.sql.sql_grammar_mssql import SqlGrammarMSSQLServer
 from cardinal_pythonlib.sql.sql_grammar_mysql import SqlGrammarMySQL
+from cardinal_pythonlib.sqlalchemy.dialect import SqlaDialectName
 
 log = logging.getLogger(__name__)
 
@@ -159,3 +167,58 @@ class SqlGrammarTests(unittest.TestCase):
     @staticmethod
     def test_sqlgrammar_mysql() -> None:
         SqlGrammarMySQL().test()
+
+
+class SqlGrammarFactoryTests(unittest.TestCase):
+    def test_import_does_not_build_grammars(self) -> None:
+        code = (
+            "import sys\n"
+            "import cardinal_pythonlib.sql.sql_grammar_factory\n"
+            "print(any(m.startswith('cardinal_pythonlib.sql.sql_grammar_m')"
+            " for m in sys.modules))"
+        )
+        output = subprocess.check_output([sys.executable, "-c", code])
+        self.assertEqual(output.strip(), b"False")
+
+    def test_packrat_is_opt_in(self) -> None:
+        # Packrat parsing is process-wide, so check in a fresh process.
+        code = (
+            "from pyparsing import ParserElement\n"
+            "from cardinal_pythonlib.sql.sql_grammar_factory import (\n"
+            "    enable_packrat, make_grammar, parse_sql)\n"
+            "make_grammar('mysql')\n"
+            "parse_sql('mysql', 'a = 1', element='where_expr')\n"
+            "print(ParserElement._packratEnabled)\n"
+            "enable_packrat()\n"
+            "print(ParserElement._packratEnabled)"
+        )
+        output = subprocess.check_output([sys.executable, "-c", code])
+        self.assertEqual(output.split(), [b"False", b"True"])
+
+    def test_make_grammar(self) -> None:
+        grammar = make_grammar(SqlaDialectName.MYSQL)
+        self.assertIsInstance(grammar, SqlGrammarMySQL)
+        self.assertIs(make_grammar(SqlaDialectName.MYSQL), grammar)
+        self.assertIsInstance(
+            make_grammar(SqlaDialectName.MSSQL), SqlGrammarMSSQLServer
+        )
+        with self.assertRaises(AssertionError):
+            make_grammar("nonsense")
+
+    def test_parse_sql_cached(self) -> None:
+        clear_parse_cache()
+        where = "a = 1 AND (b LIKE 'x%' OR c IN (1, 2))"
+        result = parse_sql(SqlaDialectName.MSSQL, where, element="where_expr")
+        self.assertIs(
+            parse_sql(SqlaDialectName.MSSQL, where, element="where_expr"),
+            result,
+        )
+        self.assertIsNot(
+            parse_sql(SqlaDialectName.MYSQL, where, element="where_expr"),
+            result,
+        )
+        for _ in range(2):
+            with self.assertRaises(ParseException):
+                parse_sql(SqlaDialectName.MYSQL, "SELECT FROM WHERE")
+        with self.assertRaises(ValueError):
+            parse_sql(SqlaDialectName.MYSQL, where, element="nonsense")
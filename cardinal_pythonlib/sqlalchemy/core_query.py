@@ -51,28 +51,70 @@ Example of result types in SQLAlchemy 1.4+ and higher:
 
 """
 
-from typing import Any, List, Optional, Tuple, Union
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
 
 from sqlalchemy.engine.base import Connection, Engine
+from sqlalchemy.engine.result import Result
 from sqlalchemy.engine.row import Row
 from sqlalchemy.exc import MultipleResultsFound
 from sqlalchemy.orm.session import Session
 from sqlalchemy.sql.expression import (
+    and_,
     case,
     column,
+    ColumnClause,
+    ColumnElement,
     exists,
     func,
+    or_,
     select,
     table,
     text,
+    tuple_,
 )
 from sqlalchemy.sql.schema import Table
 from sqlalchemy.sql.selectable import Select, TableClause
 
 from cardinal_pythonlib.logs import get_brace_style_log_with_null_handler
+from cardinal_pythonlib.sqlalchemy.dialect import (
+    get_dialect_name,
+    quote_identifier,
+    SqlaDialectName,
+)
+
+if TYPE_CHECKING:
+    from numpy import ndarray
+    from pyarrow import RecordBatch
 
 log = get_brace_style_log_with_null_handler(__name__)
 
+DEFAULT_STREAM_BATCH_SIZE = 10000
+DEFAULT_IN_CHUNK_SIZE = 1000
+
+# Integers of larger magnitude may not survive conversion to float64:
+_MAX_EXACT_FLOAT_INT = 2**53
+
+# SQL Server permits at most 2100 parameters per statement; stay below that
+# for everyone.
+MAX_PARAMS_PER_STATEMENT = 2000
+
+# Dialects supporting "WHERE (a, b) IN ((1, 2), (3, 4))" (row-value IN):
+_TUPLE_IN_DIALECTS = frozenset(
+    [SqlaDialectName.MYSQL, SqlaDialectName.POSTGRES, SqlaDialectName.SQLITE]
+)
+
 
 # =============================================================================
 # Get query result with fieldnames
@@ -105,28 +147,11 @@ def get_rows_fieldnames_from_raw_sql(
     return rows, fieldnames
 
 
-def get_rows_fieldnames_from_select(
-    session: Union[Session, Engine, Connection], select_query: Select
-) -> Tuple[List[Row], List[str]]:
+def _check_select_is_not_for_orm_classes(select_query: Select) -> None:
     """
-    Returns results and column names from a query.
-
-    Args:
-        session:
-            SQLAlchemy :class:`Session`, :class:`Engine` (SQL Alchemy 1.4
-            only), or :class:`Connection` object
-        select_query:
-            select() statement, i.e. instance of
-            :class:`sqlalchemy.sql.selectable.Select`
-
-    Returns:
-        ``(rows, fieldnames)`` where ``rows`` is the usual set of results and
-        ``fieldnames`` are the name of the result columns/fields.
-
+    Raises :exc:`ValueError` if the ``select()`` statement queries whole ORM
+    classes, rather than columns or column-like expressions.
     """
-    if not isinstance(select_query, Select):
-        raise ValueError("select_query argument must be a select() statement")
-
     # Check that the user is not querying an ORM *class* rather than columns.
     # It doesn't make much sense to use this function in that case.
     # If Pet is an ORM class (see unit tests!), then:
@@ -172,6 +197,31 @@ def get_rows_fieldnames_from_select(
                 f"{select_query.column_descriptions}"
             )
 
+
+def get_rows_fieldnames_from_select(
+    session: Union[Session, Engine, Connection], select_query: Select
+) -> Tuple[List[Row], List[str]]:
+    """
+    Returns results and column names from a query.
+
+    Args:
+        session:
+            SQLAlchemy :class:`Session`, :class:`Engine` (SQL Alchemy 1.4
+            only), or :class:`Connection` object
+        select_query:
+            select() statement, i.e. instance of
+            :class:`sqlalchemy.sql.selectable.Select`
+
+    Returns:
+        ``(rows, fieldnames)`` where ``rows`` is the usual set of results and
+        ``fieldnames`` are the name of the result columns/fields.
+
+    """
+    if not isinstance(select_query, Select):
+        raise ValueError("select_query argument must be a select() statement")
+
+    _check_select_is_not_for_orm_classes(select_query)
+
     result = session.execute(select_query)
 
     fieldnames_rmkview = result.keys()
@@ -186,6 +236,179 @@ def get_rows_fieldnames_from_select(
     return rows, fieldnames
 
 
+# =============================================================================
+# Stream query results in batches
+# =============================================================================
+
+
+class ColumnarBatchFormat:
+    """
+    Constants for the ``columnar`` option of
+    :func:`gen_rows_fieldnames_batches_from_select` and
+    :func:`gen_rows_fieldnames_batches_from_raw_sql`.
+    """
+
+    NUMPY = "numpy"  # list of numpy.ndarray, one per column
+    ARROW = "arrow"  # pyarrow.RecordBatch
+
+
+def _values_to_numpy(values: Sequence[Any]) -> "ndarray":
+    """
+    Converts one column's values to a NumPy array. Columns that are purely
+    ``bool``, ``int``, or ``int``/``float`` (if every ``int`` is exactly
+    representable as a ``float``) become native NumPy arrays; anything else
+    (including columns containing ``NULL``, strings, dates and decimals)
+    becomes an ``object`` array, so values are not altered.
+    """
+    import numpy
+
+    types = set(map(type, values))
+    dtype = None
+    if types == {bool}:
+        dtype = numpy.bool_
+    elif types == {int}:
+        dtype = numpy.int64
+    elif types == {int, float} or types == {float}:
+        if all(
+            -_MAX_EXACT_FLOAT_INT <= v <= _MAX_EXACT_FLOAT_INT
+            for v in values
+            if type(v) is int
+        ):
+            dtype = numpy.float64
+    if dtype is not None:
+        try:
+            return numpy.array(values, dtype=dtype)
+        except OverflowError:  # e.g. integers too big for int64
+            pass
+    arr = numpy.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+
+def _rows_to_columnar(
+    rows: List[Row], fieldnames: List[str], columnar: str
+) -> Union[List["ndarray"], "RecordBatch"]:
+    """
+    Transposes a batch of rows into columns, in the format requested (see
+    :class:`ColumnarBatchFormat`).
+    """
+    if rows:
+        columns = list(zip(*rows))
+    else:
+        columns = [()] * len(fieldnames)
+    if columnar == ColumnarBatchFormat.NUMPY:
+        return [_values_to_numpy(values) for values in columns]
+    if columnar == ColumnarBatchFormat.ARROW:
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError(
+                "Cannot import pyarrow; try the command: pip install pyarrow"
+            )
+        return pyarrow.RecordBatch.from_arrays(
+            [pyarrow.array(values) for values in columns], names=fieldnames
+        )
+    raise ValueError(f"Unknown columnar format: {columnar!r}")
+
+
+def _gen_result_batches(
+    session: Union[Session, Connection],
+    statement: Any,
+    batch_size: int,
+    columnar: Optional[str],
+) -> Generator[Tuple[List[str], Any], None, None]:
+    """
+    Executes a statement with server-side cursors (where the dialect
+    supports them) and yields ``(fieldnames, batch)`` tuples. See
+    :func:`gen_rows_fieldnames_batches_from_select`.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be positive, not {batch_size!r}")
+    result: Result = session.execute(
+        statement,
+        execution_options={"stream_results": True, "yield_per": batch_size},
+    )
+    try:
+        fieldnames = list(result.keys())
+        yielded = False
+        for rows in result.partitions(batch_size):
+            yielded = True
+            if columnar:
+                yield fieldnames, _rows_to_columnar(rows, fieldnames, columnar)
+            else:
+                yield fieldnames, rows
+        if not yielded:
+            # Always yield once, so that the caller gets the fieldnames.
+            if columnar:
+                yield fieldnames, _rows_to_columnar([], fieldnames, columnar)
+            else:
+                yield fieldnames, []
+    finally:
+        # Release the server-side cursor even if the caller stops early.
+        result.close()
+
+
+def gen_rows_fieldnames_batches_from_raw_sql(
+    session: Union[Session, Connection],
+    sql: str,
+    batch_size: int = DEFAULT_STREAM_BATCH_SIZE,
+    columnar: str = None,
+) -> Generator[Tuple[List[str], Any], None, None]:
+    """
+    Streaming version of :func:`get_rows_fieldnames_from_raw_sql`, for large
+    result sets; see :func:`gen_rows_fieldnames_batches_from_select`.
+    """
+    if not isinstance(sql, str):
+        raise ValueError("sql argument must be a string")
+    yield from _gen_result_batches(
+        session, text(sql), batch_size=batch_size, columnar=columnar
+    )
+
+
+def gen_rows_fieldnames_batches_from_select(
+    session: Union[Session, Connection],
+    select_query: Select,
+    batch_size: int = DEFAULT_STREAM_BATCH_SIZE,
+    columnar: str = None,
+) -> Generator[Tuple[List[str], Any], None, None]:
+    """
+    Streaming version of :func:`get_rows_fieldnames_from_select`, for large
+    result sets. Rather than fetching all rows into memory, this uses a
+    server-side cursor (``stream_results``/``yield_per``, where the database
+    driver supports it) and yields results in batches.
+
+    Args:
+        session:
+            SQLAlchemy :class:`Session` or :class:`Connection` object
+        select_query:
+            select() statement, i.e. instance of
+            :class:`sqlalchemy.sql.selectable.Select`
+        batch_size:
+            maximum number of rows per batch
+        columnar:
+            if ``None``, each batch is a list of rows; otherwise, one of the
+            :class:`ColumnarBatchFormat` values: ``"numpy"`` gives a list of
+            NumPy arrays (one per column), and ``"arrow"`` gives a
+            :class:`pyarrow.RecordBatch` (requires ``pyarrow``).
+
+    Yields:
+        ``(fieldnames, batch)`` tuples. At least one batch is yielded (empty,
+        if there are no results), so that the fieldnames are always
+        available.
+
+    The caller should consume the generator fully, or close it, to release
+    the database cursor. Don't execute other statements on the same
+    connection while the generator is active; some drivers (e.g. SQL Server
+    without MARS) do not permit this.
+    """
+    if not isinstance(select_query, Select):
+        raise ValueError("select_query argument must be a select() statement")
+    _check_select_is_not_for_orm_classes(select_query)
+    yield from _gen_result_batches(
+        session, select_query, batch_size=batch_size, columnar=columnar
+    )
+
+
 # =============================================================================
 # SELECT COUNT(*) (SQLAlchemy Core)
 # =============================================================================
@@ -193,7 +416,10 @@ def get_rows_fieldnames_from_select(
 
 
 def count_star(
-    session: Union[Session, Engine, Connection], tablename: str, *criteria: Any
+    session: Union[Session, Engine, Connection],
+    tablename: str,
+    *criteria: Any,
+    approximate: bool = False,
 ) -> int:
     """
     Returns the result of ``COUNT(*)`` from the specified table (with
@@ -205,10 +431,15 @@ def count_star(
             only), or :class:`Connection` object
         tablename: name of the table
         criteria: optional SQLAlchemy "where" criteria
+        approximate:
+            if true and there are no criteria, use
+            :func:`count_star_approx` (fast, from catalog statistics)
 
     Returns:
         a scalar
     """
+    if approximate and not criteria:
+        return count_star_approx(session, tablename)
     # works if you pass a connection or a session or an engine; all have
     # the execute() method
     query = select(func.count()).select_from(table(tablename))
@@ -217,6 +448,135 @@ def count_star(
     return session.execute(query).scalar()
 
 
+def count_star_approx(
+    session: Union[Session, Connection], tablename: str
+) -> int:
+    """
+    Returns a fast, approximate row count for a whole table, from the
+    database's catalog statistics rather than by scanning the table.
+
+    - MySQL: ``information_schema.tables.table_rows`` (an estimate for
+      InnoDB).
+    - PostgreSQL: ``pg_class.reltuples`` (as of the last ``VACUUM`` or
+      ``ANALYZE``).
+    - SQL Server: the row counts in ``sys.partitions`` for the heap or
+      clustered index (usually exact for committed data).
+
+    For other dialects, or if no statistics are available (e.g. a PostgreSQL
+    table never analysed), this falls back to an exact ``COUNT(*)``.
+
+    Args:
+        session:
+            SQLAlchemy :class:`Session` or :class:`Connection` object
+        tablename: name of the table (in the default schema)
+    """
+    dialect_name = get_dialect_name(session)
+    if dialect_name == SqlaDialectName.MYSQL:
+        sql = text(
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = :tablename"
+        ).bindparams(tablename=tablename)
+    elif dialect_name == SqlaDialectName.POSTGRES:
+        sql = text(
+            "SELECT CAST(reltuples AS BIGINT) FROM pg_class "
+            "WHERE oid = to_regclass(:tablename)"
+        ).bindparams(tablename=quote_identifier(tablename, session))
+    elif dialect_name == SqlaDialectName.MSSQL:
+        sql = text(
+            "SELECT SUM(p.rows) FROM sys.partitions p "
+            "WHERE p.object_id = OBJECT_ID(:tablename) "
+            "AND p.index_id IN (0, 1)"
+        ).bindparams(tablename=quote_identifier(tablename, session))
+    else:
+        sql = None
+    if sql is not None:
+        n = session.execute(sql).scalar()
+        if n is not None and n >= 0:  # PostgreSQL: -1 means "unknown"
+            return int(n)
+        log.debug(
+            "No catalog row count for table {!r}; using COUNT(*)", tablename
+        )
+    return count_star(session, tablename)
+
+
+def count_star_for_criteria(
+    session: Union[Session, Engine, Connection],
+    tablename: str,
+    criteria_list: Sequence[Any],
+    *criteria: Any,
+) -> List[int]:
+    """
+    Counts the rows matching each of several criteria, in a single query
+    (rather than one ``COUNT(*)`` query per criterion).
+
+    Args:
+        session:
+            SQLAlchemy :class:`Session`, :class:`Engine` (SQL Alchemy 1.4
+            only), or :class:`Connection` object
+        tablename: name of the table
+        criteria_list: SQLAlchemy boolean expressions, one per count wanted
+        criteria: optional SQLAlchemy "where" criteria applying to all
+
+    Returns:
+        a list of counts, in the same order as ``criteria_list``
+
+    The SQL is of the form
+
+    .. code-block:: sql
+
+        SELECT COUNT(CASE WHEN crit1 THEN 1 END),
+               COUNT(CASE WHEN crit2 THEN 1 END), ...
+        FROM tablename WHERE ...
+    """
+    if not criteria_list:
+        return []
+    query = select(
+        *[func.count(case((c, 1))) for c in criteria_list]
+    ).select_from(table(tablename))
+    for criterion in criteria:
+        query = query.where(criterion)
+    return list(session.execute(query).one())
+
+
+def count_star_grouped(
+    session: Union[Session, Engine, Connection],
+    tablename: str,
+    groupcols: Union[str, Sequence[str]],
+    *criteria: Any,
+) -> Dict[Any, int]:
+    """
+    Returns ``COUNT(*)`` for each distinct value of one or more columns, via
+    ``GROUP BY``, in a single query.
+
+    Args:
+        session:
+            SQLAlchemy :class:`Session`, :class:`Engine` (SQL Alchemy 1.4
+            only), or :class:`Connection` object
+        tablename: name of the table
+        groupcols: column name, or sequence of column names, to group by
+        criteria: optional SQLAlchemy "where" criteria
+
+    Returns:
+        a dictionary mapping each value (or tuple of values, if
+        ``groupcols`` is a sequence) to its count
+    """
+    composite = not isinstance(groupcols, str)
+    cols = [column(c) for c in (groupcols if composite else [groupcols])]
+    query = (
+        select(*cols, func.count())
+        .select_from(table(tablename))
+        .group_by(*cols)
+    )
+    for criterion in criteria:
+        query = query.where(criterion)
+    ncols = len(cols)
+    if composite:
+        return {
+            tuple(row[:ncols]): row[ncols] for row in session.execute(query)
+        }
+    return {row[0]: row[1] for row in session.execute(query)}
+
+
 # =============================================================================
 # SELECT COUNT(*), MAX(field) (SQLAlchemy Core)
 # =============================================================================
@@ -384,6 +744,109 @@ def exists_plain(session: Session, tablename: str, *criteria: Any) -> bool:
     return exists_in_table(session, table(tablename), *criteria)
 
 
+# =============================================================================
+# Which of these keys exist? (SQLAlchemy Core)
+# =============================================================================
+
+
+def composite_key_in_condition(
+    cols: Sequence[ColumnElement],
+    keys: Sequence[Sequence[Any]],
+    dialect_name: str,
+) -> ColumnElement:
+    """
+    Returns a condition that the composite key made up of ``cols`` is one of
+    ``keys`` (tuples of values, in the same order as ``cols``).
+
+    MySQL/PostgreSQL/SQLite use a row-value comparison,
+    ``(a, b) IN ((1, 2), ...)``; other dialects (e.g. SQL Server, which does
+    not support that) use the equivalent ``(a = 1 AND b = 2) OR ...``.
+
+    Args:
+        cols: the key columns
+        keys: the candidate keys
+        dialect_name: the SQLAlchemy dialect name (see
+            :func:`cardinal_pythonlib.sqlalchemy.dialect.get_dialect_name`)
+    """
+    if dialect_name in _TUPLE_IN_DIALECTS:
+        return tuple_(*cols).in_(keys)
+    return or_(*[and_(*[c == v for c, v in zip(cols, k)]) for k in keys])
+
+
+def fetch_existing_keys(
+    session: Union[Session, Connection],
+    table_: Union[Table, TableClause, str],
+    keycols: Union[str, Sequence[str]],
+    keys: Iterable[Any],
+    *criteria: Any,
+    chunk_size: int = DEFAULT_IN_CHUNK_SIZE,
+) -> Set[Any]:
+    """
+    Batch version of :func:`exists_in_table`: which of many candidate keys
+    are present in a table? Uses a handful of chunked ``IN`` queries rather
+    than one query per key (e.g. for de-duplication before insertion).
+
+    Args:
+        session:
+            SQLAlchemy :class:`Session` or :class:`Connection` object
+        table_:
+            SQLAlchemy :class:`Table` object, table clause, or table name
+        keycols:
+            name of the key column, or a sequence of names for a composite
+            key
+        keys:
+            candidate keys: single values, or (for a composite key) tuples
+            in the same order as ``keycols``; ``None`` (or a tuple
+            containing ``None``) never matches
+        criteria:
+            optional SQLAlchemy "where" criteria
+        chunk_size:
+            maximum number of keys per query (reduced if necessary to keep
+            the number of bound parameters within database limits)
+
+    Returns:
+        the set of keys that exist: values, or tuples for a composite key.
+        These are as returned by the database, so supply keys of the
+        column's Python type (e.g. ``int`` for an integer column).
+
+    For composite keys, see :func:`composite_key_in_condition`.
+    """
+    if isinstance(table_, str):
+        table_ = table(table_)
+    composite = not isinstance(keycols, str)
+    colnames = list(keycols) if composite else [keycols]
+    cols: List[ColumnClause] = [
+        table_.c[c] if c in table_.c else column(c) for c in colnames
+    ]
+    if composite:
+        wanted = list(
+            dict.fromkeys(
+                tuple(k) for k in keys if not any(v is None for v in k)
+            )
+        )
+    else:
+        wanted = list(dict.fromkeys(k for k in keys if k is not None))
+    ncols = len(cols)
+    chunk_size = max(1, min(chunk_size, MAX_PARAMS_PER_STATEMENT // ncols))
+    dialect_name = get_dialect_name(session)
+
+    found: Set[Any] = set()
+    for start in range(0, len(wanted), chunk_size):
+        chunk = wanted[start : start + chunk_size]  # noqa: E203
+        if composite:
+            condition = composite_key_in_condition(cols, chunk, dialect_name)
+        else:
+            condition = cols[0].in_(chunk)
+        query = select(*cols).select_from(table_).where(condition).distinct()
+        for criterion in criteria:
+            query = query.where(criterion)
+        if composite:
+            found.update(tuple(row) for row in session.execute(query))
+        else:
+            found.update(row[0] for row in session.execute(query))
+    return found
+
+
 # =============================================================================
 # Get all first values
 # =============================================================================
@@ -82,22 +82,22 @@ ALL_SQLA_DIALECTS = list(
 
 
 def get_dialect(
-    mixed: Union[Engine, Dialect, Session, SQLCompiler]
+    mixed: Union[Engine, Connection, Dialect, Session, SQLCompiler]
 ) -> Union[Dialect, type(Dialect)]:
     """
     Finds the SQLAlchemy dialect in use.
 
     Args:
         mixed:
-            An SQLAlchemy engine, bound session, SQLCompiler, or Dialect
-            object.
+            An SQLAlchemy engine, connection, bound session, SQLCompiler, or
+            Dialect object.
 
     Returns: the SQLAlchemy :class:`Dialect` being used
 
     """
     if isinstance(mixed, Dialect):
         return mixed
-    elif isinstance(mixed, Engine):
+    elif isinstance(mixed, (Engine, Connection)):
         return mixed.dialect
     elif isinstance(mixed, Session):
         if mixed.bind is None:
@@ -52,26 +52,39 @@ FOR SQLAlchemy 1.4/future=True OR SQLAlchemy 2.0:
 
 New function: insert_with_upsert_if_supported().
 
+For many rows at once, use bulk_insert_with_upsert_if_supported(), which
+also supports PostgreSQL/SQLite (``ON CONFLICT DO UPDATE``) and SQL Server
+(``MERGE`` from a staging table).
+
 """  # noqa: E501
 
 # =============================================================================
 # Imports
 # =============================================================================
 
+from itertools import chain, islice
 import logging
-from typing import Dict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
 
 from cardinal_pythonlib.sqlalchemy.dialect import get_dialect_name
 from sqlalchemy.dialects.mysql import insert as insert_mysql
+from sqlalchemy.dialects.postgresql import insert as insert_postgresql
+from sqlalchemy.dialects.sqlite import insert as insert_sqlite
+from sqlalchemy.engine.base import Connection
 from sqlalchemy.engine.interfaces import Dialect
-from sqlalchemy.schema import Table
+from sqlalchemy.schema import Column, MetaData, Table
 from sqlalchemy.orm.session import Session
-from sqlalchemy.sql.expression import Insert
+from sqlalchemy.sql.expression import Insert, text
 
-from cardinal_pythonlib.sqlalchemy.dialect import SqlaDialectName
+from cardinal_pythonlib.sqlalchemy.dialect import (
+    quote_identifier,
+    SqlaDialectName,
+)
 
 log = logging.getLogger(__name__)
 
+DEFAULT_UPSERT_CHUNK_SIZE = 1000
+
 
 # =============================================================================
 # insert_with_upsert_if_supported
@@ -157,3 +170,308 @@ def insert_with_upsert_if_supported(
         )
     else:
         return table.insert().values(values)
+
+
+# =============================================================================
+# bulk_insert_with_upsert_if_supported
+# =============================================================================
+
+
+def _gen_chunks(
+    rows: Iterable[Dict[str, Any]], chunk_size: int
+) -> Iterable[List[Dict[str, Any]]]:
+    """
+    Yields lists of up to ``chunk_size`` rows.
+    """
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _dedupe_chunk(
+    chunk: List[Dict[str, Any]], key_columns: Sequence[str]
+) -> List[Dict[str, Any]]:
+    """
+    Removes rows whose key duplicates that of a later row in the same chunk,
+    keeping the last (as a sequence of single-row upserts would).
+    PostgreSQL's ``ON CONFLICT DO UPDATE`` and SQL Server's ``MERGE`` refuse
+    to affect the same target row twice in one statement. Rows with a NULL
+    key value never conflict, so are all kept.
+    """
+    keys = [tuple(row[c] for c in key_columns) for row in chunk]
+    last_index = {key: i for i, key in enumerate(keys) if None not in key}
+    n_keyed = sum(1 for key in keys if None not in key)
+    if len(last_index) == n_keyed:
+        return chunk  # no duplicates; the usual case
+    return [
+        row
+        for i, (row, key) in enumerate(zip(chunk, keys))
+        if None in key or last_index[key] == i
+    ]
+
+
+def make_bulk_upsert_statement(
+    table: Table,
+    dialect: Union[Dialect, Session, Connection],
+    key_columns: Sequence[str] = None,
+    update_columns: Sequence[str] = None,
+) -> Insert:
+    """
+    Creates an upsert statement without values, to be executed with a list of
+    row dictionaries (``executemany``). SQLAlchemy then sends the rows in
+    batches of multi-row ``VALUES`` ("insertmanyvalues"), where the driver
+    allows.
+
+    - MySQL/MariaDB: ``INSERT ... ON DUPLICATE KEY UPDATE`` (conflicts on
+      any unique key);
+    - PostgreSQL, SQLite (3.24+): ``INSERT ... ON CONFLICT (keys) DO UPDATE
+      SET ...``.
+
+    Other dialects get a plain ``INSERT``.
+
+    Args:
+        table:
+            SQLAlchemy Table in which to insert values.
+        dialect:
+            Dialect, or a session or connection from which to extract it.
+        key_columns:
+            Names of the columns forming the unique key that determines a
+            conflict (PostgreSQL/SQLite). Default: the table's primary key.
+        update_columns:
+            Names of the columns to update on conflict. Default: all columns
+            of the table other than the key columns.
+    """
+    dialect_name = get_dialect_name(dialect)
+    key_columns = list(key_columns or [c.name for c in table.primary_key])
+    if update_columns is None:
+        update_columns = [
+            c.name for c in table.columns if c.name not in key_columns
+        ]
+    if dialect_name == SqlaDialectName.MYSQL:
+        stmt = insert_mysql(table)
+        if not update_columns:
+            # Nothing to update; set a column to its existing value (a
+            # no-op), so that duplicates are skipped without error. (The
+            # table need not have a primary key; any unique key may
+            # conflict.)
+            noop_column = (key_columns or [c.name for c in table.columns])[0]
+            return stmt.on_duplicate_key_update(
+                {noop_column: table.columns[noop_column]}
+            )
+        return stmt.on_duplicate_key_update(
+            {c: stmt.inserted[c] for c in update_columns}
+        )
+    elif dialect_name in (SqlaDialectName.POSTGRES, SqlaDialectName.SQLITE):
+        insert_func = (
+            insert_postgresql
+            if dialect_name == SqlaDialectName.POSTGRES
+            else insert_sqlite
+        )
+        stmt = insert_func(table)
+        if not update_columns:
+            return stmt.on_conflict_do_nothing(index_elements=key_columns)
+        return stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={c: stmt.excluded[c] for c in update_columns},
+        )
+    else:
+        return table.insert()
+
+
+def _add_rowcount(total: Optional[int], result: Any) -> Optional[int]:
+    """
+    Adds a result's ``rowcount`` to a running total. Drivers report -1 if
+    they don't know the count; the total is then ``None`` (unknown).
+    """
+    rowcount = result.rowcount
+    if total is None or rowcount is None or rowcount < 0:
+        return None
+    return total + rowcount
+
+
+def _mssql_merge_sql(
+    table: Table,
+    staging_name: str,
+    colnames: Sequence[str],
+    key_columns: Sequence[str],
+    update_columns: Sequence[str],
+    dialect: Dialect,
+) -> str:
+    """
+    Returns SQL Server ``MERGE`` SQL to upsert from a staging table into the
+    target table.
+    """
+
+    def q(identifier: str) -> str:
+        return quote_identifier(identifier, dialect)
+
+    target = dialect.identifier_preparer.format_table(table)  # with schema
+    on = " AND ".join(f"t.{q(c)} = s.{q(c)}" for c in key_columns)
+    sql = f"MERGE INTO {target} WITH (HOLDLOCK) AS t "
+    sql += f"USING {q(staging_name)} AS s ON {on} "
+    if update_columns:
+        sets = ", ".join(f"t.{q(c)} = s.{q(c)}" for c in update_columns)
+        sql += f"WHEN MATCHED THEN UPDATE SET {sets} "
+    sql += "WHEN NOT MATCHED THEN INSERT ({cols}) VALUES ({values});".format(
+        cols=", ".join(q(c) for c in colnames),
+        values=", ".join(f"s.{q(c)}" for c in colnames),
+    )
+    return sql
+
+
+def _mssql_bulk_merge(
+    connection: Connection,
+    table: Table,
+    colnames: Sequence[str],
+    chunks: Iterable[List[Dict[str, Any]]],
+    key_columns: Sequence[str],
+    update_columns: Sequence[str],
+) -> Optional[int]:
+    """
+    SQL Server upsert: for each chunk, bulk-insert the rows into a temporary
+    staging table (with ``executemany``), then ``MERGE`` them into the target
+    table. Returns the total number of rows affected, or ``None`` if that is
+    unknown.
+    """
+    preparer = connection.dialect.identifier_preparer
+    quoted_tablename = preparer.format_table(table)  # with schema
+    # "#" names are session-local temporary tables in SQL Server.
+    staging = Table(
+        f"#staging_{table.name}",
+        MetaData(),
+        *[Column(c, table.columns[c].type) for c in colnames],
+    )
+    quoted_staging_name = preparer.format_table(staging)
+    merge_sql = text(
+        _mssql_merge_sql(
+            table=table,
+            staging_name=staging.name,
+            colnames=colnames,
+            key_columns=key_columns,
+            update_columns=update_columns,
+            dialect=connection.dialect,
+        )
+    )
+    # Explicit values for an IDENTITY column need IDENTITY_INSERT.
+    autoinc = table.autoincrement_column
+    identity_insert = autoinc is not None and autoinc.name in colnames
+    total = 0  # type: Optional[int]
+    staging.create(connection)
+    try:
+        if identity_insert:
+            connection.execute(
+                text(f"SET IDENTITY_INSERT {quoted_tablename} ON")
+            )
+        for chunk in chunks:
+            connection.execute(staging.insert(), chunk)
+            total = _add_rowcount(total, connection.execute(merge_sql))
+            connection.execute(text(f"TRUNCATE TABLE {quoted_staging_name}"))
+    finally:
+        # IDENTITY_INSERT can be ON for only one table per session, so
+        # always switch it off again, even after an error.
+        if identity_insert:
+            connection.execute(
+                text(f"SET IDENTITY_INSERT {quoted_tablename} OFF")
+            )
+        staging.drop(connection)
+    return total
+
+
+def bulk_insert_with_upsert_if_supported(
+    session: Union[Session, Connection],
+    table: Table,
+    rows: Iterable[Dict[str, Any]],
+    chunk_size: int = DEFAULT_UPSERT_CHUNK_SIZE,
+    key_columns: Sequence[str] = None,
+    update_columns: Sequence[str] = None,
+) -> Optional[int]:
+    """
+    Inserts many rows, updating existing rows where the key already exists,
+    in chunks of many rows per round trip rather than one statement per row
+    (as with :func:`insert_with_upsert_if_supported`).
+
+    - MySQL/MariaDB: ``INSERT ... ON DUPLICATE KEY UPDATE``;
+    - PostgreSQL/SQLite: ``INSERT ... ON CONFLICT DO UPDATE``;
+    - SQL Server: ``MERGE`` from a temporary staging table;
+    - other dialects: plain ``INSERT`` (so duplicates will raise an error).
+
+    Args:
+        session:
+            SQLAlchemy :class:`Session` or :class:`Connection`. The caller is
+            responsible for committing.
+        table:
+            SQLAlchemy Table in which to insert values.
+        rows:
+            Rows to insert (column: value dictionaries, all with the same
+            keys). May be a generator; it is consumed one chunk at a time.
+        chunk_size:
+            Maximum number of rows per ``executemany`` call (SQLAlchemy may
+            split these further to respect driver parameter limits).
+        key_columns:
+            Names of the columns forming the unique key used to detect
+            existing rows (not used by MySQL, which uses any unique key).
+            Default: the table's primary key.
+        update_columns:
+            Names of the columns to update for existing rows. Default: all
+            columns present in the rows, other than the key columns.
+
+    If several rows in one chunk share a key, only the last is used, except
+    for MySQL (which applies them in turn, with the same result) and plain
+    ``INSERT`` (which will raise an error).
+
+    Returns:
+        the total number of rows affected, as reported by the database, or
+        ``None`` if the driver did not report it (a ``rowcount`` of -1) for
+        any chunk. Note that MySQL counts an updated row as 2 (and an
+        unchanged one as 0).
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive, not {chunk_size!r}")
+    iterator = iter(rows)
+    first = next(iterator, None)
+    if first is None:
+        return 0
+    colnames = list(first.keys())
+    key_columns = list(key_columns or [c.name for c in table.primary_key])
+    if update_columns is None:
+        update_columns = [c for c in colnames if c not in key_columns]
+    dialect_name = get_dialect_name(session)
+    chunks = _gen_chunks(chain([first], iterator), chunk_size)
+    if (
+        dialect_name
+        in (
+            SqlaDialectName.MSSQL,
+            SqlaDialectName.POSTGRES,
+            SqlaDialectName.SQLITE,
+        )
+        and key_columns
+        and all(c in colnames for c in key_columns)
+    ):
+        chunks = (_dedupe_chunk(chunk, key_columns) for chunk in chunks)
+
+    if dialect_name == SqlaDialectName.MSSQL:
+        return _mssql_bulk_merge(
+            connection=(
+                session.connection()
+                if isinstance(session, Session)
+                else session
+            ),
+            table=table,
+            colnames=colnames,
+            chunks=chunks,
+            key_columns=key_columns,
+            update_columns=update_columns,
+        )
+    stmt = make_bulk_upsert_statement(
+        table=table,
+        dialect=session,
+        key_columns=key_columns,
+        update_columns=update_columns,
+    )
+    total = 0  # type: Optional[int]
+    for chunk in chunks:
+        total = _add_rowcount(total, session.execute(stmt, chunk))
+    return total
@@ -26,11 +26,16 @@
 
 """
 
+from collections import deque
 import logging
 from typing import (
+    Deque,
     Dict,
+    FrozenSet,
     Generator,
+    Iterable,
     List,
+    Optional,
     Set,
     Tuple,
     Type,
@@ -38,7 +43,8 @@ from typing import (
     Union,
 )
 
-from sqlalchemy import inspect
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import MANYTOONE, selectinload
 from sqlalchemy.orm.base import class_mapper
 from sqlalchemy.orm.mapper import Mapper
 from sqlalchemy.orm.relationships import RelationshipProperty
@@ -49,6 +55,11 @@ from sqlalchemy.sql.visitors import Visitable
 from sqlalchemy.util import OrderedProperties
 
 from cardinal_pythonlib.classes import gen_all_subclasses
+from cardinal_pythonlib.sqlalchemy.core_query import (
+    composite_key_in_condition,
+    MAX_PARAMS_PER_STATEMENT,
+)
+from cardinal_pythonlib.sqlalchemy.dialect import get_dialect_name
 from cardinal_pythonlib.enumlike import OrderedNamespace
 from cardinal_pythonlib.dicts import reversedict
 
@@ -65,6 +76,11 @@ log = logging.getLogger(__name__)
 
 VisitableType = Type[Visitable]  # for SQLAlchemy 2.0
 
+DEFAULT_PREFETCH_CHUNK_SIZE = 500  # objects per "IN" query
+
+# Relationship loading strategies that cannot be eager-loaded:
+_NON_EAGER_LAZY_VALUES = ("dynamic", "write_only", "noload", "raise")
+
 
 # =============================================================================
 # Creating ORM objects conveniently, etc.
@@ -179,6 +195,56 @@ class SqlAlchemyAttrDictMixin(object):
 # =============================================================================
 
 
+def get_class_relationships(
+    cls: Type,
+) -> Tuple[Tuple[str, RelationshipProperty], ...]:
+    """
+    Returns ``(attrname, RelationshipProperty)`` tuples for all relationships
+    of an SQLAlchemy ORM class.
+
+    This is not cached, since a class's relationships can change (e.g. when
+    a class defined later adds a ``backref``); functions processing many
+    objects should call it once per class (as :func:`walk_orm_tree` does).
+    """
+    # mapper.relationships is of type
+    # sqlalchemy.utils._collections.ImmutableProperties, which is basically
+    # a sort of AttrDict.
+    return tuple(class_mapper(cls).relationships.items())
+
+
+# Relationships for walk_orm_tree() to follow, for one class, as tuples:
+# (attrname, uselist, relationship).
+_WalkPlanType = List[Tuple[str, bool, RelationshipProperty]]
+
+
+def _walk_plan(
+    cls: Type,
+    skip_relationships_always: FrozenSet[str],
+    skip_relationships_by_tablename: Dict[str, FrozenSet[str]],
+    skip_all_relationships_for_tablenames: FrozenSet[str],
+    skip_all_objects_for_tablenames: FrozenSet[str],
+) -> Optional[_WalkPlanType]:
+    """
+    Works out which relationships :func:`walk_orm_tree` should follow for
+    objects of class ``cls``, or returns ``None`` if such objects should be
+    skipped entirely. Arguments are as for :func:`walk_orm_tree`.
+    """
+    tablename = cls.__tablename__
+    if tablename in skip_all_objects_for_tablenames:
+        return None
+    if tablename in skip_all_relationships_for_tablenames:
+        return []
+    skip_for_table = skip_relationships_by_tablename.get(
+        tablename, frozenset()
+    )
+    return [
+        (attrname, relationship.uselist, relationship)
+        for attrname, relationship in get_class_relationships(cls)
+        if attrname not in skip_relationships_always
+        and attrname not in skip_for_table
+    ]
+
+
 def walk_orm_tree(
     obj,
     debug: bool = False,
@@ -228,57 +294,249 @@ def walk_orm_tree(
 
     """
     # http://docs.sqlalchemy.org/en/latest/faq/sessions.html#faq-walk-objects
-    skip_relationships_always = (
-        skip_relationships_always or []
-    )  # type: List[str]
-    skip_relationships_by_tablename = (
-        skip_relationships_by_tablename or {}
-    )  # type: Dict[str, List[str]]
-    skip_all_relationships_for_tablenames = (
-        skip_all_relationships_for_tablenames or []
-    )  # type: List[str]
-    skip_all_objects_for_tablenames = (
-        skip_all_objects_for_tablenames or []
-    )  # type: List[str]
-    stack = [obj]
+    #
+    # For speed with large trees: the skip lists become sets; the
+    # relationships to follow are worked out once per class (see
+    # _walk_plan()), not once per object; and the queue is a deque, so
+    # taking from its front is O(1) (the order is unchanged: breadth-first).
+    skip_relationships_always = frozenset(skip_relationships_always or ())
+    skip_relationships_by_tablename = {
+        tablename: frozenset(attrnames)
+        for tablename, attrnames in (
+            skip_relationships_by_tablename or {}
+        ).items()
+    }
+    skip_all_relationships_for_tablenames = frozenset(
+        skip_all_relationships_for_tablenames or ()
+    )
+    skip_all_objects_for_tablenames = frozenset(
+        skip_all_objects_for_tablenames or ()
+    )
+    debug = debug and log.isEnabledFor(logging.DEBUG)
+    plans: Dict[Type, Optional[_WalkPlanType]] = {}
+    queue: Deque[object] = deque([obj])
     if seen is None:
         seen = set()
-    while stack:
-        obj = stack.pop(0)
+    while queue:
+        obj = queue.popleft()
         if obj in seen:
             continue
-        tablename = obj.__tablename__
-        if tablename in skip_all_objects_for_tablenames:
+        cls = type(obj)
+        try:
+            plan = plans[cls]
+        except KeyError:
+            plan = plans[cls] = _walk_plan(
+                cls,
+                skip_relationships_always,
+                skip_relationships_by_tablename,
+                skip_all_relationships_for_tablenames,
+                skip_all_objects_for_tablenames,
+            )
+        if plan is None:  # skipping this table
             continue
         seen.add(obj)
         if debug:
             log.debug(f"walk: yielding {obj!r}")
         yield obj
-        insp = inspect(obj)  # type: InstanceState
-        for (
-            relationship
-        ) in insp.mapper.relationships:  # type: RelationshipProperty
-            attrname = relationship.key
-            # Skip?
-            if attrname in skip_relationships_always:
-                continue
-            if tablename in skip_all_relationships_for_tablenames:
-                continue
-            if (
-                tablename in skip_relationships_by_tablename
-                and attrname in skip_relationships_by_tablename[tablename]
-            ):
-                continue
+        for attrname, uselist, relationship in plan:
             # Process relationship
             if debug:
                 log.debug(f"walk: following relationship {relationship}")
             related = getattr(obj, attrname)
             if debug and related:
                 log.debug(f"walk: queueing {related!r}")
-            if relationship.uselist:
-                stack.extend(related)
+            if uselist:
+                queue.extend(related)
             elif related is not None:
-                stack.append(related)
+                queue.append(related)
+
+
+def _get_many_to_one_identity_attrkeys(
+    cls: Type,
+) -> Dict[str, Tuple[Mapper, Tuple[str, ...]]]:
+    """
+    For an ORM class, returns a dictionary mapping the attribute name of each
+    simple many-to-one relationship (one that SQLAlchemy can lazy-load from
+    the identity map) to a tuple: ``target_mapper, fk_attrnames``, where
+    ``fk_attrnames`` are the names of this class's attributes holding the
+    target's primary key, in order.
+    """
+    mapper = class_mapper(cls)
+    result = {}  # type: Dict[str, Tuple[Mapper, Tuple[str, ...]]]
+    for attrname, rel in get_class_relationships(cls):
+        # noinspection PyProtectedMember
+        if rel.direction is not MANYTOONE or not getattr(
+            rel._lazy_strategy, "use_get", False
+        ):
+            continue
+        remote_to_local = {
+            remote: local for local, remote in rel.local_remote_pairs
+        }
+        try:
+            fk_attrnames = tuple(
+                mapper.get_property_by_column(remote_to_local[pk_col]).key
+                for pk_col in rel.mapper.primary_key
+            )
+        except KeyError:
+            continue
+        result[attrname] = (rel.mapper, fk_attrnames)
+    return result
+
+
+def _bulk_load_relationships(
+    cls: Type,
+    objs: List[object],
+    plan: _WalkPlanType,
+    chunk_size: int,
+    debug: bool = False,
+) -> None:
+    """
+    For a list of persistent objects of one class, loads the relationships
+    in ``plan`` that are not yet loaded, using one SELECT per chunk of
+    objects with ``selectinload`` options (each of which issues one "IN"
+    query per chunk), rather than one lazy-load query per object per
+    relationship.
+    """
+    attrnames = [
+        attrname
+        for attrname, _, relationship in plan
+        if relationship.lazy not in _NON_EAGER_LAZY_VALUES
+    ]
+    if not attrnames:
+        return
+    # Many-to-one relationships whose lazy load can use the identity map
+    # (i.e. costs no query if the target object is already loaded).
+    m2o_attrkeys = _get_many_to_one_identity_attrkeys(cls)
+    # Group by session, and find what needs loading.
+    todo: Dict[Session, List[Tuple]] = {}
+    needed: Set[str] = set()
+    for obj in objs:
+        insp = inspect(obj)  # type: InstanceState
+        if not insp.persistent:
+            continue  # nothing in the database to load
+        unloaded = insp.unloaded.intersection(attrnames)
+        for attrname in list(unloaded):
+            if attrname in m2o_attrkeys:
+                target_mapper, fk_attrnames = m2o_attrkeys[attrname]
+                fk_values = [insp.dict.get(a) for a in fk_attrnames]
+                if None in fk_values or (
+                    target_mapper.identity_key_from_primary_key(fk_values)
+                    in insp.session.identity_map
+                ):
+                    unloaded.discard(attrname)
+        if unloaded:
+            needed |= unloaded
+            todo.setdefault(insp.session, []).append(insp.identity)
+    if not todo:
+        return
+    pk_cols = class_mapper(cls).primary_key
+    # One bound parameter per primary key column per object:
+    chunk_size = max(
+        1, min(chunk_size, MAX_PARAMS_PER_STATEMENT // len(pk_cols))
+    )
+    options = [selectinload(getattr(cls, a)) for a in attrnames if a in needed]
+    for session, identities in todo.items():
+        for i in range(0, len(identities), chunk_size):
+            chunk = identities[i : i + chunk_size]
+            if len(pk_cols) == 1:
+                where = pk_cols[0].in_([identity[0] for identity in chunk])
+            else:
+                where = composite_key_in_condition(
+                    pk_cols, chunk, get_dialect_name(session)
+                )
+            if debug:
+                log.debug(
+                    f"prefetch: loading {sorted(needed)} for {len(chunk)} "
+                    f"{cls.__name__} objects"
+                )
+            # The objects are already in the session's identity map, so
+            # re-selecting them does not overwrite them; the eager loaders
+            # populate their unloaded relationships.
+            session.scalars(select(cls).where(where).options(*options)).all()
+
+
+def prefetch_orm_tree(
+    startobjs: Iterable[object],
+    chunk_size: int = DEFAULT_PREFETCH_CHUNK_SIZE,
+    debug: bool = False,
+    skip_relationships_always: List[str] = None,
+    skip_relationships_by_tablename: Dict[str, List[str]] = None,
+    skip_all_relationships_for_tablenames: List[str] = None,
+    skip_all_objects_for_tablenames: List[str] = None,
+) -> Set[object]:
+    """
+    Loads the whole relationship tree of the starting objects (the objects
+    that :func:`walk_orm_tree` would visit) into their session(s) in bulk,
+    one level at a time: at each level, the objects are grouped by class and
+    their unloaded relationships are loaded with ``selectinload``-style "IN"
+    queries, in chunks. This replaces the "N+1" lazy-load queries that a walk
+    through unloaded relationships would otherwise issue, so that a
+    subsequent walk (e.g. in :func:`deepcopy_sqla_objects`) does not need the
+    database.
+
+    Args:
+        startobjs: SQLAlchemy ORM objects to start from
+        chunk_size: maximum number of objects per query
+        debug: be verbose
+        skip_relationships_always: see :func:`walk_orm_tree`
+        skip_relationships_by_tablename: see :func:`walk_orm_tree`
+        skip_all_relationships_for_tablenames: see :func:`walk_orm_tree`
+        skip_all_objects_for_tablenames: see :func:`walk_orm_tree`
+
+    Returns:
+        the set of objects reached
+    """
+    skip_relationships_always = frozenset(skip_relationships_always or ())
+    skip_relationships_by_tablename = {
+        tablename: frozenset(attrnames)
+        for tablename, attrnames in (
+            skip_relationships_by_tablename or {}
+        ).items()
+    }
+    skip_all_relationships_for_tablenames = frozenset(
+        skip_all_relationships_for_tablenames or ()
+    )
+    skip_all_objects_for_tablenames = frozenset(
+        skip_all_objects_for_tablenames or ()
+    )
+    debug = debug and log.isEnabledFor(logging.DEBUG)
+    plans: Dict[Type, Optional[_WalkPlanType]] = {}
+    seen: Set[object] = set()
+    level = list(startobjs)
+    while level:
+        # Group the new objects at this level by class.
+        by_class: Dict[Type, List[object]] = {}
+        for obj in level:
+            if obj in seen:
+                continue
+            cls = type(obj)
+            try:
+                plan = plans[cls]
+            except KeyError:
+                plan = plans[cls] = _walk_plan(
+                    cls,
+                    skip_relationships_always,
+                    skip_relationships_by_tablename,
+                    skip_all_relationships_for_tablenames,
+                    skip_all_objects_for_tablenames,
+                )
+            if plan is None:
+                continue
+            seen.add(obj)
+            by_class.setdefault(cls, []).append(obj)
+        # Load their relationships, and collect the next level.
+        level = []
+        for cls, objs in by_class.items():
+            plan = plans[cls]
+            _bulk_load_relationships(cls, objs, plan, chunk_size, debug)
+            for obj in objs:
+                for attrname, uselist, _ in plan:
+                    related = getattr(obj, attrname)
+                    if uselist:
+                        level.extend(related)
+                    elif related is not None:
+                        level.append(related)
+    return seen
 
 
 # =============================================================================
@@ -316,24 +574,23 @@ def copy_sqla_object(
     Returns:
         a new copy of the object
     """
-    omit_attrs = omit_attrs or []  # type: List[str]
-    cls = type(obj)
-    mapper = class_mapper(cls)
-    newobj = cls()  # not: cls.__new__(cls)
-    rel_keys = set([c.key for c in mapper.relationships])
-    prohibited = rel_keys
-    if omit_pk:
-        pk_keys = set([c.key for c in mapper.primary_key])
-        prohibited |= pk_keys
-    if omit_fk:
-        fk_keys = set([c.key for c in mapper.columns if c.foreign_keys])
-        prohibited |= fk_keys
-    prohibited |= set(omit_attrs)
+    attrnames, prohibited = _get_copy_plan(
+        type(obj), omit_fk, omit_pk, frozenset(omit_attrs or ())
+    )
     if debug:
         log.debug(f"copy_sqla_object: skipping: {prohibited}")
-    for k in [
-        p.key for p in mapper.iterate_properties if p.key not in prohibited
-    ]:
+    return _copy_attrs(obj, attrnames, debug=debug)
+
+
+def _copy_attrs(
+    obj: object, attrnames: Iterable[str], debug: bool = False
+) -> object:
+    """
+    For :func:`copy_sqla_object`: creates a new object of the same class as
+    ``obj``, and copies the specified attributes to it.
+    """
+    newobj = type(obj)()  # not: cls.__new__(cls)
+    for k in attrnames:
         try:
             value = getattr(obj, k)
             if debug:
@@ -348,6 +605,32 @@ def copy_sqla_object(
     return newobj
 
 
+def _get_copy_plan(
+    cls: Type, omit_fk: bool, omit_pk: bool, omit_attrs: FrozenSet[str]
+) -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+    """
+    For :func:`copy_sqla_object`: works out which attributes of objects of
+    class ``cls`` to copy.
+
+    Returns:
+        tuple: ``attrnames_to_copy, prohibited_attrnames``
+    """
+    mapper = class_mapper(cls)
+    rel_keys = set([c.key for c in mapper.relationships])
+    prohibited = rel_keys
+    if omit_pk:
+        pk_keys = set([c.key for c in mapper.primary_key])
+        prohibited |= pk_keys
+    if omit_fk:
+        fk_keys = set([c.key for c in mapper.columns if c.foreign_keys])
+        prohibited |= fk_keys
+    prohibited |= omit_attrs
+    attrnames = tuple(
+        p.key for p in mapper.iterate_properties if p.key not in prohibited
+    )
+    return attrnames, frozenset(prohibited)
+
+
 def rewrite_relationships(
     oldobj: object,
     newobj: object,
@@ -406,14 +689,8 @@ def rewrite_relationships(
         skip_table_names: if a related table's name is in this (optional) list,
             that relationship is skipped
     """
-    skip_table_names = skip_table_names or []  # type: List[str]
-    insp = inspect(oldobj)  # type: InstanceState
-    # insp.mapper.relationships is of type
-    # sqlalchemy.utils._collections.ImmutableProperties, which is basically
-    # a sort of AttrDict.
-    attrname_rel_list = list(
-        insp.mapper.relationships.items()
-    )  # type: List[Tuple[str, RelationshipProperty]]
+    skip_table_names = frozenset(skip_table_names or ())
+    attrname_rel_list = get_class_relationships(type(oldobj))
     if debug:
         log.debug(
             f"rewrite_relationships: relationships are {attrname_rel_list}"
@@ -479,6 +756,8 @@ def deepcopy_sqla_objects(
     debug_walk: bool = True,
     debug_rewrite_rel: bool = False,
     objmap: Dict[object, object] = None,
+    prefetch: bool = False,
+    prefetch_chunk_size: int = DEFAULT_PREFETCH_CHUNK_SIZE,
 ) -> None:
     """
     Makes a copy of the specified SQLAlchemy ORM objects, inserting them into a
@@ -486,6 +765,10 @@ def deepcopy_sqla_objects(
 
     This function operates in several passes:
 
+    0. Optionally, load the whole ORM tree from the source database in bulk
+       (via :func:`prefetch_orm_tree`). Without this, every relationship is
+       loaded lazily as it is walked, with its own query.
+
     1. Walk the ORM tree through all objects and their relationships, copying
        every object thus found (via :func:`copy_sqla_object`, without their
        relationships), and building a map from each source-session object to
@@ -519,9 +802,20 @@ def deepcopy_sqla_objects(
             starting object map from source-session to destination-session
             objects (see :func:`rewrite_relationships` for more detail);
             usually ``None`` to begin with.
+        prefetch:
+            bulk-load the tree first (see above)? Recommended for large
+            trees.
+        prefetch_chunk_size:
+            maximum number of objects per query, for ``prefetch``
     """
     if objmap is None:
         objmap = {}  # keys = old objects, values = new objects
+    if prefetch:
+        if debug:
+            log.debug("deepcopy_sqla_objects: pass 0: prefetch")
+        prefetch_orm_tree(
+            startobjs, chunk_size=prefetch_chunk_size, debug=debug_walk
+        )
     if debug:
         log.debug("deepcopy_sqla_objects: pass 1: create new objects")
 
@@ -529,11 +823,21 @@ def deepcopy_sqla_objects(
     # relationships correct until we've done this, since we don't know whether
     # or where the "root" of the PK tree is.)
     seen = set()
+    # As for copy_sqla_object(oldobj, omit_pk=True, omit_fk=True), but
+    # working out the attributes to copy once per class:
+    copy_plans: Dict[Type, Tuple[str, ...]] = {}
     for startobj in startobjs:
         for oldobj in walk_orm_tree(startobj, seen=seen, debug=debug_walk):
             if debug:
                 log.debug(f"deepcopy_sqla_objects: copying {oldobj}")
-            newobj = copy_sqla_object(oldobj, omit_pk=True, omit_fk=True)
+            cls = type(oldobj)
+            try:
+                attrnames = copy_plans[cls]
+            except KeyError:
+                attrnames = copy_plans[cls] = _get_copy_plan(
+                    cls, omit_fk=True, omit_pk=True, omit_attrs=frozenset()
+                )[0]
+            newobj = _copy_attrs(oldobj, attrnames)
             # Don't insert the new object into the session here; it may trigger
             # an autoflush as the relationships are queried, and the new
             # objects are not ready for insertion yet (as their relationships
@@ -573,6 +877,8 @@ def deepcopy_sqla_object(
     debug_walk: bool = False,
     debug_rewrite_rel: bool = False,
     objmap: Dict[object, object] = None,
+    prefetch: bool = False,
+    prefetch_chunk_size: int = DEFAULT_PREFETCH_CHUNK_SIZE,
 ) -> object:
     """
     Makes a copy of the object, inserting it into ``session``.
@@ -596,6 +902,8 @@ def deepcopy_sqla_object(
         debug_walk: see :func:`deepcopy_sqla_objects`
         debug_rewrite_rel: see :func:`deepcopy_sqla_objects`
         objmap: see :func:`deepcopy_sqla_objects`
+        prefetch: see :func:`deepcopy_sqla_objects`
+        prefetch_chunk_size: see :func:`deepcopy_sqla_objects`
 
     Returns:
         the copied object matching ``startobj``
@@ -611,6 +919,8 @@ def deepcopy_sqla_object(
         debug_walk=debug_walk,
         debug_rewrite_rel=debug_rewrite_rel,
         objmap=objmap,
+        prefetch=prefetch,
+        prefetch_chunk_size=prefetch_chunk_size,
     )
     return objmap[startobj]  # returns the new object matching startobj
 
@@ -721,18 +1031,15 @@ def gen_relationships(
     """
     Yields tuples of ``(attrname, RelationshipProperty, related_class)``
     for all relationships of an ORM object.
-    The object 'obj' can be EITHER an instance OR a class.
+    The object 'obj' can be EITHER an instance OR a class (or anything else
+    that :func:`sqlalchemy.inspect` maps to a mapper, such as a
+    :class:`Mapper` or an aliased class).
     """
     insp = inspect(obj)  # type: InstanceState
     # insp.mapper.relationships is of type
     # sqlalchemy.utils._collections.ImmutableProperties, which is basically
     # a sort of AttrDict.
-    for (
-        attrname,
-        rel_prop,
-    ) in (
-        insp.mapper.relationships.items()
-    ):  # type: Tuple[str, RelationshipProperty]
+    for attrname, rel_prop in insp.mapper.relationships.items():
         # noinspection PyUnresolvedReferences
         related_class = rel_prop.mapper.class_
         yield attrname, rel_prop, related_class
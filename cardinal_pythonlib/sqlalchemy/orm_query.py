@@ -62,7 +62,11 @@ def get_rows_fieldnames_from_query(
     a Query object made from selectable elements like columns and COUNT()
     clauses. That is what the select() system is meant for. So this code will
     now raise an error.
-    """
+
+    For large result sets, use
+    :func:`cardinal_pythonlib.sqlalchemy.core_query.gen_rows_fieldnames_batches_from_select`,
+    which streams results in batches.
+    """  # noqa: E501
     raise NotImplementedError(
         "From SQLAlchemy 2.0, don't perform queries directly with a "
         "sqlalchemy.orm.query.Query object; use a "
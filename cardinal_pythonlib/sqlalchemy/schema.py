@@ -36,21 +36,27 @@ import csv
 from functools import lru_cache
 import io
 import re
+import threading
 from typing import (
     Any,
     Dict,
+    FrozenSet,
     Generator,
+    Iterable,
     List,
     Optional,
     Type,
     Union,
     TYPE_CHECKING,
 )
+import weakref
 
 from sqlalchemy import inspect
 
 from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.engine.interfaces import Dialect
+from sqlalchemy.engine.reflection import Inspector
+from sqlalchemy.exc import NoSuchTableError
 from sqlalchemy.dialects import postgresql, mssql, mysql, sqlite
 from sqlalchemy.dialects.mssql.base import TIMESTAMP as MSSQL_TIMESTAMP
 from sqlalchemy.schema import (
@@ -104,6 +110,13 @@ except ImportError:
     )
     Double = None
 
+try:
+    from sqlalchemy.engine.reflection import ObjectKind
+except ImportError:
+    # SQLAlchemy prior to 2.0 has no multi-table reflection
+    # (Inspector.get_multi_columns() etc.).
+    ObjectKind = None
+
 
 # =============================================================================
 # Constants
@@ -182,6 +195,11 @@ def table_or_view_exists(engine: Engine, table_or_view_name: str) -> bool:
     Does the named table/view exist (either as a table or as a view) in the
     database?
     """
+    if ObjectKind is not None:  # SQLAlchemy 2.0+
+        # Since SQLAlchemy 2.0, has_table() formally covers views as well,
+        # and it is a single targeted catalog query rather than two full
+        # name lists. (Before that, some dialects ignored views.)
+        return inspect(engine).has_table(table_or_view_name)
     tables_and_views = get_table_names(engine) + get_view_names(engine)
     return table_or_view_name in tables_and_views
 
@@ -267,6 +285,369 @@ def get_column_names(engine: Engine, tablename: str) -> List[str]:
     return [info.name for info in gen_columns_info(engine, tablename)]
 
 
+# =============================================================================
+# Cached reflection
+# =============================================================================
+
+
+class SchemaReflectionCache(object):
+    """
+    Memoises database reflection (table/view names, columns, indexes) for one
+    :class:`Engine`.
+
+    Each of the plain functions above (:func:`table_exists`,
+    :func:`get_column_names`, etc.) creates a fresh inspector and re-queries
+    the database catalog on every call. That is fine for occasional use, but
+    slow when inspecting every column of thousands of tables (notably on SQL
+    Server, where each catalog query is expensive). This object caches the
+    results instead, and offers bulk methods (:meth:`load_columns`,
+    :meth:`load_indexes`) that fetch information for many tables in one
+    catalog query, where the dialect supports it.
+
+    The cache does not notice schema changes by itself.
+    :func:`execute_ddl` and :func:`add_index` invalidate the engine's cache
+    (see :func:`get_schema_reflection_cache`); if you change the schema by
+    other means, call :meth:`invalidate`.
+
+    Only the default schema is inspected, as for the plain functions.
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        """
+        Args:
+            engine: SQLAlchemy :class:`Engine` object
+        """
+        # Hold the engine weakly, so that the per-engine registry (keyed
+        # weakly by engine) doesn't keep engines alive.
+        self._engine_ref = weakref.ref(engine)
+        self._lock = threading.RLock()
+        self._insp: Optional[Inspector] = None
+        self._table_names: Optional[List[str]] = None
+        self._table_name_set: FrozenSet[str] = frozenset()
+        self._view_names: Optional[List[str]] = None
+        self._view_name_set: FrozenSet[str] = frozenset()
+        self._columns: Dict[str, List[SqlaColumnInspectionInfo]] = {}
+        self._columns_by_name: Dict[
+            str, Dict[str, SqlaColumnInspectionInfo]
+        ] = {}
+        self._indexes: Dict[str, List["ReflectedIndex"]] = {}
+
+    @property
+    def engine(self) -> Engine:
+        """
+        Returns the engine being inspected.
+        """
+        engine = self._engine_ref()
+        if engine is None:
+            raise ReferenceError(
+                "SchemaReflectionCache: engine no longer exists"
+            )
+        return engine
+
+    def _inspector(self) -> Inspector:
+        """
+        Returns our (single, reused) SQLAlchemy inspector.
+        """
+        if self._insp is None:
+            self._insp = inspect(self.engine)
+        return self._insp
+
+    def invalidate(self, tablename: str = None) -> None:
+        """
+        Forget cached information, e.g. after DDL.
+
+        Args:
+            tablename:
+                if specified, forget only the columns and indexes of this
+                table (plus the lists of table/view names, which a change
+                to one table may also affect); otherwise, forget everything.
+        """
+        with self._lock:
+            self._table_names = None
+            self._table_name_set = frozenset()
+            self._view_names = None
+            self._view_name_set = frozenset()
+            if tablename is None:
+                self._columns.clear()
+                self._columns_by_name.clear()
+                self._indexes.clear()
+            else:
+                self._columns.pop(tablename, None)
+                self._columns_by_name.pop(tablename, None)
+                self._indexes.pop(tablename, None)
+            if self._insp is not None:
+                # The inspector has its own internal memo; flush it.
+                self._insp.clear_cache()
+
+    # -------------------------------------------------------------------------
+    # Tables and views
+    # -------------------------------------------------------------------------
+
+    def get_table_names(self) -> List[str]:
+        """
+        Returns a list of database table names.
+        """
+        with self._lock:
+            if self._table_names is None:
+                self._table_names = self._inspector().get_table_names()
+                self._table_name_set = frozenset(self._table_names)
+            return list(self._table_names)
+
+    def get_view_names(self) -> List[str]:
+        """
+        Returns a list of database view names.
+        """
+        with self._lock:
+            if self._view_names is None:
+                self._view_names = self._inspector().get_view_names()
+                self._view_name_set = frozenset(self._view_names)
+            return list(self._view_names)
+
+    def table_exists(self, tablename: str) -> bool:
+        """
+        Does the named table exist in the database?
+        """
+        with self._lock:
+            if self._table_names is None:
+                self.get_table_names()
+            return tablename in self._table_name_set
+
+    def view_exists(self, viewname: str) -> bool:
+        """
+        Does the named view exist in the database?
+        """
+        with self._lock:
+            if self._view_names is None:
+                self.get_view_names()
+            return viewname in self._view_name_set
+
+    def table_or_view_exists(self, table_or_view_name: str) -> bool:
+        """
+        Does the named table/view exist (either as a table or as a view) in
+        the database?
+        """
+        return self.table_exists(table_or_view_name) or self.view_exists(
+            table_or_view_name
+        )
+
+    # -------------------------------------------------------------------------
+    # Columns
+    # -------------------------------------------------------------------------
+
+    def _store_columns(
+        self, tablename: str, column_dicts: Iterable[Dict[str, Any]]
+    ) -> List[SqlaColumnInspectionInfo]:
+        """
+        Caches reflected column information for a table.
+        """
+        infolist = [SqlaColumnInspectionInfo(d) for d in column_dicts]
+        self._columns[tablename] = infolist
+        self._columns_by_name[tablename] = {
+            info.name: info for info in infolist
+        }
+        return infolist
+
+    def get_columns_info(
+        self, tablename: str
+    ) -> List[SqlaColumnInspectionInfo]:
+        """
+        For the specified table (or view), returns column information as a
+        list of :class:`SqlaColumnInspectionInfo` objects.
+
+        Raises :exc:`sqlalchemy.exc.NoSuchTableError` if the table doesn't
+        exist.
+        """
+        with self._lock:
+            try:
+                return self._columns[tablename]
+            except KeyError:
+                return self._store_columns(
+                    tablename, self._inspector().get_columns(tablename)
+                )
+
+    def get_column_info(
+        self, tablename: str, columnname: str
+    ) -> Optional[SqlaColumnInspectionInfo]:
+        """
+        For the specified column in the specified table, get column
+        information as a :class:`SqlaColumnInspectionInfo` object (or
+        ``None`` if such a column can't be found).
+        """
+        with self._lock:
+            if tablename not in self._columns_by_name:
+                self.get_columns_info(tablename)
+            return self._columns_by_name[tablename].get(columnname)
+
+    def get_column_type(
+        self, tablename: str, columnname: str
+    ) -> Optional[TypeEngine]:
+        """
+        For the specified column in the specified table, get its type as an
+        instance of an SQLAlchemy column type class (or ``None`` if such a
+        column can't be found).
+        """
+        info = self.get_column_info(tablename, columnname)
+        return info.type if info is not None else None
+
+    def get_column_names(self, tablename: str) -> List[str]:
+        """
+        Get all the database column names for the specified table.
+        """
+        return [info.name for info in self.get_columns_info(tablename)]
+
+    def load_columns(
+        self, tablenames: Iterable[str] = None
+    ) -> Dict[str, List[SqlaColumnInspectionInfo]]:
+        """
+        Bulk version of :meth:`get_columns_info`. Fetches (in a single
+        catalog query, for dialects that support it, under SQLAlchemy 2.0+)
+        column information for all the specified tables/views not already
+        cached.
+
+        Args:
+            tablenames:
+                table/view names; if ``None``, all tables and views.
+
+        Returns:
+            dict mapping table/view name to column information, for all
+            requested tables that exist. (Nonexistent tables are omitted,
+            rather than raising.)
+        """
+        with self._lock:
+            if tablenames is None:
+                wanted = self.get_table_names() + self.get_view_names()
+            else:
+                wanted = list(dict.fromkeys(tablenames))
+            missing = [t for t in wanted if t not in self._columns]
+            if missing and ObjectKind is None:  # SQLAlchemy < 2.0
+                for tablename in missing:
+                    try:
+                        self.get_columns_info(tablename)
+                    except NoSuchTableError:
+                        pass
+            elif missing:
+                multi = self._inspector().get_multi_columns(
+                    kind=ObjectKind.ANY,
+                    filter_names=None if tablenames is None else missing,
+                )
+                for (_, tablename), column_dicts in multi.items():
+                    if tablename not in self._columns:
+                        self._store_columns(tablename, column_dicts)
+            return {t: self._columns[t] for t in wanted if t in self._columns}
+
+    # -------------------------------------------------------------------------
+    # Indexes
+    # -------------------------------------------------------------------------
+
+    def get_indexes(self, tablename: str) -> List["ReflectedIndex"]:
+        """
+        Returns information about the indexes of the specified table.
+
+        Raises :exc:`sqlalchemy.exc.NoSuchTableError` if the table doesn't
+        exist.
+        """
+        with self._lock:
+            try:
+                return self._indexes[tablename]
+            except KeyError:
+                indexes = self._inspector().get_indexes(tablename)
+                self._indexes[tablename] = indexes
+                return indexes
+
+    def load_indexes(
+        self, tablenames: Iterable[str] = None
+    ) -> Dict[str, List["ReflectedIndex"]]:
+        """
+        Bulk version of :meth:`get_indexes`, as for :meth:`load_columns`.
+
+        Args:
+            tablenames:
+                table names; if ``None``, all tables.
+
+        Returns:
+            dict mapping table name to index information, for all requested
+            tables that exist.
+        """
+        with self._lock:
+            if tablenames is None:
+                wanted = self.get_table_names()
+            else:
+                wanted = list(dict.fromkeys(tablenames))
+            missing = [t for t in wanted if t not in self._indexes]
+            if missing and ObjectKind is None:  # SQLAlchemy < 2.0
+                for tablename in missing:
+                    try:
+                        self.get_indexes(tablename)
+                    except NoSuchTableError:
+                        pass
+            elif missing:
+                multi = self._inspector().get_multi_indexes(
+                    kind=ObjectKind.ANY,
+                    filter_names=None if tablenames is None else missing,
+                )
+                for (_, tablename), indexes in multi.items():
+                    self._indexes.setdefault(tablename, indexes)
+            return {t: self._indexes[t] for t in wanted if t in self._indexes}
+
+    def index_exists(
+        self,
+        tablename: str,
+        indexname: str = None,
+        colnames: Union[str, List[str]] = None,
+        raise_if_nonexistent_table: bool = True,
+    ) -> bool:
+        """
+        Cached equivalent of :func:`index_exists`, q.v.
+        """
+        assert bool(indexname) ^ bool(colnames)  # one or the other
+        if (
+            not raise_if_nonexistent_table
+            and tablename not in self._indexes
+            and not self.table_or_view_exists(tablename)
+        ):
+            log.warning(f"index_exists(): no such table {tablename!r}")
+            return False
+        return _index_in_list(
+            self.get_indexes(tablename), indexname=indexname, colnames=colnames
+        )
+
+
+_REFLECTION_CACHES: "weakref.WeakKeyDictionary[Engine, SchemaReflectionCache]" = (  # noqa: E501
+    weakref.WeakKeyDictionary()
+)
+_REFLECTION_CACHES_LOCK = threading.Lock()
+
+
+def get_schema_reflection_cache(engine: Engine) -> SchemaReflectionCache:
+    """
+    Returns the shared :class:`SchemaReflectionCache` for this engine,
+    creating it if necessary.
+
+    Using the shared cache (rather than creating your own) means that
+    :func:`execute_ddl` and :func:`add_index` will invalidate it for you.
+    """
+    with _REFLECTION_CACHES_LOCK:
+        try:
+            return _REFLECTION_CACHES[engine]
+        except KeyError:
+            cache = SchemaReflectionCache(engine)
+            _REFLECTION_CACHES[engine] = cache
+            return cache
+
+
+def invalidate_schema_reflection_cache(
+    engine: Engine, tablename: str = None
+) -> None:
+    """
+    If there is a shared :class:`SchemaReflectionCache` for this engine,
+    invalidate it (entirely, or for one table). Call this after altering the
+    database schema other than via :func:`execute_ddl` or :func:`add_index`.
+    """
+    cache = _REFLECTION_CACHES.get(engine)
+    if cache is not None:
+        cache.invalidate(tablename)
+
+
 # =============================================================================
 # More introspection
 # =============================================================================
@@ -430,6 +811,8 @@ def execute_ddl(
         # and in SQL Server they are "batched" so not entirely autocommitted
         #     https://www.mssqltips.com/sqlservertip/4591/ddl-commands-in-transactions-in-sql-server-versus-oracle/
         connection.commit()
+    # We don't know what the DDL changed, so forget all cached reflection.
+    invalidate_schema_reflection_cache(engine)
 
 
 # =============================================================================
@@ -459,6 +842,18 @@ def index_exists(
         log.warning(f"index_exists(): no such table {tablename!r}")
         return False
     indexes = insp.get_indexes(tablename)  # type: List[ReflectedIndex]
+    return _index_in_list(indexes, indexname=indexname, colnames=colnames)
+
+
+def _index_in_list(
+    indexes: List["ReflectedIndex"],
+    indexname: str = None,
+    colnames: Union[str, List[str]] = None,
+) -> bool:
+    """
+    Is the specified index (by name, or by column names) in the list of
+    reflected indexes? Helper for :func:`index_exists`.
+    """
     if indexname:
         # Look up by index name.
         return any(i["name"] == indexname for i in indexes)
@@ -738,6 +1133,7 @@ def add_index(
         index = Index(idxname, sqla_column, unique=unique, mysql_length=length)
         index.create(engine)
         # Index creation doesn't require a commit.
+        invalidate_schema_reflection_cache(engine, tablename)
 
 
 # =============================================================================
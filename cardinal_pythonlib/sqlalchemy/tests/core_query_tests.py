@@ -38,13 +38,22 @@ from sqlalchemy.sql.expression import column, select, table, text
 from sqlalchemy.sql.schema import MetaData
 
 from cardinal_pythonlib.sqlalchemy.core_query import (
+    ColumnarBatchFormat,
+    count_star,
     count_star_and_max,
+    count_star_approx,
+    count_star_for_criteria,
+    count_star_grouped,
     exists_in_table,
     exists_plain,
     fetch_all_first_values,
+    fetch_existing_keys,
+    gen_rows_fieldnames_batches_from_raw_sql,
+    gen_rows_fieldnames_batches_from_select,
     get_rows_fieldnames_from_raw_sql,
     get_rows_fieldnames_from_select,
 )
+from cardinal_pythonlib.sqlalchemy.dialect import SqlaDialectName
 from cardinal_pythonlib.sqlalchemy.session import SQLITE_MEMORY_URL
 
 
@@ -127,6 +136,114 @@ class CoreQueryTests(TestCase):
         self.assertEqual(count, 2)
         self.assertEqual(maximum, self.b_val2)
 
+    def test_count_star_approx(self) -> None:
+        # SQLite has no catalog statistics, so this is exact.
+        self.assertEqual(count_star_approx(self.session, self.tablename), 2)
+        self.assertEqual(
+            count_star(self.session, self.tablename, approximate=True), 2
+        )
+        self.assertEqual(
+            count_star(
+                self.session,
+                self.tablename,
+                column(self.a) == 1,
+                approximate=True,
+            ),
+            1,
+        )
+
+    def test_count_star_for_criteria(self) -> None:
+        counts = count_star_for_criteria(
+            self.session,
+            self.tablename,
+            [
+                column(self.a) == self.a_val1,
+                column(self.b) > 100,
+                column(self.a) == 99,
+            ],
+        )
+        self.assertEqual(counts, [1, 2, 0])
+        self.assertEqual(
+            count_star_for_criteria(
+                self.session,
+                self.tablename,
+                [column(self.b) > 100],
+                column(self.a) == self.a_val2,
+            ),
+            [1],
+        )
+        self.assertEqual(
+            count_star_for_criteria(self.session, self.tablename, []), []
+        )
+
+    def test_count_star_grouped(self) -> None:
+        self.assertEqual(
+            count_star_grouped(self.session, self.tablename, self.a),
+            {self.a_val1: 1, self.a_val2: 1},
+        )
+        self.assertEqual(
+            count_star_grouped(
+                self.session,
+                self.tablename,
+                [self.a, self.b],
+                column(self.a) == self.a_val2,
+            ),
+            {(self.a_val2, self.b_val2): 1},
+        )
+
+    def test_fetch_existing_keys(self) -> None:
+        self.assertEqual(
+            fetch_existing_keys(
+                self.session,
+                self.table,
+                self.a,
+                [self.a_val1, 99, None, self.a_val2, self.a_val1],
+                chunk_size=1,
+            ),
+            {self.a_val1, self.a_val2},
+        )
+        self.assertEqual(
+            fetch_existing_keys(
+                self.session,
+                self.tablename,
+                self.a,
+                [self.a_val1, self.a_val2],
+                column(self.b) == self.b_val2,
+            ),
+            {self.a_val2},
+        )
+        self.assertEqual(
+            fetch_existing_keys(self.session, self.emptytable, "x", [1]),
+            set(),
+        )
+
+    def test_fetch_existing_keys_composite(self) -> None:
+        candidates = [
+            (self.a_val1, self.b_val1),
+            (self.a_val1, self.b_val2),
+            (self.a_val2, self.b_val2),
+            (self.a_val2, None),
+        ]
+        expected = {(self.a_val1, self.b_val1), (self.a_val2, self.b_val2)}
+        self.assertEqual(
+            fetch_existing_keys(
+                self.session, self.table, [self.a, self.b], candidates
+            ),
+            expected,
+        )
+        # Without row-value IN support, as for SQL Server:
+        self.session.get_bind().dialect.name = SqlaDialectName.MSSQL
+        self.assertEqual(
+            fetch_existing_keys(
+                self.session,
+                self.table,
+                [self.a, self.b],
+                candidates,
+                chunk_size=2,
+            ),
+            expected,
+        )
+
     def test_exists_in_table(self) -> None:
         # exists:
         exists1 = exists_in_table(self.session, self.table)
@@ -167,3 +284,76 @@ class CoreQueryTests(TestCase):
         firstvalues = fetch_all_first_values(self.session, select_stmt)
         self.assertEqual(len(firstvalues), 2)
         self.assertEqual(firstvalues, [self.a_val1, self.a_val2])
+
+    def test_gen_rows_fieldnames_batches_from_raw_sql(self) -> None:
+        sql = f"SELECT {self.a}, {self.b} FROM {self.tablename} ORDER BY a"
+        batches = list(
+            gen_rows_fieldnames_batches_from_raw_sql(
+                self.session, sql, batch_size=1
+            )
+        )
+        self.assertEqual(len(batches), 2)
+        for fieldnames, rows in batches:
+            self.assertEqual(fieldnames, [self.a, self.b])
+            self.assertEqual(len(rows), 1)
+        self.assertEqual(batches[1][1][0], (self.a_val2, self.b_val2))
+
+    def test_gen_rows_fieldnames_batches_from_select(self) -> None:
+        query = select(self.table.c.a, self.table.c.b).order_by(self.table.c.a)
+        batches = list(
+            gen_rows_fieldnames_batches_from_select(self.session, query)
+        )
+        self.assertEqual(len(batches), 1)
+        fieldnames, rows = batches[0]
+        self.assertEqual(fieldnames, [self.a, self.b])
+        self.assertEqual(
+            rows, [(self.a_val1, self.b_val1), (self.a_val2, self.b_val2)]
+        )
+        # No rows: we still get the fieldnames.
+        empty = list(
+            gen_rows_fieldnames_batches_from_select(
+                self.session, select(self.emptytable.c.x)
+            )
+        )
+        self.assertEqual(empty, [(["x"], [])])
+        with self.assertRaises(ValueError):
+            list(
+                gen_rows_fieldnames_batches_from_select(
+                    self.session, query, batch_size=0
+                )
+            )
+
+    def test_gen_batches_numpy(self) -> None:
+        query = select(
+            self.table.c.a,
+            (self.table.c.b / 2.0).label("half"),
+            text("NULL AS n"),
+        ).order_by(self.table.c.a)
+        ((fieldnames, columns),) = gen_rows_fieldnames_batches_from_select(
+            self.session, query, columnar=ColumnarBatchFormat.NUMPY
+        )
+        self.assertEqual(fieldnames, [self.a, "half", "n"])
+        self.assertEqual(columns[0].dtype.name, "int64")
+        self.assertEqual(columns[0].tolist(), [self.a_val1, self.a_val2])
+        self.assertEqual(columns[1].dtype.name, "float64")
+        self.assertEqual(columns[2].dtype.name, "object")
+        self.assertEqual(columns[2].tolist(), [None, None])
+        with self.assertRaises(ValueError):
+            list(
+                gen_rows_fieldnames_batches_from_select(
+                    self.session, query, columnar="nonsense"
+                )
+            )
+
+    def test_gen_batches_numpy_mixed_int_float(self) -> None:
+        big = 2**53 + 1  # not exactly representable as a float
+        for values, dtype in (
+            ([1, 2.5], "float64"),
+            ([big, 2.5], "object"),
+        ):
+            sql = " UNION ALL ".join(f"SELECT {v} AS x" for v in values)
+            ((_, columns),) = gen_rows_fieldnames_batches_from_raw_sql(
+                self.session, sql, columnar=ColumnarBatchFormat.NUMPY
+            )
+            self.assertEqual(columns[0].dtype.name, dtype)
+            self.assertEqual(columns[0].tolist(), values)
@@ -31,16 +31,30 @@
 # =============================================================================
 
 import logging
-from unittest import TestCase
+from unittest import mock, TestCase
 
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    create_engine,
+    MetaData,
+    select,
+    Table,
+)
+from sqlalchemy.dialects.mssql.base import MSDialect
 from sqlalchemy.dialects.mysql.base import MySQLDialect
+from sqlalchemy.dialects.postgresql.base import PGDialect
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm.session import Session
 from sqlalchemy.exc import IntegrityError
 
 from cardinal_pythonlib.sqlalchemy.insert_on_duplicate import (
+    _dedupe_chunk,
+    _mssql_merge_sql,
+    bulk_insert_with_upsert_if_supported,
     insert_with_upsert_if_supported,
+    make_bulk_upsert_statement,
 )
 
 log = logging.getLogger(__name__)
@@ -91,3 +105,186 @@ class InsertOnDuplicateKeyUpdateTests(TestCase):
 
         # We can't test fully here without a MySQL connection.
         # But syntax tested separately in upsert_test_1.sql
+
+
+class BulkUpsertTests(TestCase):
+    def setUp(self) -> None:
+        # noinspection PyPep8Naming
+        Base = declarative_base()
+
+        class OrmObject(Base):
+            __tablename__ = "sometable"
+            id = Column(Integer, primary_key=True)
+            name = Column(String)
+            other = Column(String)
+
+        self.engine = create_engine("sqlite://", future=True)
+        Base.metadata.create_all(self.engine)
+        self.table = OrmObject.__table__
+
+    def _contents(self, session: Session) -> list:
+        return [
+            tuple(row)
+            for row in session.execute(
+                select(self.table).order_by(self.table.c.id)
+            )
+        ]
+
+    def test_bulk_upsert_sqlite(self) -> None:
+        with Session(self.engine, future=True) as session:
+            n = bulk_insert_with_upsert_if_supported(
+                session,
+                self.table,
+                (dict(id=i, name=f"n{i}", other="x") for i in range(5)),
+                chunk_size=2,
+            )
+            self.assertEqual(n, 5)
+            n = bulk_insert_with_upsert_if_supported(
+                session,
+                self.table,
+                [dict(id=i, name=f"new{i}") for i in range(3, 7)],
+                chunk_size=3,
+            )
+            self.assertEqual(n, 4)
+            self.assertEqual(
+                self._contents(session),
+                [(i, f"n{i}", "x") for i in range(3)]
+                + [(i, f"new{i}", "x") for i in (3, 4)]
+                + [(i, f"new{i}", None) for i in (5, 6)],
+            )
+            # Key columns only: existing rows are left alone.
+            n = bulk_insert_with_upsert_if_supported(
+                session, self.table, [dict(id=0), dict(id=7)]
+            )
+            self.assertEqual(n, 1)
+            self.assertEqual(self._contents(session)[0], (0, "n0", "x"))
+            self.assertEqual(
+                bulk_insert_with_upsert_if_supported(session, self.table, []),
+                0,
+            )
+            with self.assertRaises(ValueError):
+                bulk_insert_with_upsert_if_supported(
+                    session, self.table, [dict(id=1)], chunk_size=0
+                )
+
+    def test_duplicate_keys_in_chunk(self) -> None:
+        with Session(self.engine, future=True) as session:
+            bulk_insert_with_upsert_if_supported(
+                session,
+                self.table,
+                [
+                    dict(id=1, name="a1"),
+                    dict(id=2, name="b"),
+                    dict(id=1, name="a2"),
+                ],
+            )
+            self.assertEqual(
+                self._contents(session), [(1, "a2", None), (2, "b", None)]
+            )
+        self.assertEqual(
+            _dedupe_chunk(
+                [
+                    dict(k=1, v="x"),
+                    dict(k=None, v="y"),
+                    dict(k=None, v="z"),  # NULL keys never conflict
+                    dict(k=1, v="w"),
+                ],
+                ["k"],
+            ),
+            [dict(k=None, v="y"), dict(k=None, v="z"), dict(k=1, v="w")],
+        )
+        chunk = [dict(k=1), dict(k=2)]
+        self.assertIs(_dedupe_chunk(chunk, ["k"]), chunk)
+
+    def test_unknown_rowcount(self) -> None:
+        with Session(self.engine, future=True) as session:
+            results = [mock.Mock(rowcount=2), mock.Mock(rowcount=-1)]
+            with mock.patch.object(session, "execute", side_effect=results):
+                n = bulk_insert_with_upsert_if_supported(
+                    session,
+                    self.table,
+                    [dict(id=i) for i in range(4)],
+                    chunk_size=2,
+                )
+            self.assertIsNone(n)
+
+    def test_mysql_nothing_to_update(self) -> None:
+        mysql = MySQLDialect()
+        sql = str(
+            make_bulk_upsert_statement(
+                self.table, mysql, update_columns=[]
+            ).compile(dialect=mysql)
+        )
+        self.assertIn("ON DUPLICATE KEY UPDATE id = sometable.id", sql)
+        # No primary key (e.g. only a unique index), and nothing to update:
+        table = Table(
+            "nopk",
+            MetaData(),
+            Column("a", Integer, unique=True),
+            Column("b", Integer),
+        )
+        sql = str(
+            make_bulk_upsert_statement(
+                table, mysql, update_columns=[]
+            ).compile(dialect=mysql)
+        )
+        self.assertIn("ON DUPLICATE KEY UPDATE a = nopk.a", sql)
+
+    def test_bulk_upsert_statements(self) -> None:
+        mysql = MySQLDialect()
+        sql = str(
+            make_bulk_upsert_statement(
+                self.table, mysql, update_columns=["name"]
+            ).compile(dialect=mysql)
+        )
+        self.assertIn("ON DUPLICATE KEY UPDATE name = VALUES(name)", sql)
+        pg = PGDialect()
+        sql = str(
+            make_bulk_upsert_statement(self.table, pg).compile(dialect=pg)
+        )
+        self.assertIn(
+            "ON CONFLICT (id) DO UPDATE SET name = excluded.name, "
+            "other = excluded.other",
+            sql,
+        )
+        sql = str(
+            make_bulk_upsert_statement(
+                self.table, pg, key_columns=["id", "name"], update_columns=[]
+            ).compile(dialect=pg)
+        )
+        self.assertIn("ON CONFLICT (id, name) DO NOTHING", sql)
+
+    def test_mssql_merge_sql(self) -> None:
+        sql = _mssql_merge_sql(
+            table=self.table,
+            staging_name="#staging_sometable",
+            colnames=["id", "name"],
+            key_columns=["id"],
+            update_columns=["name"],
+            dialect=MSDialect(),
+        )
+        self.assertEqual(
+            sql,
+            "MERGE INTO sometable WITH (HOLDLOCK) AS t "
+            "USING [#staging_sometable] AS s ON t.id = s.id "
+            "WHEN MATCHED THEN UPDATE SET t.name = s.name "
+            "WHEN NOT MATCHED THEN INSERT (id, name) VALUES (s.id, s.name);",
+        )
+        # The target table's schema is kept:
+        table = Table(
+            "sometable",
+            MetaData(),
+            Column("id", Integer, primary_key=True),
+            schema="myschema",
+        )
+        sql = _mssql_merge_sql(
+            table=table,
+            staging_name="#staging_sometable",
+            colnames=["id"],
+            key_columns=["id"],
+            update_columns=[],
+            dialect=MSDialect(),
+        )
+        self.assertTrue(
+            sql.startswith("MERGE INTO myschema.sometable WITH (HOLDLOCK)")
+        )
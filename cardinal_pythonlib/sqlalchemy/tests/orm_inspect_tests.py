@@ -26,12 +26,29 @@
 
 from typing import Tuple
 import unittest
+from unittest import mock
 
-from sqlalchemy.orm import declarative_base
-from sqlalchemy.sql.schema import Column
-from sqlalchemy.sql.sqltypes import Integer
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import (
+    aliased,
+    backref,
+    declarative_base,
+    relationship,
+    Session,
+)
+from sqlalchemy.sql.schema import Column, ForeignKey, ForeignKeyConstraint
+from sqlalchemy.sql.sqltypes import Integer, String
 
-from cardinal_pythonlib.sqlalchemy.orm_inspect import gen_columns
+from cardinal_pythonlib.sqlalchemy import orm_inspect
+from cardinal_pythonlib.sqlalchemy.dialect import SqlaDialectName
+from cardinal_pythonlib.sqlalchemy.orm_inspect import (
+    copy_sqla_object,
+    deepcopy_sqla_objects,
+    gen_columns,
+    gen_relationships,
+    prefetch_orm_tree,
+    walk_orm_tree,
+)
 
 Base = declarative_base()
 
@@ -42,6 +59,28 @@ class Person(Base):
     name_attr = Column("name", Integer)
 
 
+class Parent(Base):
+    __tablename__ = "parent"
+    pk = Column(Integer, primary_key=True)
+    children = relationship("Child", back_populates="parent")
+    pet = relationship("Pet", uselist=False, back_populates="owner")
+
+
+class Child(Base):
+    __tablename__ = "child"
+    pk = Column(Integer, primary_key=True)
+    name = Column(String(50))
+    parent_pk = Column(Integer, ForeignKey("parent.pk"))
+    parent = relationship("Parent", back_populates="children")
+
+
+class Pet(Base):
+    __tablename__ = "pet"
+    pk = Column(Integer, primary_key=True)
+    owner_pk = Column(Integer, ForeignKey("parent.pk"))
+    owner = relationship("Parent", back_populates="pet")
+
+
 class GenColumnsTests(unittest.TestCase):
     def assert_column(
         self, column_info: Tuple[str, Column], attr_name: str, column_name: str
@@ -63,3 +102,255 @@ class GenColumnsTests(unittest.TestCase):
 
         self.assert_column(columns[0], "pk_attr", "pk")
         self.assert_column(columns[1], "name_attr", "name")
+
+
+class WalkOrmTreeTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.children = [Child(pk=i) for i in range(3)]
+        self.pet = Pet(pk=1)
+        self.parent = Parent(pk=1, children=self.children, pet=self.pet)
+
+    def test_breadth_first_each_once(self) -> None:
+        objects = list(walk_orm_tree(self.children[1]))
+        self.assertEqual(
+            objects,
+            [
+                self.children[1],
+                self.parent,
+                self.children[0],
+                self.children[2],
+                self.pet,
+            ],
+        )
+
+    def test_skips(self) -> None:
+        self.assertEqual(
+            list(
+                walk_orm_tree(
+                    self.parent, skip_relationships_always=["children"]
+                )
+            ),
+            [self.parent, self.pet],
+        )
+        self.assertEqual(
+            list(
+                walk_orm_tree(
+                    self.parent,
+                    skip_relationships_by_tablename={"parent": ["pet"]},
+                )
+            ),
+            [self.parent] + self.children,
+        )
+        self.assertEqual(
+            list(
+                walk_orm_tree(
+                    self.children[0],
+                    skip_all_relationships_for_tablenames=["parent"],
+                )
+            ),
+            [self.children[0], self.parent],
+        )
+        self.assertEqual(
+            list(
+                walk_orm_tree(
+                    self.parent, skip_all_objects_for_tablenames=["child"]
+                )
+            ),
+            [self.parent, self.pet],
+        )
+
+    def test_seen(self) -> None:
+        seen = {self.pet}
+        objects = list(walk_orm_tree(self.parent, seen=seen))
+        self.assertNotIn(self.pet, objects)
+        self.assertEqual(len(seen), 5)
+
+    def test_gen_relationships(self) -> None:
+        expected = [("children", Child), ("pet", Pet)]
+        for obj in (Parent, self.parent):
+            self.assertEqual(
+                sorted(
+                    (attrname, related_class)
+                    for attrname, _, related_class in gen_relationships(obj)
+                ),
+                expected,
+            )
+        for obj in (Parent.__mapper__, aliased(Parent)):
+            self.assertEqual(
+                sorted(attrname for attrname, _, _ in gen_relationships(obj)),
+                ["children", "pet"],
+            )
+
+    def test_backref_defined_later(self) -> None:
+        base = declarative_base()
+
+        class A(base):
+            __tablename__ = "a"
+            pk = Column(Integer, primary_key=True)
+
+        a = A(pk=1)
+        self.assertEqual(list(gen_relationships(A)), [])
+        self.assertEqual(list(walk_orm_tree(a)), [a])
+
+        class C(base):
+            __tablename__ = "c"
+            pk = Column(Integer, primary_key=True)
+            a_pk = Column(Integer, ForeignKey("a.pk"))
+            a = relationship(A, backref=backref("cs"))
+
+        c = C(pk=1)
+        a.cs = [c]
+        self.assertEqual(
+            [attrname for attrname, _, _ in gen_relationships(A)], ["cs"]
+        )
+        self.assertEqual(list(walk_orm_tree(a)), [a, c])
+
+
+class DeepcopyTests(unittest.TestCase):
+    N_PARENTS = 20
+    N_CHILDREN = 5
+
+    def setUp(self) -> None:
+        self.src_engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.src_engine)
+        with Session(self.src_engine) as session:
+            for i in range(self.N_PARENTS):
+                session.add(
+                    Parent(
+                        pk=i,
+                        children=[
+                            Child(pk=i * 100 + j, name=f"c{i}.{j}")
+                            for j in range(self.N_CHILDREN)
+                        ],
+                        pet=Pet(pk=i),
+                    )
+                )
+            session.commit()
+        self.n_queries = 0
+        event.listen(
+            self.src_engine, "before_cursor_execute", self._count_query
+        )
+
+    def _count_query(self, *args, **kwargs) -> None:
+        self.n_queries += 1
+
+    def _deepcopy(self, prefetch: bool) -> int:
+        dst_engine = create_engine("sqlite://")
+        Base.metadata.create_all(dst_engine)
+        with Session(self.src_engine) as src, Session(dst_engine) as dst:
+            parents = src.scalars(select(Parent)).all()
+            self.n_queries = 0
+            deepcopy_sqla_objects(
+                parents,
+                dst,
+                debug_walk=False,
+                prefetch=prefetch,
+                prefetch_chunk_size=7,
+            )
+            dst.commit()
+            n_queries = self.n_queries
+        with Session(dst_engine) as dst:
+            children = dst.scalars(select(Child)).all()
+            self.assertEqual(len(children), self.N_PARENTS * self.N_CHILDREN)
+            self.assertEqual(
+                sorted(len(p.children) for p in dst.scalars(select(Parent))),
+                [self.N_CHILDREN] * self.N_PARENTS,
+            )
+            self.assertTrue(all(c.parent.pet is not None for c in children))
+            self.assertEqual(
+                {c.name for c in children if c.parent.children[0] is c},
+                {f"c{i}.0" for i in range(self.N_PARENTS)},
+            )
+        return n_queries
+
+    def test_prefetch_reduces_queries(self) -> None:
+        lazy_queries = self._deepcopy(prefetch=False)
+        prefetch_queries = self._deepcopy(prefetch=True)
+        # Lazy: one query per parent per one-to-many/one-to-one relationship.
+        self.assertEqual(lazy_queries, 2 * self.N_PARENTS)
+        # Prefetch: for each chunk of 7 parents, one SELECT plus one "IN"
+        # query per relationship. The many-to-one relationships back to the
+        # parents need no queries, as the parents are already loaded.
+        self.assertEqual(prefetch_queries, 3 * 3)
+
+    def test_prefetch_then_walk_needs_no_queries(self) -> None:
+        with Session(self.src_engine) as src:
+            parents = src.scalars(select(Parent)).all()
+            reached = prefetch_orm_tree(parents, chunk_size=1000)
+            self.n_queries = 0
+            walked = set()
+            for parent in parents:
+                walked.update(walk_orm_tree(parent, seen=walked))
+            self.assertEqual(self.n_queries, 0)
+            self.assertEqual(walked, reached)
+
+    def test_copy_sqla_object(self) -> None:
+        child = Child(pk=1, name="x", parent_pk=2)
+        copy = copy_sqla_object(child)
+        self.assertEqual(
+            (copy.pk, copy.name, copy.parent_pk), (None, "x", None)
+        )
+        copy = copy_sqla_object(
+            child, omit_pk=False, omit_fk=False, omit_attrs=["name"]
+        )
+        self.assertEqual((copy.pk, copy.name, copy.parent_pk), (1, None, 2))
+
+    def test_prefetch_composite_pk_without_tuple_in(self) -> None:
+        base = declarative_base()
+
+        class Order(base):
+            __tablename__ = "orders"
+            a = Column(Integer, primary_key=True)
+            b = Column(Integer, primary_key=True)
+            lines = relationship("Line")
+
+        class Line(base):
+            __tablename__ = "line"
+            pk = Column(Integer, primary_key=True)
+            order_a = Column(Integer)
+            order_b = Column(Integer)
+            __table_args__ = (
+                ForeignKeyConstraint(
+                    ["order_a", "order_b"], ["orders.a", "orders.b"]
+                ),
+            )
+
+        engine = create_engine("sqlite://")
+        base.metadata.create_all(engine)
+        with Session(engine) as session:
+            for i in range(5):
+                session.add(Order(a=i, b=-i, lines=[Line(pk=i)]))
+            session.commit()
+        # As for SQL Server, which has no "(a, b) IN (...)":
+        engine.dialect.name = SqlaDialectName.MSSQL
+        statements = []
+        event.listen(
+            engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(
+                statement
+            ),
+        )
+        with Session(engine) as session:
+            orders = session.scalars(select(Order)).all()
+            prefetch_orm_tree(orders, chunk_size=2)
+            n_queries = len(statements)
+            self.assertEqual([len(o.lines) for o in orders], [1] * 5)
+            self.assertEqual(len(statements), n_queries)
+        # Our own re-SELECTs of the orders use "(a = ? AND b = ?) OR ...".
+        # (The selectinload queries for the lines are SQLAlchemy's own.)
+        order_selects = [s for s in statements if "FROM orders \nWHERE" in s]
+        self.assertEqual(len(order_selects), 3)
+        self.assertFalse(
+            any("(orders.a, orders.b) IN" in s for s in order_selects)
+        )
+        # The chunk size is limited by the number of bound parameters: here,
+        # two orders (four parameters) per SELECT.
+        statements.clear()
+        with Session(engine) as session, mock.patch.object(
+            orm_inspect, "MAX_PARAMS_PER_STATEMENT", 4
+        ):
+            orders = session.scalars(select(Order)).all()
+            prefetch_orm_tree(orders, chunk_size=1000)
+        order_selects = [s for s in statements if "FROM orders \nWHERE" in s]
+        self.assertEqual(len(order_selects), 3)
@@ -28,6 +28,7 @@
 
 import logging
 import unittest
+from unittest import mock
 import sys
 
 from sqlalchemy import event, inspect, select
@@ -81,6 +82,7 @@ from cardinal_pythonlib.sqlalchemy.schema import (
     get_effective_int_pk_col,
     get_list_of_sql_string_literals_from_quoted_csv,
     get_pk_colnames,
+    get_schema_reflection_cache,
     get_single_int_autoincrement_colname,
     get_single_int_pk_colname,
     get_sqla_coltype_from_dialect_str,
@@ -99,6 +101,7 @@ from cardinal_pythonlib.sqlalchemy.schema import (
     mssql_table_has_ft_index,
     mssql_transaction_count,
     remove_collation,
+    SchemaReflectionCache,
     table_exists,
     table_or_view_exists,
     view_exists,
@@ -495,6 +498,115 @@ class MoreSchemaTests(unittest.TestCase):
             mssql_transaction_count(self.engine)
 
 
+class SchemaReflectionCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.engine = create_engine(SQLITE_MEMORY_URL, future=True)
+        self.metadata = MetaData()
+        self.person = Table(
+            "person",
+            self.metadata,
+            Column("id", Integer, primary_key=True),
+            Column("name", String(50)),
+        )
+        self.pet = Table(
+            "pet",
+            self.metadata,
+            Column("id", Integer, primary_key=True),
+            Column("species", String(50), index=True),
+        )
+        _attach_view("one", self.metadata, select(self.person.c.id))
+        with self.engine.begin() as conn:
+            self.metadata.create_all(conn)
+        self.n_queries = 0
+        event.listen(self.engine, "before_cursor_execute", self._count_query)
+
+    def _count_query(self, *args, **kwargs) -> None:
+        self.n_queries += 1
+
+    def test_names_are_cached(self) -> None:
+        cache = SchemaReflectionCache(self.engine)
+        self.assertEqual(sorted(cache.get_table_names()), ["person", "pet"])
+        self.assertEqual(cache.get_view_names(), ["one"])
+        n = self.n_queries
+        for _ in range(10):
+            self.assertTrue(cache.table_exists("person"))
+            self.assertFalse(cache.table_exists("one"))
+            self.assertTrue(cache.view_exists("one"))
+            self.assertTrue(cache.table_or_view_exists("one"))
+            self.assertFalse(cache.table_or_view_exists("nope"))
+        self.assertEqual(self.n_queries, n)
+
+    def test_columns_are_cached(self) -> None:
+        cache = SchemaReflectionCache(self.engine)
+        self.assertEqual(cache.get_column_names("person"), ["id", "name"])
+        n = self.n_queries
+        self.assertIsInstance(cache.get_column_type("person", "id"), Integer)
+        self.assertEqual(cache.get_column_info("person", "name").name, "name")
+        self.assertIsNone(cache.get_column_info("person", "nope"))
+        self.assertEqual(self.n_queries, n)
+        with self.assertRaises(NoSuchTableError):
+            cache.get_columns_info("nope")
+
+    def test_bulk_load(self) -> None:
+        cache = SchemaReflectionCache(self.engine)
+        columns = cache.load_columns()
+        self.assertEqual(sorted(columns), ["one", "person", "pet"])
+        self.assertEqual(
+            [c.name for c in columns["pet"]],
+            get_column_names(self.engine, "pet"),
+        )
+        self.assertEqual(sorted(cache.load_columns(["pet", "nope"])), ["pet"])
+        indexes = cache.load_indexes()
+        self.assertEqual(sorted(indexes), ["person", "pet"])
+        n = self.n_queries
+        self.assertEqual(cache.get_column_names("one"), ["id"])
+        self.assertTrue(cache.index_exists("pet", colnames="species"))
+        self.assertFalse(cache.index_exists("person", colnames="name"))
+        self.assertEqual(self.n_queries, n)
+
+    def test_bulk_load_without_multi_reflection(self) -> None:
+        # As for SQLAlchemy 1.4, which lacks Inspector.get_multi_columns().
+        with mock.patch(
+            "cardinal_pythonlib.sqlalchemy.schema.ObjectKind", None
+        ):
+            cache = SchemaReflectionCache(self.engine)
+            columns = cache.load_columns()
+            self.assertEqual(sorted(columns), ["one", "person", "pet"])
+            self.assertEqual(
+                sorted(cache.load_columns(["pet", "nope"])), ["pet"]
+            )
+            self.assertEqual(
+                sorted(cache.load_indexes(["pet", "nope"])), ["pet"]
+            )
+            self.assertTrue(table_or_view_exists(self.engine, "one"))
+            self.assertFalse(table_or_view_exists(self.engine, "nope"))
+
+    def test_index_exists(self) -> None:
+        cache = SchemaReflectionCache(self.engine)
+        with self.assertRaises(NoSuchTableError):
+            cache.index_exists("nope", indexname="x")
+        self.assertFalse(
+            cache.index_exists(
+                "nope", indexname="x", raise_if_nonexistent_table=False
+            )
+        )
+        self.assertTrue(cache.index_exists("pet", indexname="ix_pet_species"))
+
+    def test_invalidated_by_ddl(self) -> None:
+        cache = get_schema_reflection_cache(self.engine)
+        self.assertIs(get_schema_reflection_cache(self.engine), cache)
+        self.assertFalse(cache.table_exists("x"))
+        self.assertFalse(cache.index_exists("person", colnames="name"))
+
+        execute_ddl(self.engine, sql="CREATE TABLE x (a INT)")
+        self.assertTrue(cache.table_exists("x"))
+        self.assertEqual(cache.get_column_names("x"), ["a"])
+
+        add_index(self.engine, self.person.columns.name)
+        self.assertTrue(cache.index_exists("person", colnames="name"))
+
+
 class YetMoreSchemaTests(unittest.TestCase):
     def __init__(self, *args, echo: bool = True, **kwargs) -> None:
         self.echo = echo
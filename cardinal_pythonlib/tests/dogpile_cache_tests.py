@@ -32,14 +32,24 @@
 # =============================================================================
 
 import logging
+import time
+from typing import Any, List, Sequence
 import unittest
 
 # noinspection PyPackageRequirements
 from dogpile.cache import make_region
 
+# noinspection PyPackageRequirements
+from dogpile.cache.api import NO_VALUE
+
+# noinspection PyPackageRequirements
+from dogpile.cache.proxy import ProxyBackend
+
 from cardinal_pythonlib.dogpile_cache import (
     fkg_allowing_type_hints,
     kw_fkg_allowing_type_hints,
+    LRUProxyBackend,
+    multikey_fkg_allowing_type_hints,
 )
 
 log = logging.getLogger(__name__)
@@ -725,3 +735,168 @@ class DogpileCacheTests(unittest.TestCase):
         test(t2.dogpile_default_test_2(), False)
 
         log.info("Success!")
+
+
+# =============================================================================
+# Two-tier caching
+# =============================================================================
+
+
+class CountingProxy(ProxyBackend):
+    """
+    Records the keys requested from the "shared" backend.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.requested = []  # type: List[List[str]]
+
+    def get(self, key: str) -> Any:
+        self.requested.append([key])
+        return self.proxied.get(key)
+
+    def get_multi(self, keys: Sequence[str]) -> List[Any]:
+        self.requested.append(list(keys))
+        return self.proxied.get_multi(keys)
+
+    def get_serialized(self, key: str) -> Any:
+        self.requested.append([key])
+        return self.proxied.get_serialized(key)
+
+    def get_serialized_multi(self, keys: Sequence[str]) -> List[Any]:
+        self.requested.append(list(keys))
+        return self.proxied.get_serialized_multi(keys)
+
+
+class LRUProxyBackendTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.lru = LRUProxyBackend(maxsize=3)
+        self.counter = CountingProxy()
+        self.region = make_region().configure(
+            backend="dogpile.cache.memory", wrap=[self.lru, self.counter]
+        )
+        self.n_calls = 0
+
+    def test_local_tier_used(self) -> None:
+        @self.region.cache_on_arguments(
+            function_key_generator=kw_fkg_allowing_type_hints
+        )
+        def double(x: int) -> int:
+            self.n_calls += 1
+            return x * 2
+
+        self.assertEqual(double(2), 4)
+        n_requests = len(self.counter.requested)
+        n_hits = self.lru.hits
+        # The second call is answered locally:
+        self.assertEqual(double(2), 4)
+        self.assertEqual(self.n_calls, 1)
+        self.assertEqual(len(self.counter.requested), n_requests)
+        self.assertEqual(self.lru.hits, n_hits + 1)
+
+        # Evicted from the local tier, but still in the shared tier:
+        for x in (3, 4, 5):
+            double(x)
+        n_requests = len(self.counter.requested)
+        self.assertEqual(double(2), 4)
+        self.assertEqual(self.n_calls, 4)
+        self.assertEqual(len(self.counter.requested), n_requests + 1)
+
+        double.invalidate(2)
+        self.assertEqual(double(2), 4)
+        self.assertEqual(self.n_calls, 5)
+
+    def test_batch_lookup(self) -> None:
+        @self.region.cache_multi_on_arguments(
+            function_multi_key_generator=multikey_fkg_allowing_type_hints
+        )
+        def square(*args: int) -> List[int]:
+            self.n_calls += 1
+            return [x * x for x in args]
+
+        self.assertEqual(square(1, 2), [1, 4])
+        self.counter.requested.clear()
+        self.assertEqual(square(1, 2, 3), [1, 4, 9])
+        # Only the missing key went to the shared backend:
+        self.assertEqual(
+            self.counter.requested,
+            [[multikey_fkg_allowing_type_hints(None, square)(3)[0]]],
+        )
+        self.assertEqual(self.n_calls, 2)
+
+    def test_local_expiry(self) -> None:
+        lru = LRUProxyBackend(maxsize=10, local_expiration_time=0.01)
+        counter = CountingProxy()
+        region = make_region().configure(
+            backend="dogpile.cache.memory", wrap=[lru, counter]
+        )
+        region.set("k", "v")
+        self.assertEqual(region.get("k"), "v")
+        self.assertEqual(counter.requested, [])
+        time.sleep(0.02)
+        self.assertEqual(region.get("k"), "v")
+        self.assertEqual(counter.requested, [["k"]])
+
+    def test_missing_values_not_stored(self) -> None:
+        self.assertIs(self.region.get("absent"), NO_VALUE)
+        self.assertEqual(len(self.lru._cache), 0)
+        self.region.set_multi({"a": 1, "b": 2})
+        self.assertEqual(self.region.get_multi(["a", "b"]), [1, 2])
+        self.assertEqual(self.counter.requested, [["absent"]])
+        self.region.delete_multi(["a"])
+        self.assertIs(self.region.get("a"), NO_VALUE)
+
+    def test_mutation_does_not_corrupt_local_tier(self) -> None:
+        @self.region.cache_on_arguments(
+            function_key_generator=kw_fkg_allowing_type_hints
+        )
+        def make_list(n: int) -> List[int]:
+            self.n_calls += 1
+            return list(range(n))
+
+        make_list(3).append(99)  # mutate the value we were given on a miss
+        first = make_list(3)  # a local hit
+        first.append(99)  # ... and mutate that too
+        self.assertEqual(make_list(3), [0, 1, 2])
+        self.assertEqual(self.n_calls, 1)
+        self.assertIsNot(make_list(3), make_list(3))
+        self.region.set_multi({"a": [1]})
+        self.region.get_multi(["a"])[0].append(2)
+        self.assertEqual(self.region.get("a"), [1])
+
+    def test_unpicklable_values(self) -> None:
+        self.region.set("k", [1])
+        self.region.set("k", lambda: 0)  # can't be pickled
+        self.assertNotIn("k", self.lru._cache)  # old value not kept
+        self.assertTrue(callable(self.region.get("k")))  # shared tier
+
+    def test_without_copying(self) -> None:
+        lru = LRUProxyBackend(maxsize=10, copy_values=False)
+        region = make_region().configure(
+            backend="dogpile.cache.memory", wrap=[lru]
+        )
+        value = ["shared"]
+        region.set("k", value)
+        self.assertIs(region.get("k"), value)
+
+    @unittest.skipUnless(
+        hasattr(ProxyBackend, "get_serialized"),
+        "dogpile.cache < 1.1 has no serialized backend API",
+    )
+    def test_serializing_backend(self) -> None:
+        lru = LRUProxyBackend(maxsize=10)
+        counter = CountingProxy()
+        region = make_region().configure(
+            backend="dogpile.cache.memory_pickle", wrap=[lru, counter]
+        )
+        region.set("k", {"a": 1})
+        self.assertEqual(region.get("k"), {"a": 1})
+        region.set_multi({"x": 1, "y": 2})
+        self.assertEqual(region.get_multi(["x", "y", "z"]), [1, 2, NO_VALUE])
+        # Only the never-set key went to the proxied backend:
+        self.assertEqual(counter.requested, [["z"]])
+        # Serialized bytes are what is held locally:
+        self.assertIsInstance(lru._cache[lru._serialized_key("k")][0], bytes)
+        region.delete("k")
+        self.assertIs(region.get("k"), NO_VALUE)
+        self.assertEqual(counter.requested, [["z"], ["k"]])
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# cardinal_pythonlib/tests/excel_tests.py
+
+"""
+===============================================================================
+
+    Original code copyright (C) 2009-2022 Rudolf Cardinal (rudolf@pobox.com).
+
+    This file is part of cardinal_pythonlib.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+===============================================================================
+
+**Unit tests.**
+
+"""
+
+import datetime
+from decimal import Decimal
+import io
+import unittest
+import uuid
+import zipfile
+
+from openpyxl import load_workbook
+import pandas as pd
+
+from cardinal_pythonlib.excel import (
+    convert_for_openpyxl,
+    convert_rows_for_openpyxl,
+    gen_ods_chunks,
+    make_xlsx_tempfile,
+    ODS_MIMETYPE,
+    write_ods_streaming,
+)
+
+DT = datetime.datetime(2020, 1, 2, 3, 4, 5)
+UUID = uuid.UUID(int=5)
+
+
+def _gen_rows(n: int):
+    yield ["n", "half", "text"]
+    for i in range(n):
+        yield [i, i / 2, f"row {i}"]
+
+
+class XlsxStreamingTests(unittest.TestCase):
+    def test_convert_rows(self) -> None:
+        row = [1, "a", DT, UUID, None, 2.5]
+        self.assertEqual(
+            list(convert_rows_for_openpyxl([row, tuple(row)])),
+            [[convert_for_openpyxl(x) for x in row]] * 2,
+        )
+
+    def test_roundtrip(self) -> None:
+        with make_xlsx_tempfile(
+            [("First", _gen_rows(100)), ("Second", [[DT, UUID]])]
+        ) as f:
+            wb = load_workbook(f, read_only=True)
+            self.assertEqual(wb.sheetnames, ["First", "Second"])
+            rows = list(wb["First"].values)
+            self.assertEqual(len(rows), 101)
+            self.assertEqual(rows[100], (99, 49.5, "row 99"))
+            self.assertEqual(
+                list(wb["Second"].values),
+                [(convert_for_openpyxl(DT), str(UUID))],
+            )
+            wb.close()
+
+
+class OdsStreamingTests(unittest.TestCase):
+    def test_chunks(self) -> None:
+        chunks = list(gen_ods_chunks([("S", _gen_rows(1000))], chunk_rows=100))
+        self.assertGreater(len(chunks), 2)
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+            self.assertEqual(zf.namelist()[0], "mimetype")
+            self.assertEqual(zf.read("mimetype").decode(), ODS_MIMETYPE)
+
+    def test_invalid_chunk_rows(self) -> None:
+        for chunk_rows in (0, -1):
+            with self.assertRaises(ValueError):
+                list(gen_ods_chunks([("S", [[1]])], chunk_rows=chunk_rows))
+
+    def test_table_columns_declared(self) -> None:
+        chunks = gen_ods_chunks(
+            [
+                ("Wide", [[1], [1, 2, 3], [1, 2]]),
+                ("Empty", []),
+                ("Narrow", _gen_rows(10)),
+            ],
+            chunk_rows=2,
+        )
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+            content = zf.read("content.xml").decode()
+        column = '<table:table-column table:number-columns-repeated="{}"/>'
+        self.assertIn(
+            '<table:table table:name="Wide">\n' + column.format(3), content
+        )
+        self.assertIn(
+            '<table:table table:name="Empty">\n'
+            + column.format(1)
+            + "\n<table:table-row><table:table-cell/></table:table-row>\n"
+            "</table:table>",
+            content,
+        )
+        self.assertIn(
+            '<table:table table:name="Narrow">\n' + column.format(3), content
+        )
+        self.assertEqual(content.count("<table:table-column "), 3)
+        self.assertEqual(content.count("<table:table-row>"), 3 + 1 + 11)
+
+    def test_decimal_is_numeric(self) -> None:
+        chunks = gen_ods_chunks([("S", [[Decimal("1.25"), Decimal("NaN")]])])
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+            content = zf.read("content.xml").decode()
+        self.assertIn(
+            '<table:table-cell office:value-type="float" '
+            'office:value="1.25"><text:p>1.25</text:p></table:table-cell>',
+            content,
+        )
+        self.assertIn(
+            '<table:table-cell office:value-type="string">'
+            "<text:p>NaN</text:p></table:table-cell>",
+            content,
+        )
+
+    def test_roundtrip(self) -> None:
+        f = io.BytesIO()
+        write_ods_streaming(
+            f,
+            [
+                ("Numbers", _gen_rows(50)),
+                ("Empty", []),
+                (
+                    "Types <&>",
+                    [
+                        ["a", "b", "c", "d", "e", "f"],
+                        [True, Decimal("1.25"), "x<&>\x01y", None, DT, UUID],
+                        [datetime.date(2020, 1, 2), 1, 2, 3, 4, 5],
+                    ],
+                ),
+            ],
+        )
+        f.seek(0)
+        sheets = pd.read_excel(f, engine="odf", sheet_name=None)
+        self.assertEqual(list(sheets), ["Numbers", "Empty", "Types <&>"])
+        self.assertTrue(sheets["Empty"].empty)
+        numbers = sheets["Numbers"]
+        self.assertEqual(list(numbers["n"]), list(range(50)))
+        self.assertEqual(numbers["text"][49], "row 49")
+        types = sheets["Types <&>"]
+        self.assertEqual(bool(types["a"][0]), True)
+        self.assertEqual(types["b"][0], 1.25)
+        self.assertEqual(types["c"][0], "x<&>y")
+        self.assertTrue(pd.isna(types["d"][0]))
+        self.assertEqual(types["e"][0], convert_for_openpyxl(DT))
+        self.assertEqual(types["f"][0], str(UUID))
+        self.assertEqual(pd.Timestamp(types["a"][1]), pd.Timestamp(2020, 1, 2))
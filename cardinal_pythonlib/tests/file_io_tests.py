@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# cardinal_pythonlib/tests/file_io_tests.py
+
+"""
+===============================================================================
+
+    Original code copyright (C) 2009-2022 Rudolf Cardinal (rudolf@pobox.com).
+
+    This file is part of cardinal_pythonlib.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+===============================================================================
+
+**Unit tests.**
+
+"""
+
+import io
+import os
+import tempfile
+from typing import BinaryIO, List
+import unittest
+import zipfile
+
+from cardinal_pythonlib.file_io import (
+    gen_dataframes_from_csv_binfiles,
+    gen_files_from_zipfiles,
+    gen_lines_from_binary_files,
+    gen_lines_from_binary_files_mmap,
+    gen_row_batches_from_csv_binfiles,
+)
+
+
+# =============================================================================
+# Helper functions
+# =============================================================================
+
+
+def _csv_binfile(text: str) -> BinaryIO:
+    return io.BytesIO(text.encode("utf8"))
+
+
+def _make_zip(contents: List[str]) -> BinaryIO:
+    zipbuffer = io.BytesIO()
+    with zipfile.ZipFile(zipbuffer, "w") as zf:
+        for i, text in enumerate(contents):
+            zf.writestr(f"file{i}.csv", text)
+    zipbuffer.seek(0)
+    return zipbuffer
+
+
+# =============================================================================
+# CSV tests
+# =============================================================================
+
+CSV_1 = "id,name,score\n1,alice,3.5\n2,bob,4.0\n3,carol,2.5\n"
+CSV_2 = "id,name,score\n4,dave,1.0\n5,eve,5.0\n"
+
+
+class CsvBatchTests(unittest.TestCase):
+    def test_batches_span_files(self) -> None:
+        batches = list(
+            gen_row_batches_from_csv_binfiles(
+                [_csv_binfile(CSV_1), _csv_binfile(CSV_2)], batch_size=2
+            )
+        )
+        self.assertEqual([len(b) for b in batches], [2, 2, 1])
+        self.assertEqual(batches[0][0], ("1", "alice", "3.5"))
+        self.assertEqual(batches[2][0], ("5", "eve", "5.0"))
+
+    def test_converters(self) -> None:
+        batches = list(
+            gen_row_batches_from_csv_binfiles(
+                [_csv_binfile(CSV_1)], converters=[int, None, float]
+            )
+        )
+        self.assertEqual(
+            batches,
+            [[(1, "alice", 3.5), (2, "bob", 4.0), (3, "carol", 2.5)]],
+        )
+
+    def test_blank_lines_skipped(self) -> None:
+        for converters in (None, [int, int]):
+            batches = list(
+                gen_row_batches_from_csv_binfiles(
+                    [io.BytesIO(b"a,b\n1,2\n\n3,4\n\n")],
+                    converters=converters,
+                    batch_size=1,
+                )
+            )
+            self.assertEqual(
+                [row for batch in batches for row in batch],
+                [(1, 2), (3, 4)] if converters else [("1", "2"), ("3", "4")],
+            )
+
+    def test_bad_rows(self) -> None:
+        for text, message in (
+            ("a,b\n1,2\n3\n", "CSV line 3: Row has 1 fields"),
+            ("a,b\n1,2\n\n3,x\n", "CSV line 4: invalid literal"),
+        ):
+            with self.assertRaises(ValueError) as cm:
+                list(
+                    gen_row_batches_from_csv_binfiles(
+                        [_csv_binfile(text)],
+                        converters=[int, int],
+                        dialect="excel",
+                    )
+                )
+            self.assertIn(message, str(cm.exception))
+
+    def test_no_header(self) -> None:
+        batches = list(
+            gen_row_batches_from_csv_binfiles(
+                [_csv_binfile(CSV_1)], has_header=False
+            )
+        )
+        self.assertEqual(batches[0][0], ("id", "name", "score"))
+        self.assertEqual(len(batches[0]), 4)
+
+    def test_dialect_reused_for_identical_headers(self) -> None:
+        dialect_cache = {}
+        semicolon_csv = "a;b\n1;2\n"
+        list(
+            gen_row_batches_from_csv_binfiles(
+                [
+                    _csv_binfile(CSV_1),
+                    _csv_binfile(CSV_2),
+                    _csv_binfile(semicolon_csv),
+                ],
+                dialect_cache=dialect_cache,
+            )
+        )
+        self.assertEqual(len(dialect_cache), 2)
+        self.assertEqual(dialect_cache["a;b\n"].delimiter, ";")
+
+    def test_long_sample_with_multiline_field(self) -> None:
+        text = 'x,y\n1,"line one\nline two"\n2,plain\n'
+        batches = list(
+            gen_row_batches_from_csv_binfiles(
+                [_csv_binfile(text)], sniff_size=12
+            )
+        )
+        self.assertEqual(
+            batches, [[("1", "line one\nline two"), ("2", "plain")]]
+        )
+
+    def test_from_in_memory_zip_streams(self) -> None:
+        zipped = _make_zip([CSV_1, CSV_2])
+        batches = list(
+            gen_row_batches_from_csv_binfiles(
+                gen_files_from_zipfiles([zipped], "*.csv"),
+                converters=[int],
+            )
+        )
+        self.assertEqual([row[0] for row in batches[0]], [1, 2, 3, 4, 5])
+
+    def test_dataframes(self) -> None:
+        dataframes = list(
+            gen_dataframes_from_csv_binfiles(
+                [_csv_binfile(CSV_1), _csv_binfile(CSV_2)],
+                batch_size=3,
+                converters=[int, None, float],
+            )
+        )
+        self.assertEqual(len(dataframes), 2)
+        self.assertEqual(list(dataframes[0].columns), ["id", "name", "score"])
+        self.assertEqual(list(dataframes[1]["id"]), [4, 5])
+        self.assertAlmostEqual(dataframes[1]["score"].sum(), 6.0)
+
+
+# =============================================================================
+# ZIP and line-reading tests
+# =============================================================================
+
+ZIP_CONTENTS = [f"contents of file {i}\n" * (i + 1) for i in range(10)]
+
+
+class ZipFileTests(unittest.TestCase):
+    def _check_contents(self, on_disk: bool, max_workers: int) -> None:
+        zipped = _make_zip(ZIP_CONTENTS)
+        contents = [
+            f.read().decode("utf8")
+            for f in gen_files_from_zipfiles(
+                [zipped], "*.csv", on_disk=on_disk, max_workers=max_workers
+            )
+        ]
+        self.assertEqual(contents, ZIP_CONTENTS)
+
+    def test_in_memory_serial(self) -> None:
+        self._check_contents(on_disk=False, max_workers=1)
+
+    def test_in_memory_parallel(self) -> None:
+        self._check_contents(on_disk=False, max_workers=4)
+
+    def test_on_disk_serial(self) -> None:
+        self._check_contents(on_disk=True, max_workers=1)
+
+    def test_on_disk_parallel(self) -> None:
+        self._check_contents(on_disk=True, max_workers=4)
+
+    def test_on_disk_files_removed(self) -> None:
+        zipped = _make_zip(ZIP_CONTENTS)
+        filenames = []
+        for f in gen_files_from_zipfiles([zipped], "*", on_disk=True):
+            filenames.append(f.name)
+            self.assertTrue(os.path.isfile(f.name))
+        self.assertEqual(len(filenames), len(ZIP_CONTENTS))
+        self.assertEqual(len(set(os.path.dirname(x) for x in filenames)), 1)
+        for filename in filenames:
+            self.assertFalse(os.path.exists(filename))
+
+    def test_filespec(self) -> None:
+        zipped = _make_zip(ZIP_CONTENTS)
+        files = list(
+            gen_files_from_zipfiles([zipped], "file1*.csv", max_workers=2)
+        )
+        self.assertEqual(len(files), 1)
+
+
+class MmapLineTests(unittest.TestCase):
+    def _check_same_lines(self, data: bytes, block_size: int) -> None:
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            f.seek(0)
+            expected = list(gen_lines_from_binary_files([f]))
+            f.seek(0)
+            actual = list(
+                gen_lines_from_binary_files_mmap([f], block_size=block_size)
+            )
+        self.assertEqual(actual, expected)
+
+    def test_mmap_matches_plain_reader(self) -> None:
+        data = "line one\r\n\nlïne thrée \nlast line, no newline".encode(
+            "utf8"
+        )
+        for block_size in (1, 4, 10, 1000):
+            self._check_same_lines(data, block_size)
+
+    def test_mmap_trailing_newline(self) -> None:
+        self._check_same_lines(b"a\nb\n", 3)
+
+    def test_mmap_empty_file(self) -> None:
+        self._check_same_lines(b"", 10)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# cardinal_pythonlib/tests/logs_tests.py
+
+"""
+===============================================================================
+
+    Original code copyright (C) 2009-2022 Rudolf Cardinal (rudolf@pobox.com).
+
+    This file is part of cardinal_pythonlib.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+===============================================================================
+
+**Unit tests.**
+
+"""
+
+import logging
+from queue import Queue
+import unittest
+
+from cardinal_pythonlib.logs import (
+    BoundedQueueHandler,
+    BraceStyleAdapter,
+    make_queued_handler,
+    QueueFullPolicy,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(self.format(record))
+
+
+class QueuedLoggingTests(unittest.TestCase):
+    def test_messages_are_formatted_by_listener(self) -> None:
+        target = ListHandler()
+        queue_handler, listener = make_queued_handler([target])
+        logger = logging.getLogger("cardinal_pythonlib.tests.logs.queued")
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(queue_handler)
+        log = BraceStyleAdapter(logger)
+        listener.start()
+        try:
+            for i in range(3):
+                log.info("Hello, {}!", i)
+        finally:
+            listener.stop()
+            logger.removeHandler(queue_handler)
+        self.assertEqual(
+            target.messages, ["Hello, 0!", "Hello, 1!", "Hello, 2!"]
+        )
+
+    def test_full_queue_drops_records(self) -> None:
+        handler = BoundedQueueHandler(
+            Queue(maxsize=2), policy=QueueFullPolicy.DROP
+        )
+        logger = logging.getLogger("cardinal_pythonlib.tests.logs.dropped")
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(handler)
+        try:
+            for i in range(5):
+                logger.info("message %s", i)
+        finally:
+            logger.removeHandler(handler)
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.dropped, 3)
+
+    def test_full_queue_blocks_then_drops_after_timeout(self) -> None:
+        handler = BoundedQueueHandler(
+            Queue(maxsize=1), policy=QueueFullPolicy.BLOCK, block_timeout=0.01
+        )
+        record = logging.makeLogRecord({"msg": "x"})
+        handler.handle(record)
+        handler.handle(record)
+        self.assertEqual(handler.dropped, 1)
+
+
+class BraceStyleAdapterTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.target = ListHandler()
+        self.logger = logging.getLogger("cardinal_pythonlib.tests.logs.brace")
+        self.logger.propagate = False
+        self.logger.addHandler(self.target)
+        self.log = BraceStyleAdapter(self.logger)
+
+    def tearDown(self) -> None:
+        self.logger.removeHandler(self.target)
+        logging.disable(logging.NOTSET)
+
+    def test_level_changes_are_respected(self) -> None:
+        self.logger.setLevel(logging.INFO)
+        self.log.debug("one {}", 1)
+        self.log.info("two {}", 2)
+        self.logger.setLevel(logging.DEBUG)
+        self.log.debug("three {}", 3)
+        logging.disable(logging.INFO)
+        self.log.info("four {}", 4)
+        self.log.warning("five {}", 5)
+        logging.disable(logging.NOTSET)
+        self.logger.disabled = True
+        self.log.warning("six {}", 6)
+        self.logger.disabled = False
+        self.assertEqual(self.target.messages, ["two 2", "three 3", "five 5"])
+
+    def test_exception_includes_traceback(self) -> None:
+        self.logger.setLevel(logging.DEBUG)
+        try:
+            raise ValueError("bad")
+        except ValueError:
+            self.log.exception("Failed: {}", "x")
+        self.assertTrue(self.target.messages[0].startswith("Failed: x"))
+        self.assertIn("ValueError: bad", self.target.messages[0])
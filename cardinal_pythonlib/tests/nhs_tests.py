@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# cardinal_pythonlib/tests/nhs_tests.py
+
+"""
+===============================================================================
+
+    Original code copyright (C) 2009-2022 Rudolf Cardinal (rudolf@pobox.com).
+
+    This file is part of cardinal_pythonlib.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+===============================================================================
+
+**Unit tests.**
+
+"""
+
+import random
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from cardinal_pythonlib.nhs import (
+    find_nhs_numbers_in_text,
+    generate_random_nhs_number,
+    generate_random_nhs_numbers,
+    is_valid_nhs_number,
+    nhs_check_digit,
+    nhs_check_digits,
+    validate_nhs_numbers,
+)
+
+VALID = 9434765919
+INVALID_CHECK_DIGIT = 9434765918
+CHECK_DIGIT_10 = 1234567890  # first 9 digits give check digit 10
+
+
+class ValidateNhsNumbersTests(unittest.TestCase):
+    def test_agrees_with_scalar_version(self) -> None:
+        rng = random.Random(1)
+        values = [rng.randint(0, 10**10) for _ in range(5000)]
+        values += [generate_random_nhs_number() for _ in range(500)]
+        expected = [is_valid_nhs_number(x) for x in values]
+        result = validate_nhs_numbers(np.array(values, dtype=np.int64))
+        self.assertEqual(result.tolist(), expected)
+
+    def test_check_digits(self) -> None:
+        first9 = [123456789, 987654321, 943476591, 999999999]
+        expected = [nhs_check_digit(str(x)) for x in first9]
+        self.assertEqual(nhs_check_digits(first9).tolist(), expected)
+
+    def test_edge_cases(self) -> None:
+        values = [
+            VALID,
+            INVALID_CHECK_DIGIT,
+            CHECK_DIGIT_10,
+            943476591,  # 9 digits
+            94347659190,  # 11 digits
+            -VALID,
+            0,
+        ]
+        self.assertEqual(
+            validate_nhs_numbers(values).tolist(),
+            [True, False, False, False, False, False, False],
+        )
+
+    def test_floats_strings_and_missing(self) -> None:
+        self.assertEqual(
+            validate_nhs_numbers(
+                [float(VALID), VALID + 0.5, float("nan")]
+            ).tolist(),
+            [True, False, False],
+        )
+        self.assertEqual(
+            validate_nhs_numbers(
+                ["943 476 5919", "943-476-5919", "", None, True]
+            ).tolist(),
+            [True, False, False, False, False],
+        )
+
+    def test_pandas(self) -> None:
+        s = pd.Series(
+            [VALID, None, INVALID_CHECK_DIGIT],
+            dtype="Int64",
+            index=["a", "b", "c"],
+            name="nhs",
+        )
+        result = validate_nhs_numbers(s)
+        self.assertIsInstance(result, pd.Series)
+        self.assertEqual(result.to_dict(), {"a": True, "b": False, "c": False})
+        self.assertEqual(result.name, "nhs")
+
+
+class FindNhsNumbersInTextTests(unittest.TestCase):
+    def test_find(self) -> None:
+        text = (
+            f"NHS number {VALID}; also 943 476 5919 and 943-476-5919. "
+            f"Wrong: {INVALID_CHECK_DIGIT}. Too long: 19434765919. "
+            f"Phone 01234 567890."
+        )
+        self.assertEqual(find_nhs_numbers_in_text(text), [VALID] * 3)
+        self.assertEqual(
+            find_nhs_numbers_in_text(text, validate=False),
+            [VALID] * 3 + [INVALID_CHECK_DIGIT],
+        )
+        self.assertEqual(find_nhs_numbers_in_text(""), [])
+
+
+class GenerateRandomNhsNumbersTests(unittest.TestCase):
+    def test_generate(self) -> None:
+        rng = np.random.default_rng(12345)
+        numbers = generate_random_nhs_numbers(10000, rng=rng)
+        self.assertEqual(numbers.shape, (10000,))
+        self.assertTrue(validate_nhs_numbers(numbers).all())
+        self.assertTrue((numbers // 10**7 == 999).all())
+        self.assertTrue(
+            all(is_valid_nhs_number(int(x)) for x in numbers[:100])
+        )
+        others = generate_random_nhs_numbers(
+            1000, official_test_range=False, rng=rng
+        )
+        self.assertTrue(validate_nhs_numbers(others).all())
+        self.assertEqual(generate_random_nhs_numbers(0).size, 0)
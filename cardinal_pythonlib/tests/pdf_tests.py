@@ -36,6 +36,7 @@ from cardinal_pythonlib.pdf import (
     get_concatenated_pdf_in_memory,
     make_pdf_writer,
     PdfPlan,
+    write_concatenated_pdf,
 )
 
 
@@ -181,6 +182,41 @@ class FunctionTests(unittest.TestCase):
         self.assertEqual(reader.pages[1].extract_text(), "Two")
         self.assertEqual(reader.pages[2].extract_text(), "Three")
 
+    def test_concatenated_pdf_in_memory_renders_in_parallel(self) -> None:
+        plans = [
+            PdfPlan(is_html=True, html=create_html(str(i))) for i in range(6)
+        ]
+
+        pdf_data = get_concatenated_pdf_in_memory(
+            plans, start_recto=False, max_workers=3
+        )
+        reader = PdfReader(io.BytesIO(pdf_data))
+
+        self.assertEqual(len(reader.pages), 6)
+        for i in range(6):
+            self.assertEqual(reader.pages[i].extract_text(), str(i))
+
+    def test_concatenated_pdf_written_to_stream(self) -> None:
+        filename = create_pdf_file("Two")
+        plans = [
+            PdfPlan(is_html=True, html=create_html("One")),
+            PdfPlan(is_filename=True, filename=filename),
+            PdfPlan(is_html=True, html=create_html("Three")),
+        ]
+
+        output = io.BytesIO()
+        write_concatenated_pdf(plans, output, max_workers=2)
+        reader = PdfReader(io.BytesIO(output.getvalue()))
+
+        self.assertEqual(len(reader.pages), 5)
+        self.assertEqual(reader.pages[0].extract_text(), "One")
+        self.assertEqual(reader.pages[1].extract_text(), "")
+        self.assertEqual(reader.pages[2].extract_text(), "Two")
+        self.assertEqual(reader.pages[3].extract_text(), "")
+        self.assertEqual(reader.pages[4].extract_text(), "Three")
+
+        os.remove(filename)
+
     def test_make_pdf_writer(self) -> None:
         writer = make_pdf_writer()
         self.assertIsInstance(writer, PdfWriter)
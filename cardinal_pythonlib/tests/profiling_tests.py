@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# cardinal_pythonlib/tests/profiling_tests.py
+
+"""
+===============================================================================
+
+    Original code copyright (C) 2009-2022 Rudolf Cardinal (rudolf@pobox.com).
+
+    This file is part of cardinal_pythonlib.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+===============================================================================
+
+**Unit tests.**
+
+"""
+
+import os
+import pstats
+import signal
+import tempfile
+import threading
+import time
+import unittest
+
+from cardinal_pythonlib.profiling import (
+    AggregatingProfiler,
+    diff_profiles,
+    merge_profiles,
+    SamplingProfiler,
+)
+
+
+def _fib(n: int) -> int:
+    return n if n < 2 else _fib(n - 1) + _fib(n - 2)
+
+
+def _busy(seconds: float) -> None:
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        _fib(10)
+
+
+def _n_calls(stats: pstats.Stats, funcname: str) -> int:
+    # noinspection PyUnresolvedReferences
+    return sum(
+        values[1]
+        for func, values in stats.stats.items()
+        if func[2] == funcname
+    )
+
+
+class AggregatingProfilerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tempdir.cleanup()
+
+    def test_aggregates_across_calls(self) -> None:
+        profiler = AggregatingProfiler()
+        fib = profiler(_fib)
+        for _ in range(3):
+            self.assertEqual(fib(5), 5)
+        self.assertEqual(profiler.n_calls, 3)
+        # 15 calls of _fib per fib(5); the recursion is profiled too
+        self.assertEqual(_n_calls(profiler.get_stats(), "_fib"), 45)
+
+    def test_context_manager_and_nesting(self) -> None:
+        profiler = AggregatingProfiler()
+        fib = profiler(_fib)
+        with profiler:
+            fib(3)
+            with profiler:
+                fib(3)
+        self.assertEqual(profiler.n_calls, 1)
+        self.assertEqual(_n_calls(profiler.get_stats(), "_fib"), 10)
+
+    def test_other_threads_run_unprofiled(self) -> None:
+        profiler = AggregatingProfiler()
+        results = []
+        with profiler:
+            thread = threading.Thread(
+                target=lambda: results.append(profiler(_fib)(4))
+            )
+            thread.start()
+            thread.join()
+        self.assertEqual(results, [3])
+        self.assertEqual(profiler.n_calls, 1)
+
+    def test_results_from_within_profiled_call(self) -> None:
+        profiler = AggregatingProfiler()
+        filename = os.path.join(self.tempdir.name, "inner.prof")
+        seen = []
+
+        @profiler
+        def work() -> None:
+            _fib(3)
+            seen.append(_n_calls(profiler.get_stats(), "_fib"))
+            profiler.dump(filename)
+            _fib(3)  # still profiled
+
+        # Run in a thread, so that a deadlock fails the test, not hangs it.
+        thread = threading.Thread(target=work, daemon=True)
+        thread.start()
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive(), "deadlocked")
+        self.assertEqual(seen, [5])
+        self.assertEqual(_n_calls(pstats.Stats(filename), "_fib"), 5)
+        self.assertEqual(_n_calls(profiler.get_stats(), "_fib"), 10)
+
+        with profiler:
+            profiler.reset()
+            _fib(3)
+        self.assertEqual(_n_calls(profiler.get_stats(), "_fib"), 5)
+
+    def test_periodic_dump(self) -> None:
+        pattern = os.path.join(self.tempdir.name, "p_{n}.prof")
+        profiler = AggregatingProfiler(filename=pattern, dump_every_n_calls=2)
+        fib = profiler(_fib)
+        for _ in range(5):
+            fib(3)
+        self.assertEqual(profiler.n_dumps, 2)
+        stats = pstats.Stats(pattern.format(n=2))
+        self.assertEqual(_n_calls(stats, "_fib"), 20)  # 4 calls x 5
+
+    def test_merge_and_diff(self) -> None:
+        a = os.path.join(self.tempdir.name, "a.prof")
+        b = os.path.join(self.tempdir.name, "b.prof")
+        merged = os.path.join(self.tempdir.name, "merged.prof")
+        p1 = AggregatingProfiler()
+        p1(_fib)(3)
+        p1.dump(a)
+        p2 = AggregatingProfiler()
+        p2(_fib)(6)
+        p2.dump(b)
+        merge_profiles([a, b], merged)
+        self.assertEqual(_n_calls(pstats.Stats(merged), "_fib"), 5 + 25)
+        rows = diff_profiles([a], [b])
+        self.assertTrue(any("_fib" in row[0] for row in rows))
+        for _, before_s, after_s, change_s in rows:
+            self.assertAlmostEqual(after_s - before_s, change_s)
+
+
+@unittest.skipUnless(hasattr(signal, "setitimer"), "Needs setitimer")
+class SamplingProfilerTests(unittest.TestCase):
+    def test_collects_samples(self) -> None:
+        with SamplingProfiler(interval_s=0.001) as profiler:
+            _busy(0.2)
+        self.assertGreater(profiler.n_samples, 0)
+        collapsed = profiler.collapsed_stacks()
+        self.assertIn("_busy (profiling_tests.py:", collapsed)
+        for line in collapsed.splitlines():
+            stack, count = line.rsplit(" ", 1)
+            self.assertGreater(int(count), 0)
+        self.assertTrue(profiler.top_functions(5))
+        # Handler restored
+        self.assertNotEqual(
+            signal.getsignal(signal.SIGPROF), profiler._handler
+        )
+
+    def test_all_threads(self) -> None:
+        done = threading.Event()
+        thread = threading.Thread(target=done.wait)
+        thread.start()
+        try:
+            with SamplingProfiler(
+                interval_s=0.001, all_threads=True
+            ) as profiler:
+                _busy(0.2)
+        finally:
+            done.set()
+            thread.join()
+        collapsed = profiler.collapsed_stacks()
+        self.assertIn("_busy (profiling_tests.py:", collapsed)
+        # The main thread is sampled where it was interrupted, not in the
+        # signal handler itself:
+        self.assertNotIn("_handler (profiling.py:", collapsed)
@@ -26,11 +26,19 @@
 
 """
 
+import datetime
+from decimal import Decimal
+from typing import Any, List
 import unittest
 
+from xlrd.sheet import Cell
+
 from cardinal_pythonlib.spreadsheets import (
     column_lettering,
     colnum_zb_from_alphacol,
+    SheetColumn,
+    SheetColumnType as T,
+    SheetHolder,
 )
 
 
@@ -49,3 +57,125 @@ class TestRoundingAndReversal(unittest.TestCase):
         for col_zb in range(200):
             alphacol = column_lettering(col_zb)
             assert colnum_zb_from_alphacol(alphacol) == col_zb
+
+
+# =============================================================================
+# Bulk reading
+# =============================================================================
+
+
+class _Book(object):
+    datemode = 0
+
+
+class _Sheet(object):
+    """
+    In-memory stand-in for :class:`xlrd.sheet.Sheet`, with the subset of its
+    interface used by :class:`SheetHolder`.
+    """
+
+    name = "TestSheet"
+
+    def __init__(self, rows: List[List[Any]]) -> None:
+        self.rows = rows
+        self.book = _Book()
+
+    @property
+    def nrows(self) -> int:
+        return len(self.rows)
+
+    def row(self, rowx: int) -> List[Cell]:
+        return [Cell(0, v) for v in self.rows[rowx]]
+
+    def cell_value(self, rowx: int, colx: int) -> Any:
+        return self.rows[rowx][colx]
+
+    def col_values(
+        self, colx: int, start_rowx: int = 0, end_rowx: int = None
+    ) -> List[Any]:
+        return [row[colx] for row in self.rows[start_rowx:end_rowx]]
+
+
+HEADERS = ["id", "n", "x", "price", "flag", "when", "code", "name"]
+DATA = [
+    [1.0, 3.0, 1.5, 2.25, "Yes", 43831.5, 12.0, " Alice "],
+    [2.0, "", "", "", 0, "", "AB1", ""],
+    [3.0, "7", "2.5", "3.333", "n", "2020-02-03", "", "Bob"],
+    [4.0, 5.0, 0.0, 1.0, "", 61.0, 5.0, 42.0],
+]
+
+
+class BulkReadTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.sheet = SheetHolder(sheet=_Sheet([HEADERS] + DATA))
+        self.schema = [
+            SheetColumn("id", T.STR_INT),
+            SheetColumn("n", T.INT, default=-1),
+            SheetColumn("x", T.FLOAT),
+            SheetColumn("price", T.DECIMAL, dp=2),
+            SheetColumn("flag", T.BOOL),
+            SheetColumn("when", T.DATETIME),
+            SheetColumn("code", T.STR_NONFLOAT),
+            SheetColumn(["Name", "name"], T.STR, name="person"),
+        ]
+
+    def test_matches_cell_readers(self) -> None:
+        s = self.sheet
+        readers = [
+            lambda r, c: s.read_str_int(r, c),
+            lambda r, c: s.read_int(r, c, default=-1),
+            lambda r, c: s.read_float(r, c),
+            lambda r, c: s.read_decimal(r, c, dp=2),
+            lambda r, c: s.read_bool(r, c),
+            lambda r, c: s.read_datetime(r, c),
+            lambda r, c: s.read_str_nonfloat(r, c),
+            lambda r, c: s.read_str(r, c),
+        ]
+        expected = {
+            column.name: [
+                readers[col](row, col) for row in range(1, len(DATA) + 1)
+            ]
+            for col, column in enumerate(self.schema)
+        }
+        self.assertEqual(s.read_typed_columns(self.schema), expected)
+
+    def test_values(self) -> None:
+        rows = self.sheet.read_typed_tuples(self.schema)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0].id, "1")
+        self.assertEqual(rows[1].n, -1)
+        self.assertEqual(rows[2].n, 7)
+        self.assertEqual(rows[0].price, Decimal("2.25"))
+        self.assertEqual(rows[2].price, Decimal("3.33"))
+        self.assertEqual([r.flag for r in rows], [True, False, False, None])
+        self.assertEqual(rows[0].when, datetime.datetime(2020, 1, 1, 12, 0, 0))
+        self.assertEqual(rows[2].when, datetime.datetime(2020, 2, 3))
+        self.assertEqual(rows[3].when, datetime.datetime(1900, 3, 1))
+        self.assertEqual(rows[0].person, "Alice")
+
+    def test_dates_and_dataframe(self) -> None:
+        df = self.sheet.read_dataframe(
+            [SheetColumn("when", T.DATE), SheetColumn(col=0, coltype=T.INT)]
+        )
+        self.assertEqual(list(df.columns), ["when", "A"])
+        self.assertEqual(df["when"][0], datetime.date(2020, 1, 1))
+        self.assertEqual(list(df["A"]), [1, 2, 3, 4])
+
+    def test_errors(self) -> None:
+        with self.assertRaises(ValueError):
+            self.sheet.read_typed_columns([SheetColumn("x", T.INT)])
+        with self.assertRaises(ValueError):
+            self.sheet.read_typed_columns([SheetColumn("missing")])
+        with self.assertRaises(ValueError):
+            self.sheet.read_typed_columns([SheetColumn("name", col=0)])
+        with self.assertRaises(ValueError):
+            SheetColumn("x", "no_such_type")
+
+    def test_debug_max_rows(self) -> None:
+        sheet = SheetHolder(
+            sheet=_Sheet([HEADERS] + DATA), debug_max_rows_per_sheet=2
+        )
+        self.assertEqual(
+            sheet.read_typed_columns([SheetColumn("id", T.INT)]),
+            {"id": [1, 2]},
+        )
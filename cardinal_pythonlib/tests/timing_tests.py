@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# cardinal_pythonlib/tests/timing_tests.py
+
+"""
+===============================================================================
+
+    Original code copyright (C) 2009-2022 Rudolf Cardinal (rudolf@pobox.com).
+
+    This file is part of cardinal_pythonlib.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+===============================================================================
+
+**Unit tests.**
+
+"""
+
+import asyncio
+import json
+from threading import Thread
+import unittest
+
+from cardinal_pythonlib.timing import (
+    HierarchicalTimer,
+    MultiTimer,
+    MultiTimerContext,
+)
+
+
+class MultiTimerTests(unittest.TestCase):
+    def test_nested_timers_are_exclusive(self) -> None:
+        timer = MultiTimer()
+        with MultiTimerContext(timer, "outer"):
+            with MultiTimerContext(timer, "inner"):
+                pass
+            with MultiTimerContext(timer, "inner"):
+                pass
+        self.assertEqual(timer._count, {"outer": 1, "inner": 2})
+        with self.assertRaises(AssertionError):
+            timer.stop("outer")
+        timer.report()
+
+
+class HierarchicalTimerTests(unittest.TestCase):
+    def test_nested_scopes(self) -> None:
+        timer = HierarchicalTimer()
+
+        @timer.timed("leaf")
+        def leaf() -> None:
+            pass
+
+        with timer.scope("root"):
+            leaf()
+            with MultiTimerContext(timer, "branch"):
+                leaf()
+                leaf()
+        leaf()
+
+        stats = timer.stats()
+        self.assertEqual(
+            list(stats.keys()),
+            ["leaf", "root", "root;branch", "root;branch;leaf", "root;leaf"],
+        )
+        self.assertEqual(stats["root;branch;leaf"]["count"], 2)
+        root = stats["root"]
+        self.assertLessEqual(root["self_s"], root["total_s"])
+        self.assertLessEqual(root["min_s"], root["p50_s"])
+        self.assertLessEqual(root["p99_s"], root["max_s"])
+        self.assertEqual(json.loads(timer.to_json()).keys(), stats.keys())
+        for line in timer.collapsed_stacks(unit_ns=1).splitlines():
+            path, value = line.rsplit(" ", 1)
+            self.assertIn(path, stats)
+            self.assertGreater(int(value), 0)
+
+    def test_wrong_stop_raises(self) -> None:
+        timer = HierarchicalTimer()
+        with self.assertRaises(AssertionError):
+            timer.stop("x")
+        timer.start("x")
+        with self.assertRaises(AssertionError):
+            timer.stop("y")
+
+    def test_threads_and_tasks_have_separate_stacks(self) -> None:
+        timer = HierarchicalTimer()
+
+        def work() -> None:
+            with timer.scope("thread"):
+                with timer.scope("step"):
+                    pass
+
+        threads = [Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        async def task() -> None:
+            with timer.scope("task"):
+                await asyncio.sleep(0)
+                with timer.scope("step"):
+                    await asyncio.sleep(0)
+
+        async def main() -> None:
+            await asyncio.gather(*(task() for _ in range(4)))
+
+        asyncio.run(main())
+
+        stats = timer.stats()
+        self.assertEqual(
+            set(stats.keys()),
+            {"thread", "thread;step", "task", "task;step"},
+        )
+        self.assertEqual(stats["thread;step"]["count"], 4)
+        self.assertEqual(stats["task;step"]["count"], 4)
+
+    def test_disabled(self) -> None:
+        timer = HierarchicalTimer(enabled=False)
+        with timer.scope("x"):
+            pass
+        self.assertEqual(timer.stats(), {})
+        self.assertEqual(timer.collapsed_stacks(), "")
@@ -24,16 +24,33 @@
 
 **Timers for performance tuning.**
 
+- :class:`MultiTimer` times a set of mutually exclusive events (a nested event
+  pauses its parent).
+
+- :class:`HierarchicalTimer` times nested scopes, keeping statistics per
+  call path (e.g. ``load;parse``), with a separate stack for each thread and
+  asynchronous task. Its statistics can be exported as JSON or as "collapsed
+  stacks" for flame graph tools.
+
+Both use :func:`time.perf_counter_ns`, and both work with
+:class:`MultiTimerContext`.
+
 """
 
-from collections import OrderedDict
-import datetime
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from functools import wraps
+import json
+from threading import Lock
+from time import perf_counter_ns
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
 
-from cardinal_pythonlib.datetimefunc import get_now_utc_pendulum
 from cardinal_pythonlib.logs import get_brace_style_log_with_null_handler
 
 log = get_brace_style_log_with_null_handler(__name__)
 
+NS_PER_S = 1e9
+
 
 class MultiTimer(object):
     """
@@ -50,9 +67,9 @@ class MultiTimer(object):
             start: start the timer immediately?
         """
         self._timing = start
-        self._overallstart = get_now_utc_pendulum()
-        self._starttimes = OrderedDict()  # name: start time
-        self._totaldurations = OrderedDict()  # name: duration
+        self._overallstart = perf_counter_ns()
+        self._starttimes = OrderedDict()  # name: start time (ns)
+        self._totaldurations = OrderedDict()  # name: duration (ns)
         self._count = OrderedDict()  # name: count
         self._stack = []  # list of names
 
@@ -60,7 +77,7 @@ class MultiTimer(object):
         """
         Reset the timers.
         """
-        self._overallstart = get_now_utc_pendulum()
+        self._overallstart = perf_counter_ns()
         self._starttimes.clear()
         self._totaldurations.clear()
         self._count.clear()
@@ -90,7 +107,7 @@ class MultiTimer(object):
         """
         if not self._timing:
             return
-        now = get_now_utc_pendulum()
+        now = perf_counter_ns()
 
         # If we were already timing something else, pause that.
         if self._stack:
@@ -99,7 +116,7 @@ class MultiTimer(object):
 
         # Start timing our new thing
         if name not in self._starttimes:
-            self._totaldurations[name] = datetime.timedelta()
+            self._totaldurations[name] = 0
             self._count[name] = 0
         self._starttimes[name] = now
         if increment_count:
@@ -115,7 +132,7 @@ class MultiTimer(object):
         """
         if not self._timing:
             return
-        now = get_now_utc_pendulum()
+        now = perf_counter_ns()
 
         # Validity check
         if not self._stack:
@@ -142,17 +159,15 @@ class MultiTimer(object):
         """
         while self._stack:
             self.stop(self._stack[-1])
-        now = get_now_utc_pendulum()
-        grand_total = datetime.timedelta()
-        overall_duration = now - self._overallstart
-        for name, duration in self._totaldurations.items():
-            grand_total += duration
+        now = perf_counter_ns()
+        grand_total_sec = sum(self._totaldurations.values()) / NS_PER_S
+        overall_sec = (now - self._overallstart) / NS_PER_S
 
         log.info("Timing summary:")
         summaries = []
-        for name, duration in self._totaldurations.items():
+        for name, duration_ns in self._totaldurations.items():
             n = self._count[name]
-            total_sec = duration.total_seconds()
+            total_sec = duration_ns / NS_PER_S
             mean = total_sec / n if n > 0 else None
 
             summaries.append(
@@ -160,7 +175,7 @@ class MultiTimer(object):
                     "total": total_sec,
                     "description": (
                         f"- {name}: {total_sec:.3f} s "
-                        f"({(100 * total_sec / grand_total.total_seconds()):.2f}%, "  # noqa: E501
+                        f"({(100 * total_sec / grand_total_sec):.2f}%, "
                         f"n={n}, mean={mean:.3f}s)"
                     ),
                 }
@@ -172,18 +187,305 @@ class MultiTimer(object):
         if not self._totaldurations:
             log.info("<no timings recorded>")
 
-        unmetered = overall_duration - grand_total
+        unmetered_sec = overall_sec - grand_total_sec
         log.info(
             "Unmetered time: {:.3f} s ({:.2f}%)",
-            unmetered.total_seconds(),
-            100 * unmetered.total_seconds() / overall_duration.total_seconds(),
+            unmetered_sec,
+            100 * unmetered_sec / overall_sec,
         )
-        log.info("Total time: {:.3f} s", grand_total.total_seconds())
+        log.info("Total time: {:.3f} s", grand_total_sec)
+
+
+# =============================================================================
+# Hierarchical timer
+# =============================================================================
+
+DEFAULT_TIMER_SAMPLES_PER_PATH = 1000
+COLLAPSED_STACK_SEPARATOR = ";"
+
+
+class _ScopeStats(object):
+    """
+    Statistics for one call path of a :class:`HierarchicalTimer`. Durations
+    are in nanoseconds.
+    """
+
+    __slots__ = ("count", "total_ns", "min_ns", "max_ns", "samples")
+
+    def __init__(self, max_samples: int) -> None:
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns: Optional[int] = None
+        self.max_ns: Optional[int] = None
+        self.samples: Deque[int] = deque(maxlen=max_samples)
+
+    def add(self, duration_ns: int) -> None:
+        self.count += 1
+        self.total_ns += duration_ns
+        if self.min_ns is None or duration_ns < self.min_ns:
+            self.min_ns = duration_ns
+        if self.max_ns is None or duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+        self.samples.append(duration_ns)
+
+
+def _percentile(sorted_values: List[int], pct: float) -> int:
+    """
+    Nearest-rank percentile of a non-empty sorted list.
+    """
+    rank = -(-pct * len(sorted_values) // 100)  # ceiling
+    return sorted_values[min(max(int(rank), 1), len(sorted_values)) - 1]
+
+
+class HierarchicalTimer(object):
+    """
+    Low-overhead timer for nested scopes.
+
+    Each scope is identified by its call path (the names of the enclosing
+    scopes, then its own name), so the same name may appear in several
+    places. Unlike :class:`MultiTimer`, a scope's time includes that of the
+    scopes nested within it (but see :meth:`collapsed_stacks`).
+
+    The stack of open scopes is held in a :class:`contextvars.ContextVar`, so
+    each thread and each ``asyncio`` task has its own; statistics are shared
+    (and protected by a lock). Instances should be long-lived (e.g. module
+    globals).
+
+    Example:
+
+    .. code-block:: python
+
+        from cardinal_pythonlib.timing import HierarchicalTimer, MultiTimerContext
+
+        htimer = HierarchicalTimer()
+
+        @htimer.timed()
+        def parse(line):
+            ...
+
+        with htimer.scope("load"):
+            for line in lines:
+                parse(line)
+
+        with MultiTimerContext(htimer, "save"):  # equivalent to scope()
+            ...
+
+        htimer.report()
+        print(htimer.to_json())
+        with open("timings.collapsed", "w") as f:
+            f.write(htimer.collapsed_stacks())  # for flamegraph.pl etc.
+
+    """  # noqa: E501
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        samples_per_path: int = DEFAULT_TIMER_SAMPLES_PER_PATH,
+        percentiles: Tuple[float, ...] = (50, 95, 99),
+    ) -> None:
+        """
+        Args:
+            enabled:
+                time things? (If not, scopes cost very little.)
+            samples_per_path:
+                number of recent durations to keep for each call path, for
+                percentile statistics
+            percentiles:
+                percentiles to report
+        """
+        self.enabled = enabled
+        self.samples_per_path = samples_per_path
+        self.percentiles = percentiles
+        self._lock = Lock()
+        self._stats = {}  # type: Dict[Tuple[str, ...], _ScopeStats]
+        # Stack of (path, start_ns) tuples, as an immutable tuple:
+        self._stack = ContextVar(
+            f"HierarchicalTimer_{id(self)}", default=()
+        )  # type: ContextVar[Tuple[Tuple[Tuple[str, ...], int], ...]]
+
+    # -------------------------------------------------------------------------
+    # Timing
+    # -------------------------------------------------------------------------
+
+    def start(self, name: str) -> None:
+        """
+        Opens a scope, nested within any current scope (in this context).
+        """
+        if not self.enabled:
+            return
+        stack = self._stack.get()
+        path = (stack[-1][0] + (name,)) if stack else (name,)
+        self._stack.set(stack + ((path, perf_counter_ns()),))
+
+    def stop(self, name: str) -> None:
+        """
+        Closes the current scope, which must be called ``name``.
+        """
+        now = perf_counter_ns()
+        if not self.enabled:
+            return
+        stack = self._stack.get()
+        if not stack:
+            raise AssertionError(
+                "HierarchicalTimer.stop() when nothing running"
+            )
+        path, start_ns = stack[-1]
+        if path[-1] != name:
+            raise AssertionError(
+                f"HierarchicalTimer.stop({name!r}) when "
+                f"{path[-1]!r} is running"
+            )
+        self._stack.set(stack[:-1])
+        with self._lock:
+            stats = self._stats.get(path)
+            if stats is None:
+                stats = self._stats[path] = _ScopeStats(self.samples_per_path)
+            stats.add(now - start_ns)
+
+    def scope(self, name: str) -> "MultiTimerContext":
+        """
+        Returns a context manager to time a scope.
+        """
+        return MultiTimerContext(self, name)
+
+    def timed(self, name: str = None) -> Callable:
+        """
+        Decorator to time every call to a function, as a scope named
+        ``name`` (default: the function's qualified name).
+        """
+
+        def decorator(fn: Callable) -> Callable:
+            scope_name = name or fn.__qualname__
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                self.start(scope_name)
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.stop(scope_name)
+
+            return wrapper
+
+        return decorator
+
+    def reset(self) -> None:
+        """
+        Discards all statistics. (Open scopes remain open.)
+        """
+        with self._lock:
+            self._stats.clear()
+
+    # -------------------------------------------------------------------------
+    # Results
+    # -------------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Dict[str, Union[int, float]]]:
+        """
+        Returns statistics for each call path (with names joined by ``;``),
+        in call-path order. Each is a dictionary with ``count``, and
+        ``total_s``, ``self_s`` (total minus nested scopes), ``mean_s``,
+        ``min_s``, ``max_s``, and e.g. ``p50_s`` (from recent calls) in
+        seconds.
+        """
+        with self._lock:
+            snapshot = {
+                path: (
+                    st.count,
+                    st.total_ns,
+                    st.min_ns,
+                    st.max_ns,
+                    sorted(st.samples),
+                )
+                for path, st in self._stats.items()
+            }
+        child_totals = {}  # type: Dict[Tuple[str, ...], int]
+        for path, (_, total_ns, _, _, _) in snapshot.items():
+            if len(path) > 1:
+                parent = path[:-1]
+                child_totals[parent] = child_totals.get(parent, 0) + total_ns
+        result = OrderedDict()
+        for path in sorted(snapshot):
+            count, total_ns, min_ns, max_ns, samples = snapshot[path]
+            info = OrderedDict(
+                [
+                    ("count", count),
+                    ("total_s", total_ns / NS_PER_S),
+                    (
+                        "self_s",
+                        max(total_ns - child_totals.get(path, 0), 0)
+                        / NS_PER_S,
+                    ),
+                    ("mean_s", total_ns / count / NS_PER_S),
+                    ("min_s", min_ns / NS_PER_S),
+                    ("max_s", max_ns / NS_PER_S),
+                ]
+            )
+            for pct in self.percentiles:
+                info[f"p{pct:g}_s"] = _percentile(samples, pct) / NS_PER_S
+            result[COLLAPSED_STACK_SEPARATOR.join(path)] = info
+        return result
+
+    def to_json(self, **kwargs: Any) -> str:
+        """
+        Returns :meth:`stats` as JSON. Keyword arguments are passed to
+        :func:`json.dumps`.
+        """
+        return json.dumps(self.stats(), **kwargs)
+
+    def collapsed_stacks(self, unit_ns: int = 1000) -> str:
+        """
+        Returns the timings in "collapsed stack" format, as used by
+        flame graph tools (e.g. Brendan Gregg's ``flamegraph.pl``,
+        speedscope): one line per call path, ``outer;inner value``, where the
+        value is the time spent in that path but not in nested scopes.
+
+        Args:
+            unit_ns: units for the values, in nanoseconds (default 1000, i.e.
+                microseconds)
+        """
+        lines = []
+        for path, info in self.stats().items():
+            value = round(info["self_s"] * NS_PER_S / unit_ns)
+            if value > 0:
+                lines.append(f"{path} {value}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def report(self) -> None:
+        """
+        Reports statistics to the log.
+        """
+        stats = self.stats()
+        log.info("Hierarchical timing summary:")
+        if not stats:
+            log.info("<no timings recorded>")
+        for path, info in stats.items():
+            depth = path.count(COLLAPSED_STACK_SEPARATOR)
+            name = path.rsplit(COLLAPSED_STACK_SEPARATOR, 1)[-1]
+            pcts = ", ".join(
+                f"p{pct:g}={info[f'p{pct:g}_s']:.6f}s"
+                for pct in self.percentiles
+            )
+            log.info(
+                "{}- {}: total {:.6f} s (self {:.6f} s), n={}, "
+                "mean={:.6f}s, min={:.6f}s, max={:.6f}s, {}",
+                "  " * depth,
+                name,
+                info["total_s"],
+                info["self_s"],
+                info["count"],
+                info["mean_s"],
+                info["min_s"],
+                info["max_s"],
+                pcts,
+            )
 
 
 class MultiTimerContext(object):
     """
-    Context manager for :class:`MultiTimer`.
+    Context manager for :class:`MultiTimer` (or :class:`HierarchicalTimer`).
 
     Example:
 
@@ -215,10 +517,15 @@ class MultiTimerContext(object):
 
     """
 
-    def __init__(self, multitimer: MultiTimer, name: str) -> None:
+    __slots__ = ("timer", "name")
+
+    def __init__(
+        self, multitimer: Union[MultiTimer, HierarchicalTimer], name: str
+    ) -> None:
         """
         Args:
-            multitimer: :class:`MultiTimer` to use
+            multitimer: :class:`MultiTimer` or :class:`HierarchicalTimer` to
+                use
             name: name of timer to start as we enter, and stop as we exit
         """
         self.timer = multitimer
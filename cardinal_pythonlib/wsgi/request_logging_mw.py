@@ -24,12 +24,27 @@
 
 **WSGI middleware to log incoming request/response details.**
 
+The final log record for each request carries a structured
+:class:`RequestTiming` (as the record attribute ``request_timing``), which
+:class:`RequestTimingHandler` can aggregate into per-route statistics (e.g.
+p50/p95 durations). For example:
+
+.. code-block:: python
+
+    stats = RequestTimingStats()
+    setup_queued_logging([get_colour_handler(), RequestTimingHandler(stats)])
+    app = RequestLoggingMiddleware(app)
+    # ... later:
+    print(stats.summary())
+
 """
 
+from collections import deque
 import logging
-from typing import List, Optional
-
-from pendulum import DateTime as Pendulum
+import math
+from threading import Lock
+import time
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional
 
 from cardinal_pythonlib.logs import BraceStyleAdapter
 from cardinal_pythonlib.wsgi.constants import (
@@ -46,6 +61,145 @@ from cardinal_pythonlib.wsgi.constants import (
 
 log = BraceStyleAdapter(logging.getLogger(__name__))
 
+REQUEST_TIMING_ATTR = "request_timing"
+DEFAULT_TIMING_SAMPLES_PER_ROUTE = 1000
+DEFAULT_TIMING_MAX_ROUTES = 500
+OVERFLOW_ROUTE = "[other]"  # for routes beyond the limit
+
+
+# =============================================================================
+# Structured timing records, and their aggregation
+# =============================================================================
+
+
+class RequestTiming(NamedTuple):
+    """
+    Structured information about a completed request.
+    """
+
+    route: str  # route, or PATH_INFO by default
+    method: str
+    status: Optional[int]  # HTTP status code; None if no response
+    duration_s: Optional[float]  # None if timing not requested
+    raised: bool  # did the app raise an exception?
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of a non-empty sorted list.
+    """
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+class RequestTimingStats(object):
+    """
+    Thread-safe aggregator of request durations per route, keeping the most
+    recent ``samples_per_route`` durations for each route.
+
+    Memory use is bounded: once ``max_routes`` distinct routes have been
+    seen, requests for any further routes are pooled under
+    :data:`OVERFLOW_ROUTE`. (Routes default to the request path, so without
+    a ``route_getter`` that collapses object IDs etc., a long-running server
+    may see very many distinct routes, e.g. from scanners.)
+    """
+
+    def __init__(
+        self,
+        samples_per_route: int = DEFAULT_TIMING_SAMPLES_PER_ROUTE,
+        max_routes: int = DEFAULT_TIMING_MAX_ROUTES,
+    ) -> None:
+        """
+        Args:
+            samples_per_route:
+                number of recent durations to keep per route
+            max_routes:
+                maximum number of distinct routes to track (beyond which,
+                see above)
+        """
+        assert max_routes > 0, "max_routes must be positive"
+        self.samples_per_route = samples_per_route
+        self.max_routes = max_routes
+        self._lock = Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+
+    def add(self, timing: RequestTiming) -> None:
+        """
+        Records a request.
+        """
+        if timing.duration_s is None:
+            return
+        route = timing.route
+        with self._lock:
+            samples = self._samples.get(route)
+            if samples is None:
+                if len(self._samples) >= self.max_routes:
+                    route = OVERFLOW_ROUTE
+                    samples = self._samples.get(route)
+                if samples is None:
+                    samples = self._samples[route] = deque(
+                        maxlen=self.samples_per_route
+                    )
+                    self._counts[route] = 0
+            samples.append(timing.duration_s)
+            self._counts[route] += 1
+
+    def summary(
+        self, percentiles: List[float] = (50, 95)
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Returns, for each route, a dictionary with ``count`` (all requests
+        seen), ``max``, and e.g. ``p50``, ``p95`` (from recent requests),
+        with durations in seconds.
+        """
+        with self._lock:
+            snapshot = {
+                route: (self._counts[route], sorted(samples))
+                for route, samples in self._samples.items()
+            }
+        result = {}
+        for route, (count, values) in snapshot.items():
+            info = {"count": count, "max": values[-1]}
+            for pct in percentiles:
+                info[f"p{pct:g}"] = _percentile(values, pct)
+            result[route] = info
+        return result
+
+    def clear(self) -> None:
+        """
+        Forgets all data.
+        """
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+
+class RequestTimingHandler(logging.Handler):
+    """
+    Log handler that feeds the structured :class:`RequestTiming` information
+    from :class:`RequestLoggingMiddleware` records into a
+    :class:`RequestTimingStats`, ignoring other records. Attach it to a
+    queued logger (see :func:`cardinal_pythonlib.logs.setup_queued_logging`)
+    to do the aggregation in the background.
+    """
+
+    def __init__(
+        self, stats: RequestTimingStats, level: int = logging.NOTSET
+    ) -> None:
+        super().__init__(level=level)
+        self.stats = stats
+
+    def emit(self, record: logging.LogRecord) -> None:
+        timing = getattr(record, REQUEST_TIMING_ATTR, None)
+        if timing is not None:
+            self.stats.add(timing)
+
+
+# =============================================================================
+# Middleware
+# =============================================================================
+
 
 class RequestLoggingMiddleware(object):
     """
@@ -61,6 +215,7 @@ class RequestLoggingMiddleware(object):
         show_request_immediately: bool = True,
         show_response: bool = True,
         show_timing: bool = True,
+        route_getter: Callable[[TYPE_WSGI_ENVIRON], str] = None,
     ) -> None:
         """
         Args:
@@ -83,6 +238,12 @@ class RequestLoggingMiddleware(object):
                 Show the HTTP response code?
             show_timing:
                 Show the time that the wrapped WSGI app took?
+            route_getter:
+                Optional function to return a route name from the WSGI
+                environment (e.g. collapsing object IDs from the path), for
+                the structured :class:`RequestTiming`. The default is the
+                ``PATH_INFO``, which is also used if this function raises
+                an exception.
         """
         self.app = app
         self.logger = logger
@@ -90,15 +251,35 @@ class RequestLoggingMiddleware(object):
         self.show_response = show_response
         self.show_request_immediately = show_request_immediately
         self.show_timing = show_timing
+        self.route_getter = route_getter
         self.two_parts = show_request_immediately and (
             show_response or show_timing
         )
 
-    def log(self, msg) -> None:
+    def log(self, msg, timing: RequestTiming = None) -> None:
+        """
+        Writes a message to the chosen log, optionally with structured
+        timing information.
+        """
+        if timing is None:
+            self.logger.log(self.loglevel, msg)
+        else:
+            self.logger.log(
+                self.loglevel, msg, extra={REQUEST_TIMING_ATTR: timing}
+            )
+
+    def get_route(self, environ: TYPE_WSGI_ENVIRON) -> str:
         """
-        Writes a message to the chosen log.
+        Returns the route name for the structured :class:`RequestTiming`.
         """
-        self.logger.log(self.loglevel, msg)
+        if self.route_getter:
+            # noinspection PyBroadException
+            try:
+                return self.route_getter(environ)
+            except Exception:
+                # Never mask the application's own result or exception.
+                log.exception("route_getter failed; using PATH_INFO")
+        return environ.get(WsgiEnvVar.PATH_INFO, "")
 
     def __call__(
         self,
@@ -142,31 +323,47 @@ class RequestLoggingMiddleware(object):
             captured_status = status
             return start_response(status, headers, exc_info)
 
+        raised = False
         # noinspection PyBroadException
         try:
             if self.show_timing:
-                t1 = Pendulum.utcnow()
+                t1 = time.perf_counter()
             result = self.app(environ, custom_start_response)
             return result
         except Exception:
+            raised = True
             msg_parts.append("[RAISED EXCEPTION]")
             raise
         finally:
+            if self.show_timing:
+                # noinspection PyUnboundLocalVariable
+                time_taken_s = time.perf_counter() - t1
+            else:
+                time_taken_s = None
             if self.show_request_immediately:
                 msg_parts.append("Response to")
             else:
                 msg_parts.append("Request from")
             msg_parts.append(request_details)
-            if self.show_timing:
-                t2 = Pendulum.utcnow()
             if self.show_response:
                 if captured_status is not None:
                     msg_parts.append(f"-> {captured_status}")
                 else:
                     msg_parts.append("[no response status]")
             if self.show_timing:
-                # noinspection PyUnboundLocalVariable
-                time_taken_s = (t2 - t1).total_seconds()
                 msg_parts.append(f"[{time_taken_s} s]")
             if msg_parts:
-                self.log(" ".join(msg_parts))
+                status_code = None  # type: Optional[int]
+                if captured_status:
+                    try:
+                        status_code = int(captured_status.split(" ", 1)[0])
+                    except ValueError:
+                        pass
+                timing = RequestTiming(
+                    route=self.get_route(environ),
+                    method=environ.get(WsgiEnvVar.REQUEST_METHOD, ""),
+                    status=status_code,
+                    duration_s=time_taken_s,
+                    raised=raised,
+                )
+                self.log(" ".join(msg_parts), timing=timing)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# cardinal_pythonlib/wsgi/tests/request_logging_mw_tests.py
+
+"""
+===============================================================================
+
+    Original code copyright (C) 2009-2022 Rudolf Cardinal (rudolf@pobox.com).
+
+    This file is part of cardinal_pythonlib.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+===============================================================================
+
+**Unit tests.**
+
+"""
+
+import logging
+import unittest
+
+from cardinal_pythonlib.wsgi.constants import WsgiEnvVar
+from cardinal_pythonlib.wsgi.request_logging_mw import (
+    OVERFLOW_ROUTE,
+    RequestLoggingMiddleware,
+    RequestTiming,
+    RequestTimingHandler,
+    RequestTimingStats,
+)
+
+
+def app(environ, start_response):
+    if environ[WsgiEnvVar.PATH_INFO] == "/fail":
+        raise ValueError("failed")
+    start_response("404 Not Found", [])
+    return [b""]
+
+
+class RequestTimingStatsTests(unittest.TestCase):
+    def test_summary(self) -> None:
+        stats = RequestTimingStats(samples_per_route=50)
+        for i in range(1, 101):
+            stats.add(RequestTiming("/a", "GET", 200, i / 100, False))
+        stats.add(RequestTiming("/b", "GET", 200, None, False))
+        summary = stats.summary()
+        self.assertEqual(list(summary.keys()), ["/a"])
+        self.assertEqual(summary["/a"]["count"], 100)
+        # Only the most recent 50 (0.51-1.00) are kept.
+        self.assertAlmostEqual(summary["/a"]["p50"], 0.75)
+        self.assertAlmostEqual(summary["/a"]["p95"], 0.98)
+        self.assertAlmostEqual(summary["/a"]["max"], 1.0)
+
+    def test_max_routes(self) -> None:
+        stats = RequestTimingStats(max_routes=2)
+        for i in range(10):
+            stats.add(RequestTiming(f"/{i}", "GET", 404, 0.1, False))
+        stats.add(RequestTiming("/0", "GET", 404, 0.1, False))
+        summary = stats.summary()
+        self.assertEqual(sorted(summary), ["/0", "/1", OVERFLOW_ROUTE])
+        self.assertEqual(summary["/0"]["count"], 2)
+        self.assertEqual(summary[OVERFLOW_ROUTE]["count"], 8)
+
+
+class RequestLoggingMiddlewareTests(unittest.TestCase):
+    def test_structured_timing_records(self) -> None:
+        logger = logging.getLogger(
+            "cardinal_pythonlib.wsgi.tests.request_logging_mw"
+        )
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        stats = RequestTimingStats()
+        logger.addHandler(RequestTimingHandler(stats))
+        mw = RequestLoggingMiddleware(
+            app, logger=logger, route_getter=lambda e: e["PATH_INFO"][:2]
+        )
+
+        environ = {WsgiEnvVar.PATH_INFO: "/x/123", "REQUEST_METHOD": "GET"}
+        mw(environ, lambda status, headers, exc_info=None: None)
+        mw(environ, lambda status, headers, exc_info=None: None)
+        with self.assertRaises(ValueError):
+            mw(
+                {WsgiEnvVar.PATH_INFO: "/fail"},
+                lambda status, headers, exc_info=None: None,
+            )
+
+        summary = stats.summary()
+        self.assertEqual(summary["/x"]["count"], 2)
+        self.assertEqual(summary["/f"]["count"], 1)
+        self.assertGreaterEqual(summary["/x"]["p95"], 0)
+
+    def test_failing_route_getter_does_not_mask_exception(self) -> None:
+        logger = logging.getLogger(
+            "cardinal_pythonlib.wsgi.tests.request_logging_mw.bad_route"
+        )
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        stats = RequestTimingStats()
+        logger.addHandler(RequestTimingHandler(stats))
+
+        def bad_route_getter(environ) -> str:
+            raise KeyError("oops")
+
+        mw = RequestLoggingMiddleware(
+            app, logger=logger, route_getter=bad_route_getter
+        )
+        with self.assertLogs(
+            "cardinal_pythonlib.wsgi.request_logging_mw", logging.ERROR
+        ):
+            with self.assertRaises(ValueError):
+                mw(
+                    {WsgiEnvVar.PATH_INFO: "/fail"},
+                    lambda status, headers, exc_info=None: None,
+                )
+        self.assertEqual(stats.summary()["/fail"]["count"], 1)
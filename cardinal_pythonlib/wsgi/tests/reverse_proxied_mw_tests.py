@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# cardinal_pythonlib/wsgi/tests/reverse_proxied_mw_tests.py
+
+"""
+===============================================================================
+
+    Original code copyright (C) 2009-2022 Rudolf Cardinal (rudolf@pobox.com).
+
+    This file is part of cardinal_pythonlib.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        https://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+===============================================================================
+
+**Unit tests.**
+
+"""
+
+import unittest
+
+from cardinal_pythonlib.wsgi.constants import WsgiEnvVar
+from cardinal_pythonlib.wsgi.reverse_proxied_mw import (
+    first_from_xff,
+    ReverseProxiedConfig,
+    ReverseProxiedMiddleware,
+)
+
+BASE_ENVIRON = {
+    WsgiEnvVar.HTTP_HOST: "127.0.0.1:8000",
+    WsgiEnvVar.PATH_INFO: "/camcops/main_menu",
+    WsgiEnvVar.REMOTE_ADDR: "127.0.0.1",
+    WsgiEnvVar.SCRIPT_NAME: "",
+    WsgiEnvVar.SERVER_NAME: "localhost",
+    WsgiEnvVar.SERVER_PORT: "8000",
+    WsgiEnvVar.WSGI_URL_SCHEME: "http",
+}
+
+
+def app(environ, start_response):
+    return environ
+
+
+class FirstFromXffTests(unittest.TestCase):
+    def test_first_from_xff(self) -> None:
+        self.assertEqual(first_from_xff(""), "")
+        self.assertEqual(first_from_xff("1.2.3.4"), "1.2.3.4")
+        self.assertEqual(first_from_xff(" 1.2.3.4 , 5.6.7.8"), "1.2.3.4")
+
+
+class ReverseProxiedMiddlewareTests(unittest.TestCase):
+    def check_same_as_unplanned(
+        self, config: ReverseProxiedConfig, headers: dict
+    ) -> dict:
+        mw = ReverseProxiedMiddleware(app, config)
+        environ = dict(BASE_ENVIRON, **headers)
+        expected = environ.copy()
+        mw.rewrite_environ_unplanned(expected)
+        result = mw(environ.copy(), None)
+        self.assertEqual(result, expected)
+        return result
+
+    def test_trusted_headers(self) -> None:
+        config = ReverseProxiedConfig(
+            trusted_proxy_headers=[
+                WsgiEnvVar.HTTP_X_FORWARDED_HOST,
+                WsgiEnvVar.HTTP_X_FORWARDED_FOR,
+                WsgiEnvVar.HTTP_X_FORWARDED_SSL,
+                WsgiEnvVar.HTTP_X_SCRIPT_NAME,
+            ],
+            rewrite_path_info=True,
+        )
+        result = self.check_same_as_unplanned(
+            config,
+            {
+                WsgiEnvVar.HTTP_X_FORWARDED_HOST: "www.example.com",
+                WsgiEnvVar.HTTP_X_FORWARDED_FOR: "1.2.3.4, 5.6.7.8",
+                WsgiEnvVar.HTTP_X_FORWARDED_SSL: "On",
+                WsgiEnvVar.HTTP_X_SCRIPT_NAME: "/camcops",
+                WsgiEnvVar.HTTP_X_FORWARDED_PORT: "443",  # untrusted
+            },
+        )
+        self.assertEqual(result[WsgiEnvVar.HTTP_HOST], "www.example.com")
+        self.assertEqual(result[WsgiEnvVar.REMOTE_ADDR], "1.2.3.4")
+        self.assertEqual(result[WsgiEnvVar.WSGI_URL_SCHEME], "https")
+        self.assertEqual(result[WsgiEnvVar.SCRIPT_NAME], "/camcops")
+        self.assertEqual(result[WsgiEnvVar.PATH_INFO], "/main_menu")
+        self.assertEqual(result[WsgiEnvVar.SERVER_PORT], "8000")
+        self.assertNotIn(WsgiEnvVar.HTTP_X_FORWARDED_PORT, result)
+
+    def test_fixed_values_override_headers(self) -> None:
+        config = ReverseProxiedConfig(
+            trusted_proxy_headers=[
+                WsgiEnvVar.HTTP_X_FORWARDED_PROTO,
+                WsgiEnvVar.HTTP_X_REAL_IP,
+            ],
+            server_port=443,
+            url_scheme="HTTPS",
+        )
+        result = self.check_same_as_unplanned(
+            config,
+            {
+                WsgiEnvVar.HTTP_X_FORWARDED_PROTO: "http",
+                WsgiEnvVar.HTTP_X_REAL_IP: "9.9.9.9",
+            },
+        )
+        self.assertEqual(result[WsgiEnvVar.WSGI_URL_SCHEME], "https")
+        self.assertEqual(result[WsgiEnvVar.SERVER_PORT], "443")
+        self.assertEqual(result[WsgiEnvVar.REMOTE_ADDR], "9.9.9.9")
+        self.assertNotIn(WsgiEnvVar.HTTP_X_FORWARDED_PROTO, result)
+
+    def test_no_trusted_headers_strips_all(self) -> None:
+        result = self.check_same_as_unplanned(
+            ReverseProxiedConfig(),
+            {
+                WsgiEnvVar.HTTP_X_FORWARDED_FOR: "1.2.3.4",
+                WsgiEnvVar.HTTP_X_HTTPS: "1",
+            },
+        )
+        self.assertEqual(result, BASE_ENVIRON)
@@ -199,6 +199,10 @@ setup(
                 "cardinalpythonlib_extract_text="
                 "cardinal_pythonlib.extract_text:main"
             ),
+            (
+                "cardinalpythonlib_profiles="
+                "cardinal_pythonlib.profiling:main"
+            ),
         ]
     },
 )